@@ -1,11 +1,9 @@
 # agents/analytics_agent.py
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain_community.tools.base import Tool as LangChainTool
+from langchain.tools import Tool as LangChainTool
 from tools.mcp_registry import mcp_registry
-
-llm = Ollama(model="llama3")
+from tools.llm import get_llm
 
 analytics_prompt_template = """
 You are a specialized agent in analytics and reporting. Your task is to answer questions using data from the ERP system.
@@ -16,14 +14,26 @@ To answer any data-related question, you must first use the text_to_sql_tool.
 If the user asks for a definition of a term, use the glossary_read tool.
 After obtaining the result, provide a clear and explanatory answer of the findings.
 
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
 Conversation timeline:
 {history}
 Human: {input}
-Agent:
+Thought:{agent_scratchpad}
 """
 
 class AnalyticsAgent:
     def __init__(self):
+        mcp_registry.load("tools.analytics_sql")
         self.sql_tool = mcp_registry.get_tool("text_to_sql_tool")
         self.glossary_tool = mcp_registry.get_tool("glossary_read")
         
@@ -33,8 +43,11 @@ class AnalyticsAgent:
         ]
         
         self.prompt = PromptTemplate.from_template(analytics_prompt_template)
-        self.agent = create_react_agent(llm, self.langchain_tools, self.prompt)
+        self.agent = create_react_agent(get_llm(), self.langchain_tools, self.prompt)
         self.executor = AgentExecutor(agent=self.agent, tools=self.langchain_tools, verbose=True)
 
-    def run(self, user_prompt: str, memory_context: dict) -> str:
-        return self.executor.invoke({"input": user_prompt, "history": memory_context.get("history", "")})['output']
+    def run(self, user_prompt: str, memory_context: dict, callbacks: list = None) -> str:
+        return self.executor.invoke(
+            {"input": user_prompt, "history": memory_context.get("history", "")},
+            config={"callbacks": callbacks},
+        )['output']
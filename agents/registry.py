@@ -0,0 +1,57 @@
+# agents/registry.py
+import importlib
+import threading
+import time
+from typing import Dict
+
+class AgentRegistry:
+    """
+    Registry of agent factories. Agents are referenced as "module:ClassName" and are only
+    imported and constructed the first time they are requested, so a worker pays only for
+    the agents its traffic actually uses. Import and construction times are recorded.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, str] = {}
+        self._agents = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: str):
+        self._factories[name] = factory
+
+    def names(self):
+        return list(self._factories)
+
+    def get(self, name: str):
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        with self._lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                if name not in self._factories:
+                    raise ValueError(f"Agent '{name}' not found.")
+                module_name, class_name = self._factories[name].split(":")
+                start = time.perf_counter()
+                module = importlib.import_module(module_name)
+                imported = time.perf_counter()
+                agent = getattr(module, class_name)()
+                built = time.perf_counter()
+                self._timings[name] = {
+                    "import_ms": (imported - start) * 1000,
+                    "construct_ms": (built - imported) * 1000,
+                }
+                self._agents[name] = agent
+        return agent
+
+    def preload(self, names=None):
+        for name in names or self.names():
+            self.get(name)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                name: {"built": name in self._agents, **self._timings.get(name, {})}
+                for name in self._factories
+            }
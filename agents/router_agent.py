@@ -1,11 +1,19 @@
 # agents/router_agent.py
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain_community.tools.base import Tool as LangChainTool
+from langchain.tools import Tool as LangChainTool
 from tools.mcp_registry import mcp_registry
+from tools.llm import get_llm
 
-llm = Ollama(model="llama3")
+# "fast" calls the intent classifier directly and only falls back to the LLM for
+# ambiguous prompts; "llm" always runs the ReAct loop (the original behaviour).
+ROUTER_MODE = os.getenv("ERP_ROUTER_MODE", "fast")
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ERP_ROUTER_MIN_CONFIDENCE", "0.6"))
 
 prompt_template = """
 You are a central routing agent for an ERP system. Your task is to analyze a user's request and determine which specialized agent can best handle it.
@@ -19,23 +27,125 @@ Available Agents:
 - inventory_agent: Controls stock levels and supplier orders.
 
 Use the tool to classify the request and then state the name of the appropriate agent.
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
 
 Human: {input}
-AI:
+Thought:{agent_scratchpad}
 """
 
-class RouterAgent:
+@dataclass
+class RouteDecision:
+    agent_name: str
+    confidence: Optional[float]
+    path: str  # "fast" or "llm"
+    latency_ms: float
+
+class RouteStats:
+    """Thread-safe counters for how requests were routed and how long it took."""
+
     def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"fast": 0, "llm": 0}
+        self._latency_ms = {"fast": 0.0, "llm": 0.0}
+        self._fallbacks = {"low_confidence": 0, "general_purpose": 0, "llm_mode": 0}
+        self._agents = {}
+
+    def record(self, decision: RouteDecision, fallback_reason: str = None):
+        with self._lock:
+            self._counts[decision.path] += 1
+            self._latency_ms[decision.path] += decision.latency_ms
+            self._agents[decision.agent_name] = self._agents.get(decision.agent_name, 0) + 1
+            if fallback_reason:
+                self._fallbacks[fallback_reason] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = {
+                path: (self._latency_ms[path] / self._counts[path]) if self._counts[path] else None
+                for path in self._counts
+            }
+            saved_ms = None
+            if avg["fast"] is not None and avg["llm"] is not None:
+                saved_ms = self._counts["fast"] * max(avg["llm"] - avg["fast"], 0.0)
+            total = self._counts["fast"] + self._counts["llm"]
+            return {
+                "total": total,
+                "fast_path_ratio": (self._counts["fast"] / total) if total else 0.0,
+                "routes": {
+                    path: {"count": self._counts[path], "avg_latency_ms": avg[path]}
+                    for path in self._counts
+                },
+                "fallbacks": dict(self._fallbacks),
+                "agents": dict(self._agents),
+                "estimated_latency_saved_ms": saved_ms,
+            }
+
+class RouterAgent:
+    def __init__(self, mode: str = ROUTER_MODE, min_confidence: float = ROUTER_MIN_CONFIDENCE):
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.stats = RouteStats()
+
+        mcp_registry.load("tools.classifier")
         self.classifier_tool = mcp_registry.get_tool("intent_classifier")
-        self.langchain_tool = LangChainTool(
-            name=self.classifier_tool.name,
-            func=self.classifier_tool.run,
-            description=self.classifier_tool.description
-        )
-        self.prompt = PromptTemplate.from_template(prompt_template)
-        self.agent = create_react_agent(llm, [self.langchain_tool], self.prompt)
-        self.executor = AgentExecutor(agent=self.agent, tools=[self.langchain_tool], verbose=True)
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
-    def route_request(self, user_prompt: str) -> str:
-        response = self.executor.invoke({"input": user_prompt})
+    @property
+    def executor(self) -> AgentExecutor:
+        # The ReAct router is only needed for fallbacks, so it is built on first use.
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    langchain_tool = LangChainTool(
+                        name=self.classifier_tool.name,
+                        func=self.classifier_tool.run,
+                        description=self.classifier_tool.description
+                    )
+                    prompt = PromptTemplate.from_template(prompt_template)
+                    agent = create_react_agent(get_llm(), [langchain_tool], prompt)
+                    self._executor = AgentExecutor(agent=agent, tools=[langchain_tool], verbose=True)
+        return self._executor
+
+    def _route_with_llm(self, user_prompt: str, callbacks: list = None) -> str:
+        response = self.executor.invoke({"input": user_prompt}, config={"callbacks": callbacks})
         return response['output'].strip()
+
+    def route(self, user_prompt: str, callbacks: list = None) -> RouteDecision:
+        """
+        Routes a prompt and returns the decision with its confidence and the path taken.
+        In "fast" mode the classifier result is used directly unless it is ambiguous or
+        general purpose, in which case the ReAct loop gets the final say.
+        """
+        start = time.perf_counter()
+        fallback_reason = "llm_mode"
+
+        if self.mode == "fast":
+            agent_name, confidence = self.classifier_tool.classify(user_prompt)
+            general_purpose = agent_name == self.classifier_tool.fallback_label
+            if not general_purpose and confidence >= self.min_confidence:
+                decision = RouteDecision(agent_name, confidence, "fast", (time.perf_counter() - start) * 1000)
+                self.stats.record(decision)
+                return decision
+            fallback_reason = "general_purpose" if general_purpose else "low_confidence"
+        else:
+            confidence = None
+
+        agent_name = self._route_with_llm(user_prompt, callbacks)
+        decision = RouteDecision(agent_name, confidence, "llm", (time.perf_counter() - start) * 1000)
+        self.stats.record(decision, fallback_reason)
+        return decision
+
+    def route_request(self, user_prompt: str) -> str:
+        return self.route(user_prompt).agent_name
@@ -1,11 +1,9 @@
 # agents/sales_agent.py
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain_community.tools.base import Tool as LangChainTool
+from langchain.tools import Tool as LangChainTool
 from tools.mcp_registry import mcp_registry
-
-llm = Ollama(model="llama3")
+from tools.llm import get_llm
 
 sales_prompt_template = """
 You are a sales and customer relations specialist. Your task is to help users with everything related to customers, leads, orders, and tickets.
@@ -13,16 +11,30 @@ You have access to the following tools:
 {tools}
 
 If the user wants to create, update, or delete data, you must use the sales_sql_write tool.
+To create or change many rows at once (for example a pasted CSV or JSON list), send them to the sales_sql_write tool in a single JSON batch instead of one SQL statement per row.
 If the user wants to retrieve data, you must use the sales_sql_read tool.
 After completing the task, provide a friendly and clear answer.
 
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
 Conversation timeline:
 {history}
 Human: {input}
-Agent:
+Thought:{agent_scratchpad}
+"""
 
 class SalesAgent:
     def __init__(self):
+        mcp_registry.load("tools.sales_sql")
         self.read_tool = mcp_registry.get_tool("sales_sql_read")
         self.write_tool = mcp_registry.get_tool("sales_sql_write")
         
@@ -32,8 +44,11 @@ class SalesAgent:
         ]
         
         self.prompt = PromptTemplate.from_template(sales_prompt_template)
-        self.agent = create_react_agent(llm, self.langchain_tools, self.prompt)
+        self.agent = create_react_agent(get_llm(), self.langchain_tools, self.prompt)
         self.executor = AgentExecutor(agent=self.agent, tools=self.langchain_tools, verbose=True)
 
-    def run(self, user_prompt: str, memory_context: dict) -> str:
-        return self.executor.invoke({"input": user_prompt, "history": memory_context.get("history", "")})['output']
+    def run(self, user_prompt: str, memory_context: dict, callbacks: list = None) -> str:
+        return self.executor.invoke(
+            {"input": user_prompt, "history": memory_context.get("history", "")},
+            config={"callbacks": callbacks},
+        )['output']
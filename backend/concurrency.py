@@ -0,0 +1,194 @@
+# backend/concurrency.py
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.callbacks import BaseCallbackHandler
+from tools.db import db
+
+AGENT_WORKERS = int(os.getenv("ERP_AGENT_WORKERS", "4"))
+AGENT_QUEUE_SIZE = int(os.getenv("ERP_AGENT_QUEUE_SIZE", "16"))
+REQUEST_TIMEOUT = float(os.getenv("ERP_REQUEST_TIMEOUT", "120"))
+
+class Overloaded(Exception):
+    """Raised when a request is refused at admission; carries the HTTP status and a retry hint."""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+class RequestCancelled(Exception):
+    pass
+
+class CancellationToken:
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.cancelled = False
+        self.thread_id = None
+
+    def check(self):
+        if self.cancelled or time.monotonic() > self.deadline:
+            self.cancelled = True
+            raise RequestCancelled("Request deadline exceeded.")
+
+class DeadlineCallbackHandler(BaseCallbackHandler):
+    """
+    Stops an agent run at the next LLM call, tool call or agent step once its request
+    is cancelled. LangChain swallows handler errors unless raise_error is set.
+    """
+    raise_error = True
+
+    def __init__(self, token: CancellationToken):
+        self.token = token
+
+    def on_llm_start(self, *args, **kwargs):
+        self.token.check()
+
+    def on_chat_model_start(self, *args, **kwargs):
+        self.token.check()
+
+    def on_tool_start(self, *args, **kwargs):
+        self.token.check()
+
+    def on_agent_action(self, *args, **kwargs):
+        self.token.check()
+
+class AgentPool:
+    """
+    Runs blocking agent work on a bounded thread pool with admission control.
+    At most `workers` runs execute at once and at most `queue_size` wait behind them;
+    anything beyond that is refused immediately with a retry hint.
+    """
+
+    def __init__(self, workers: int = AGENT_WORKERS, queue_size: int = AGENT_QUEUE_SIZE,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "accepted": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "cancelled": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "run_ms_total": 0.0,
+        }
+
+    def _avg_run_seconds(self) -> float:
+        done = self._stats["completed"] + self._stats["failed"] + self._stats["timed_out"] + self._stats["cancelled"]
+        return (self._stats["run_ms_total"] / done / 1000) if done else 0.0
+
+    def _admit(self, timeout: float):
+        with self._lock:
+            # Expected time until a worker frees up for this request (unknown until a run finished).
+            # Submitted runs a free worker has not picked up yet are not really waiting.
+            waiting = max(0, self._queued + self._running - self.workers)
+            busy = self._running + self._queued >= self.workers
+            expected_wait = self._avg_run_seconds() * math.ceil((waiting + 1) / self.workers) if busy else 0.0
+            retry_after = max(1, math.ceil(expected_wait))
+            if waiting >= self.queue_size:
+                self._stats["rejected_queue_full"] += 1
+                raise Overloaded(429, retry_after, "Too many requests are queued. Please retry later.")
+            if expected_wait >= timeout:
+                self._stats["rejected_deadline"] += 1
+                raise Overloaded(503, retry_after, "The server cannot answer within the request deadline.")
+            self._queued += 1
+            self._stats["accepted"] += 1
+
+    def _run_in_worker(self, token: CancellationToken, submitted_at: float, fn, args):
+        waited_ms = (time.monotonic() - submitted_at) * 1000
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._stats["wait_ms_total"] += waited_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited_ms)
+        start = time.monotonic()
+        token.thread_id = threading.get_ident()
+        try:
+            token.check()
+            return fn(*args, callbacks=[DeadlineCallbackHandler(token)])
+        finally:
+            token.thread_id = None
+            with self._lock:
+                self._running -= 1
+                self._stats["run_ms_total"] += (time.monotonic() - start) * 1000
+
+    def _release_if_cancelled(self, future):
+        # A run cancelled while still queued never reaches _run_in_worker.
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def submit(self, fn, *args, timeout: float = None):
+        """
+        Admits fn(*args, callbacks=[...]) to the pool and returns an awaitable for its result.
+        Raises Overloaded straight away when the request is not admitted. The awaitable raises
+        asyncio.TimeoutError once the deadline passes; the agent run is then cancelled at its
+        next step and any SQLite query it is executing is interrupted. The same happens when
+        the awaiting task itself is cancelled (e.g. the client disconnected).
+        """
+        timeout = timeout or self.timeout
+        self._admit(timeout)
+        submitted_at = time.monotonic()
+        token = CancellationToken(submitted_at + timeout)
+        future = self._executor.submit(self._run_in_worker, token, submitted_at, fn, args)
+        future.add_done_callback(self._release_if_cancelled)
+        return self._await(future, token, timeout)
+
+    def _cancel(self, token: CancellationToken):
+        token.cancelled = True
+        if token.thread_id is not None:
+            db.interrupt(token.thread_id)
+
+    async def _await(self, future, token: CancellationToken, timeout: float):
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._cancel(token)
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise
+        except asyncio.CancelledError:
+            self._cancel(token)
+            with self._lock:
+                self._stats["cancelled"] += 1
+            raise
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        with self._lock:
+            self._stats["completed"] += 1
+        return result
+
+    async def run(self, fn, *args, timeout: float = None):
+        """Admits and awaits fn(*args, callbacks=[...]); see submit."""
+        return await self.submit(fn, *args, timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": max(0, self._queued + self._running - self.workers),
+                "running": self._running,
+            })
+        started = snapshot["completed"] + snapshot["failed"] + snapshot["timed_out"] + snapshot["cancelled"]
+        snapshot["wait_ms_avg"] = (snapshot["wait_ms_total"] / started) if started else 0.0
+        return snapshot
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,64 +1,331 @@
 # backend/main.py
+import time
 
-from fastapi import FastAPI
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from agents.router_agent import RouterAgent
-from agents.sales_agent import SalesAgent
-from agents.analytics_agent import AnalyticsAgent
-from agents.finance_agent import FinanceAgent
-from agents.inventory_agent import InventoryAgent  # تم إضافة وكيل المخزون
-from langchain.memory import ConversationBufferWindowMemory
+from agents.registry import AgentRegistry
+from tools.llm import llm_stats, warm_up, warmup_report
+from tools.mcp_registry import mcp_registry
+from tools.db import db
+from tools.sql_cache import query_cache
+from tools.glossary_index import glossary_index
+from tools.query_result import fetch_page, stream_csv
+from tools import reorder, rollups
+from tools import query_log  # noqa: F401 - registers the query observer
+from tools import write_queue
+from tools.tracing import tracer
+from backend.concurrency import AgentPool, Overloaded, RequestCancelled
+from backend.streaming import StreamingCallbackHandler, to_ndjson
+from backend.memory import build_session_store
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI application
 app = FastAPI()
 
-# Initialize all agents and a shared memory buffer
-router_agent = RouterAgent()
-sales_agent = SalesAgent()
-analytics_agent = AnalyticsAgent()
-finance_agent = FinanceAgent()
-inventory_agent = InventoryAgent() # تهيئة وكيل المخزون
+# Register all agents; each one is imported and built the first time it is needed
+agents = AgentRegistry()
+agents.register("router_agent", "agents.router_agent:RouterAgent")
+agents.register("sales_agent", "agents.sales_agent:SalesAgent")
+agents.register("analytics_agent", "agents.analytics_agent:AnalyticsAgent")
+agents.register("finance_agent", "agents.finance_agent:FinanceAgent")
+agents.register("inventory_agent", "agents.inventory_agent:InventoryAgent")  # تم إضافة وكيل المخزون
+DOMAIN_AGENTS = ["sales_agent", "analytics_agent", "finance_agent", "inventory_agent"]
+
+# Optional startup work: comma-separated agents to build eagerly, and Ollama model preloading
+PRELOAD_AGENTS = [name for name in os.getenv("ERP_PRELOAD_AGENTS", "").split(",") if name]
+WARMUP_LLM = os.getenv("ERP_WARMUP_LLM", "0") == "1"
+
+# Under gunicorn.conf.py, writes go to the single writer process instead of a local connection
+write_queue.install()
+
+# Per-session conversation memory, keyed by the session id the frontend sends
+sessions = build_session_store()
 
-# Use a memory buffer to store conversation history
-memory = ConversationBufferWindowMemory(memory_key="history", k=5)
+# Bounded pool that runs the blocking agent executors off the event loop
+agent_pool = AgentPool()
 
 # Pydantic model for request body validation
 class UserRequest(BaseModel):
     prompt: str
+    session_id: Optional[str] = None
+
+DEFAULT_SESSION_ID = "default"
+
+def handle_chat(user_prompt: str, session_id: str, stream: StreamingCallbackHandler = None,
+                callbacks: list = None) -> dict:
+    """
+    Routes a prompt to the correct domain agent and runs it (blocking).
+    When a stream handler is given, routing, tool calls and answer tokens are emitted through it.
+    Each request is traced: routing, the agent run, LLM calls, tool calls and SQL become spans.
+    """
+    callbacks = list(callbacks or []) + tracer.callbacks()
+    if stream is not None:
+        callbacks.append(stream)
+
+    with tracer.trace("chat", prompt_chars=len(user_prompt)) as trace:
+        # Get this session's conversation history
+        history = sessions.load(session_id)
+
+        # 1. Route the request using the Router Agent
+        with tracer.span("router_agent", "router") as span:
+            decision = agents.get("router_agent").route(user_prompt, callbacks)
+            if span is not None:
+                span.set(agent=decision.agent_name, path=decision.path, confidence=decision.confidence)
+        routed_agent_name = decision.agent_name
+        if stream is not None:
+            stream.on_route(routed_agent_name, decision.confidence, decision.path)
+
+        # 2. Select the correct agent and run the task
+        response = f"I couldn't find an agent for that task. The request was routed to: '{routed_agent_name}'."
+        for agent_name in DOMAIN_AGENTS:
+            if agent_name in routed_agent_name.lower():
+                with tracer.span(agent_name, "agent"):
+                    response = agents.get(agent_name).run(user_prompt, history, callbacks)
+                break
+
+        # 3. Save the interaction to the session's memory
+        sessions.save(session_id, user_prompt, response)
+
+    return {
+        "response": response,
+        "agent_used": routed_agent_name,
+        "route_confidence": decision.confidence,
+        "route_path": decision.path,
+        "trace_id": trace.trace_id if trace is not None else None,
+    }
 
 @app.post("/chat/")
-def chat_with_erp(request: UserRequest):
+async def chat_with_erp(request: UserRequest):
     """
     Handles user prompts and routes them to the correct domain agent.
+    Agent runs execute on a bounded worker pool; requests beyond its queue are refused
+    with 429/503 and a Retry-After hint, and runs past the deadline are cancelled.
     """
-    user_prompt = request.prompt
-    
-    # Get current conversation history from memory
-    history = memory.load_memory_variables({})
-
-    # 1. Route the request using the Router Agent
-    routed_agent_name = router_agent.route_request(user_prompt)
-
-    # 2. Select the correct agent and run the task
-    response = "Sorry, that agent is not yet implemented."
-    
-    if "sales_agent" in routed_agent_name.lower():
-        response = sales_agent.run(user_prompt, history)
-    elif "analytics_agent" in routed_agent_name.lower():
-        response = analytics_agent.run(user_prompt, history)
-    elif "finance_agent" in routed_agent_name.lower():
-        response = finance_agent.run(user_prompt, history)
-    elif "inventory_agent" in routed_agent_name.lower(): # إضافة شرط وكيل المخزون
-        response = inventory_agent.run(user_prompt, history)
-    else:
-        response = f"I couldn't find an agent for that task. The request was routed to: '{routed_agent_name}'."
+    try:
+        return await agent_pool.run(handle_chat, request.prompt, request.session_id or DEFAULT_SESSION_ID)
+    except Overloaded as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail,
+                            headers={"Retry-After": str(e.retry_after)})
+    except (asyncio.TimeoutError, RequestCancelled):
+        raise HTTPException(status_code=504, detail="The request took too long and was cancelled.")
+
+@app.post("/chat/stream")
+async def chat_with_erp_stream(request: UserRequest):
+    """
+    Streaming variant of /chat/ that returns NDJSON events as the agent works:
+    "route", then "tool_call"/"tool_result" pairs and "token" chunks of the answer,
+    and finally a "final" event with the same payload as /chat/ (or an "error" event).
+    """
+    loop = asyncio.get_running_loop()
+    stream = StreamingCallbackHandler(loop)
+    try:
+        pending = agent_pool.submit(handle_chat, request.prompt, request.session_id or DEFAULT_SESSION_ID, stream)
+    except Overloaded as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail,
+                            headers={"Retry-After": str(e.retry_after)})
+    run = asyncio.ensure_future(pending)
+
+    async def events():
+        try:
+            while True:
+                next_event = asyncio.ensure_future(stream.queue.get())
+                done, _ = await asyncio.wait({next_event, run}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event in done:
+                    yield to_ndjson(next_event.result())
+                    continue
+                next_event.cancel()
+                while not stream.queue.empty():
+                    yield to_ndjson(stream.queue.get_nowait())
+                break
+            try:
+                yield to_ndjson({"type": "final", **run.result()})
+            except (asyncio.TimeoutError, RequestCancelled):
+                yield to_ndjson({"type": "error", "detail": "The request took too long and was cancelled."})
+            except Exception as e:
+                yield to_ndjson({"type": "error", "detail": str(e)})
+        finally:
+            # The client went away before the run finished.
+            if not run.done():
+                run.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.on_event("startup")
+def startup_hooks():
+    if rollups.ROLLUPS_ENABLED and db.write_forwarder is None:
+        # Idempotent: creates missing rollup tables/triggers and backfills new ones.
+        try:
+            rollups.install()
+        except sqlite3.Error as e:
+            logger.warning("Could not install analytics rollups: %s", e)
+    if WARMUP_LLM:
+        # Loading the model can take a while; don't hold up the server.
+        threading.Thread(target=warm_up, name="ollama-warmup", daemon=True).start()
+    if reorder.REORDER_MONITOR_ENABLED:
+        try:
+            # The writer process installs the change log in multi-worker deployments.
+            if db.write_forwarder is not None or reorder.install():
+                reorder.reorder_monitor.start()
+        except sqlite3.Error as e:
+            logger.warning("Could not start reorder monitoring: %s", e)
+    # Builds the glossary search index (and loads the embedding model) off the request path.
+    threading.Thread(target=_build_glossary_index, name="glossary-index", daemon=True).start()
+    agents.preload(PRELOAD_AGENTS)
+
+def _build_glossary_index():
+    try:
+        glossary_index.refresh()
+    except sqlite3.Error as e:
+        logger.warning("Could not build the glossary index: %s", e)
+
+@app.on_event("shutdown")
+def shutdown_agent_pool():
+    agent_pool.shutdown()
+    reorder.reorder_monitor.stop()
+
+@app.get("/chat/stats")
+def chat_stats():
+    """
+    Reports worker pool queue depth, wait times and admission rejections.
+    """
+    return agent_pool.stats()
+
+@app.get("/sessions/stats")
+def session_stats():
+    """
+    Reports how many conversation sessions are held and their approximate size.
+    """
+    return sessions.stats()
+
+@app.get("/router/stats")
+def router_stats():
+    """
+    Reports how often the fast routing path is used and the latency it saves.
+    """
+    return agents.get("router_agent").stats.snapshot()
+
+@app.get("/tools/stats")
+def tool_stats():
+    """
+    Reports per-tool call counts, latency percentiles, queueing, timeouts and memoization hits.
+    """
+    return mcp_registry.tool_stats()
+
+@app.get("/llm/stats")
+def gateway_stats():
+    """
+    Reports LLM gateway parallelism, queueing, coalesced prompts and token counts.
+    """
+    return llm_stats()
+
+@app.get("/glossary/stats")
+def glossary_stats():
+    """
+    Reports the glossary index size, rebuild count and time, and whether embeddings are used.
+    """
+    return glossary_index.stats()
+
+@app.get("/db/stats")
+def db_stats():
+    """
+    Reports connection pool hit/miss counts and writer wait times, plus the writer process's
+    batching counts in multi-worker deployments.
+    """
+    stats = db.stats()
+    if db.write_forwarder is not None:
+        try:
+            stats["writer_process"] = db.write_forwarder.stats()
+        except sqlite3.Error as e:
+            stats["writer_process"] = {"error": str(e)}
+    return stats
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Reports hit rates and time saved by the text-to-SQL and query result caches.
+    """
+    return query_cache.stats()
+
+@app.get("/inventory/alerts")
+def inventory_alerts(limit: int = Query(50, ge=1, le=500)):
+    """
+    Low-stock products and recently drafted purchase orders from the reorder monitor.
+    Served from memory without calling an agent or the LLM, so the frontend can poll it.
+    """
+    return dict(reorder.reorder_monitor.alerts(limit), monitor=reorder.reorder_monitor.stats())
 
-    # 3. Save the interaction to memory
-    memory.save_context({"input": user_prompt}, {"output": response})
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus-style latency histograms for requests, routing, agents, LLM calls, tools and SQL,
+    plus LLM token counters.
+    """
+    return tracer.prometheus()
 
-    return {"response": response, "agent_used": routed_agent_name}
+@app.get("/traces")
+def recent_traces(limit: int = Query(20, ge=1, le=200)):
+    """
+    Returns the most recent sampled request traces, newest first, with a per-kind latency breakdown.
+    """
+    return tracer.traces(limit)
+
+@app.get("/traces/{trace_id}")
+def trace_detail(trace_id: str):
+    """
+    Returns every span of one sampled request trace.
+    """
+    trace = tracer.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found or expired.")
+    return trace
+
+@app.get("/results/{result_id}")
+def result_page(result_id: str, page: int = Query(0, ge=0), page_size: int = Query(100, ge=1, le=5000)):
+    """
+    Returns one page of a query result that a read tool summarised for the agent.
+    """
+    result = fetch_page(result_id, page, page_size)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired.")
+    return result
+
+@app.get("/results/{result_id}/csv")
+def result_csv(result_id: str):
+    """
+    Streams the full query result as CSV without materialising it in memory.
+    """
+    chunks = stream_csv(result_id)
+    if chunks is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired.")
+    return StreamingResponse(chunks, media_type="text/csv",
+                             headers={"Content-Disposition": f"attachment; filename={result_id}.csv"})
+
+@app.get("/startup/report")
+def startup_report():
+    """
+    Breaks down startup cost: backend import time, per-agent import/construction time,
+    per-tool-module import time and the Ollama warm-up result.
+    """
+    return {
+        "backend_import_ms": BACKEND_IMPORT_MS,
+        "agents": agents.report(),
+        "tool_modules": mcp_registry.load_report(),
+        "llm_warmup": dict(warmup_report),
+    }
 
 # Simple endpoint for health check
 @app.get("/")
 def read_root():
     return {"message": "Helios Dynamics ERP Agent System is running!"}
+
+BACKEND_IMPORT_MS = (time.perf_counter() - _import_started) * 1000
@@ -0,0 +1,192 @@
+# backend/memory.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+SESSION_STORE = os.getenv("ERP_SESSION_STORE", "memory")  # "memory" or "sqlite"
+SESSION_DB_PATH = os.getenv("ERP_SESSION_DB_PATH", "database/sessions.db")
+SESSION_WINDOW = int(os.getenv("ERP_SESSION_WINDOW", "5"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("ERP_SESSION_SUMMARY_TOKENS", "200"))
+SESSION_TURN_TOKENS = int(os.getenv("ERP_SESSION_TURN_TOKENS", "40"))
+MAX_SESSIONS = int(os.getenv("ERP_MAX_SESSIONS", "1000"))
+SESSION_IDLE_TTL = float(os.getenv("ERP_SESSION_IDLE_TTL", "3600"))
+SESSION_MEMORY_CAP_BYTES = int(os.getenv("ERP_SESSION_MEMORY_CAP_BYTES", str(32 * 1024 * 1024)))
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    # Whitespace tokens are a close enough proxy for LLM tokens to bound prompt size.
+    words = text.split()
+    if len(words) <= max_tokens:
+        return " ".join(words)
+    return " ".join(words[:max_tokens]) + " ..."
+
+class SessionMemory:
+    """
+    Conversation memory for one session.
+    The last `window` turns are kept verbatim; older turns are folded into a compact,
+    token-bounded summary line per turn. The rendered history string is cached until the
+    next turn is saved.
+    """
+
+    def __init__(self, turns: List[Tuple[str, str]] = None, summary: List[str] = None,
+                 window: int = SESSION_WINDOW):
+        self.window = window
+        self.turns = list(turns or [])
+        self.summary = list(summary or [])
+        self.last_used = time.monotonic()
+        self._rendered = None
+
+    def save_context(self, user_input: str, output: str):
+        self.turns.append((user_input, output))
+        while len(self.turns) > self.window:
+            old_input, old_output = self.turns.pop(0)
+            self.summary.append(
+                f"User asked: {_truncate_tokens(old_input, SESSION_TURN_TOKENS)} / "
+                f"Agent answered: {_truncate_tokens(old_output, SESSION_TURN_TOKENS)}"
+            )
+        # Drop the oldest summary lines once the summary exceeds its token budget.
+        while self.summary and sum(len(line.split()) for line in self.summary) > SESSION_SUMMARY_TOKENS:
+            self.summary.pop(0)
+        self._rendered = None
+
+    def load_memory_variables(self) -> dict:
+        if self._rendered is None:
+            lines = []
+            if self.summary:
+                lines.append("Summary of earlier conversation:")
+                lines.extend(f"- {line}" for line in self.summary)
+            for user_input, output in self.turns:
+                lines.append(f"Human: {user_input}")
+                lines.append(f"AI: {output}")
+            self._rendered = "\n".join(lines)
+        return {"history": self._rendered}
+
+    def size_bytes(self) -> int:
+        return sum(len(i) + len(o) for i, o in self.turns) + sum(len(line) for line in self.summary)
+
+    def to_json(self) -> str:
+        return json.dumps({"turns": self.turns, "summary": self.summary})
+
+    @classmethod
+    def from_json(cls, data: str) -> "SessionMemory":
+        payload = json.loads(data)
+        return cls([tuple(t) for t in payload["turns"]], payload["summary"])
+
+class InMemorySessionStore:
+    """
+    Process-local session memories with LRU eviction.
+    Sessions idle for longer than `idle_ttl` are dropped, and the least recently used
+    sessions are evicted when either the session count or the byte cap is exceeded.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_ttl: float = SESSION_IDLE_TTL,
+                 memory_cap_bytes: int = SESSION_MEMORY_CAP_BYTES):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_cap_bytes = memory_cap_bytes
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used <= self.idle_ttl:
+                break  # entries are ordered by last use
+            self._drop(session_id)
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.memory_cap_bytes):
+            self._drop(next(iter(self._sessions)))
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size_bytes()
+        self.evictions += 1
+
+    def _get(self, session_id: str) -> SessionMemory:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = SessionMemory()
+            self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def load(self, session_id: str) -> dict:
+        with self._lock:
+            history = self._get(session_id).load_memory_variables()
+            self._evict()
+            return history
+
+    def save(self, session_id: str, user_input: str, output: str):
+        with self._lock:
+            session = self._get(session_id)
+            self._bytes -= session.size_bytes()
+            session.save_context(user_input, output)
+            self._bytes += session.size_bytes()
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "bytes": self._bytes,
+                    "evictions": self.evictions}
+
+class SQLiteSessionStore:
+    """
+    Session memories persisted in a small SQLite file separate from erp.db, so they survive
+    restarts and are shared by every uvicorn worker on the host. Idle sessions are purged.
+    """
+
+    def __init__(self, db_path: str = SESSION_DB_PATH, idle_ttl: float = SESSION_IDLE_TTL):
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, conn, session_id: str) -> SessionMemory:
+        row = conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return SessionMemory.from_json(row[0]) if row else SessionMemory()
+
+    def load(self, session_id: str) -> dict:
+        return self._get(self._conn(), session_id).load_memory_variables()
+
+    def save(self, session_id: str, user_input: str, output: str):
+        conn = self._conn()
+        with conn:
+            # BEGIN IMMEDIATE so concurrent workers serialise the read-modify-write of a session.
+            conn.execute("BEGIN IMMEDIATE")
+            session = self._get(conn, session_id)
+            session.save_context(user_input, output)
+            now = time.time()
+            conn.execute(
+                "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (session_id, session.to_json(), now),
+            )
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.idle_ttl,))
+
+    def stats(self) -> dict:
+        count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": size}
+
+def build_session_store(backend: str = SESSION_STORE):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    return InMemorySessionStore()
@@ -0,0 +1,59 @@
+# backend/streaming.py
+import asyncio
+import json
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+MAX_TOOL_OUTPUT_CHARS = 2000
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns agent callbacks into NDJSON-ready events on an asyncio queue.
+    Callbacks fire on the worker thread, so events are handed to the event loop thread-safely.
+    Once routing is done, LLM tokens that follow the ReAct "Final Answer:" marker are
+    forwarded as they are generated.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.routed = False
+        self._buffer = ""
+        self._answering = False
+
+    def emit(self, event_type: str, **data):
+        data["type"] = event_type
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, data)
+
+    def on_route(self, agent_name: str, confidence, path: str):
+        self.routed = True
+        self.emit("route", agent=agent_name, confidence=confidence, path=path)
+
+    def on_llm_start(self, *args, **kwargs):
+        self._buffer = ""
+        self._answering = False
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if not self.routed:
+            return
+        if self._answering:
+            self.emit("token", text=token)
+            return
+        self._buffer += token
+        marker_at = self._buffer.find(FINAL_ANSWER_MARKER)
+        if marker_at >= 0:
+            self._answering = True
+            rest = self._buffer[marker_at + len(FINAL_ANSWER_MARKER):].lstrip()
+            if rest:
+                self.emit("token", text=rest)
+
+    def on_agent_action(self, action, **kwargs):
+        if self.routed:
+            self.emit("tool_call", tool=action.tool, input=str(action.tool_input))
+
+    def on_tool_end(self, output, **kwargs):
+        if self.routed:
+            self.emit("tool_result", output=str(output)[:MAX_TOOL_OUTPUT_CHARS])
+
+def to_ndjson(event: dict) -> str:
+    return json.dumps(event, default=str) + "\n"
@@ -0,0 +1,12 @@
+# bench/app.py
+"""
+The backend with the scripted LLM installed, for benchmark runs:
+
+    ERP_DB_PATH=bench/erp_bench.db uvicorn bench.app:app
+"""
+from tools.llm import set_llm
+from bench.fake_llm import ScriptedLLM
+
+set_llm(ScriptedLLM.from_env())
+
+from backend.main import app  # noqa: E402 - the LLM must be replaced before agents are built
@@ -0,0 +1,206 @@
+# bench/dataset.py
+"""
+Generates a synthetic erp.db for benchmarks.
+
+    python -m bench.dataset --orders 100000 --path bench/erp_bench.db
+
+Everything is derived from --seed, so the same arguments always produce the same data.
+Other tables scale with the order count: one customer per 10 orders, ~2.5 items per
+order, an invoice for 90% of orders and a payment for 70% of invoices.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from typing import Iterator
+
+SCHEMA = """
+CREATE TABLE customers (
+    customer_id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT, phone TEXT, city TEXT, created_at TEXT);
+CREATE TABLE leads (
+    lead_id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT, status TEXT, created_at TEXT);
+CREATE TABLE orders (
+    order_id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(customer_id),
+    order_date TEXT, status TEXT, total_amount REAL);
+CREATE TABLE order_items (
+    order_item_id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders(order_id),
+    product_id INTEGER REFERENCES products(product_id), quantity INTEGER, unit_price REAL);
+CREATE TABLE tickets (
+    ticket_id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(customer_id),
+    subject TEXT, status TEXT, created_at TEXT);
+CREATE TABLE invoices (
+    invoice_id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(customer_id),
+    order_id INTEGER REFERENCES orders(order_id), amount REAL, issue_date TEXT, due_date TEXT, status TEXT);
+CREATE TABLE payments (
+    payment_id INTEGER PRIMARY KEY, invoice_id INTEGER REFERENCES invoices(invoice_id),
+    amount REAL, payment_date TEXT, method TEXT);
+CREATE TABLE ledger_entries (
+    entry_id INTEGER PRIMARY KEY, entry_date TEXT, account TEXT, debit REAL, credit REAL, description TEXT);
+CREATE TABLE products (
+    product_id INTEGER PRIMARY KEY, sku TEXT UNIQUE, name TEXT NOT NULL, category TEXT,
+    unit_price REAL, reorder_level INTEGER, supplier TEXT);
+CREATE TABLE stock (
+    product_id INTEGER PRIMARY KEY REFERENCES products(product_id), quantity INTEGER NOT NULL, updated_at TEXT);
+CREATE TABLE purchase_orders (
+    po_id INTEGER PRIMARY KEY, product_id INTEGER REFERENCES products(product_id), quantity INTEGER,
+    status TEXT, created_at TEXT);
+CREATE TABLE glossary (term TEXT PRIMARY KEY, definition TEXT NOT NULL);
+"""
+
+GLOSSARY = [
+    ("churn rate", "The share of customers who stop buying within a period."),
+    ("sales pipeline", "The open leads and opportunities, grouped by stage."),
+    ("average order value", "Total revenue divided by the number of orders."),
+    ("days sales outstanding", "Average number of days it takes to collect payment after an invoice."),
+    ("reorder level", "The stock quantity at which a product should be reordered."),
+    ("gross margin", "Revenue minus the cost of goods sold, as a share of revenue."),
+]
+
+CATEGORIES = ["fasteners", "electrical", "hydraulics", "packaging", "tools", "safety", "raw materials"]
+SUPPLIERS = ["Acme", "Globex", "Initech", "Umbrella", "Stark Industries", "Wayne Supply"]
+CITIES = ["Cairo", "Alexandria", "Giza", "Dubai", "Riyadh", "Amman", "Casablanca"]
+START_DATE = date(2022, 1, 1)
+DAYS = 3 * 365
+CHUNK_ROWS = 50000
+
+class Scale:
+    def __init__(self, orders: int):
+        self.orders = orders
+        self.customers = max(100, orders // 10)
+        self.products = min(20000, max(200, orders // 100))
+        self.leads = max(50, self.customers // 2)
+        self.tickets = max(50, orders // 50)
+
+def _day(rng: random.Random) -> str:
+    return (START_DATE + timedelta(days=rng.randrange(DAYS))).isoformat()
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple]) -> int:
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            conn.executemany(sql, chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(sql, chunk)
+        count += len(chunk)
+    return count
+
+def generate(path: str, orders: int, seed: int = 42, quiet: bool = False) -> dict:
+    """Creates (or replaces) a synthetic database at `path` and returns the row counts."""
+    rng = random.Random(seed)
+    scale = Scale(orders)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    # Bulk load without a journal; the file is switched to WAL (as the app expects) at the end.
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+    counts = {}
+    start = time.perf_counter()
+
+    def log(table: str):
+        if not quiet:
+            print(f"  {table}: {counts[table]} rows ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+    prices = [round(rng.uniform(0.5, 500), 2) for _ in range(scale.products)]
+    counts["products"] = _insert(conn, "INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?)", (
+        (i, f"P-{i:05d}", f"{rng.choice(CATEGORIES)} item {i}", rng.choice(CATEGORIES), prices[i - 1],
+         rng.choice((10, 20, 50, 100)), rng.choice(SUPPLIERS))
+        for i in range(1, scale.products + 1)))
+    log("products")
+    counts["stock"] = _insert(conn, "INSERT INTO stock VALUES (?, ?, ?)", (
+        (i, rng.randrange(0, 1000), _day(rng)) for i in range(1, scale.products + 1)))
+    counts["customers"] = _insert(conn, "INSERT INTO customers VALUES (?, ?, ?, ?, ?, ?)", (
+        (i, f"Customer {i}", f"customer{i}@example.com", f"+20{rng.randrange(10**8, 10**9)}",
+         rng.choice(CITIES), _day(rng))
+        for i in range(1, scale.customers + 1)))
+    log("customers")
+    counts["leads"] = _insert(conn, "INSERT INTO leads VALUES (?, ?, ?, ?, ?)", (
+        (i, f"Lead {i}", f"lead{i}@example.com", rng.choice(("new", "contacted", "qualified", "lost")), _day(rng))
+        for i in range(1, scale.leads + 1)))
+    counts["tickets"] = _insert(conn, "INSERT INTO tickets VALUES (?, ?, ?, ?, ?)", (
+        (i, rng.randrange(1, scale.customers + 1), f"Issue {i}", rng.choice(("open", "closed")), _day(rng))
+        for i in range(1, scale.tickets + 1)))
+
+    # Orders, their items, invoices and payments are generated together so the amounts agree.
+    order_rows, item_rows, invoice_rows, payment_rows = [], [], [], []
+    item_id = invoice_id = payment_id = 0
+    totals = {"orders": 0, "order_items": 0, "invoices": 0, "payments": 0}
+
+    def flush():
+        conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", order_rows)
+        conn.executemany("INSERT INTO order_items VALUES (?, ?, ?, ?, ?)", item_rows)
+        conn.executemany("INSERT INTO invoices VALUES (?, ?, ?, ?, ?, ?, ?)", invoice_rows)
+        conn.executemany("INSERT INTO payments VALUES (?, ?, ?, ?, ?)", payment_rows)
+        for name, rows in (("orders", order_rows), ("order_items", item_rows),
+                           ("invoices", invoice_rows), ("payments", payment_rows)):
+            totals[name] += len(rows)
+            rows.clear()
+
+    for order_id in range(1, orders + 1):
+        customer_id = rng.randrange(1, scale.customers + 1)
+        order_date = START_DATE + timedelta(days=rng.randrange(DAYS))
+        total = 0.0
+        for _ in range(rng.choice((1, 2, 2, 3, 3, 4))):
+            item_id += 1
+            product_id = rng.randrange(1, scale.products + 1)
+            quantity = rng.randrange(1, 20)
+            item_rows.append((item_id, order_id, product_id, quantity, prices[product_id - 1]))
+            total += quantity * prices[product_id - 1]
+        total = round(total, 2)
+        order_rows.append((order_id, customer_id, order_date.isoformat(),
+                           rng.choice(("pending", "shipped", "delivered", "cancelled")), total))
+        if rng.random() < 0.9:
+            invoice_id += 1
+            paid = rng.random() < 0.7
+            invoice_rows.append((invoice_id, customer_id, order_id, total, order_date.isoformat(),
+                                 (order_date + timedelta(days=30)).isoformat(), "paid" if paid else "open"))
+            if paid:
+                payment_id += 1
+                payment_rows.append((payment_id, invoice_id, total,
+                                     (order_date + timedelta(days=rng.randrange(1, 45))).isoformat(),
+                                     rng.choice(("bank transfer", "card", "cash"))))
+        if len(order_rows) >= CHUNK_ROWS:
+            flush()
+    flush()
+    counts.update(totals)
+    log("orders")
+
+    counts["ledger_entries"] = _insert(conn, "INSERT INTO ledger_entries VALUES (?, ?, ?, ?, ?, ?)", (
+        (i, _day(rng), rng.choice(("revenue", "receivables", "cash", "inventory")),
+         round(rng.uniform(0, 5000), 2), 0.0, f"Entry {i}")
+        for i in range(1, max(100, orders // 5) + 1)))
+    counts["purchase_orders"] = _insert(conn, "INSERT INTO purchase_orders VALUES (?, ?, ?, ?, ?)", (
+        (i, rng.randrange(1, scale.products + 1), rng.randrange(10, 500),
+         rng.choice(("draft", "ordered", "received")), _day(rng))
+        for i in range(1, max(50, scale.products // 2) + 1)))
+    counts["glossary"] = _insert(conn, "INSERT INTO glossary VALUES (?, ?)", iter(GLOSSARY))
+    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.dataset", description="Generate a synthetic erp.db.")
+    parser.add_argument("--orders", type=int, default=10000, help="number of orders (10k to 10M)")
+    parser.add_argument("--path", default="bench/erp_bench.db")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    counts = generate(args.path, args.orders, args.seed)
+    print(f"Generated {args.path} in {time.perf_counter() - start:.1f}s: "
+          + ", ".join(f"{table}={n}" for table, n in counts.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
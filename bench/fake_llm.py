@@ -0,0 +1,81 @@
+# bench/fake_llm.py
+import os
+import re
+import time
+from typing import Any, List, Optional
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, LLMResult
+from bench.scenarios import match
+
+_TOOL_NAMES = re.compile(r"should be one of \[([^\]]*)\]")
+MAX_ANSWER_LINES = 5
+
+def _last_line_after(prompt: str, marker: str) -> Optional[str]:
+    index = prompt.rfind(marker)
+    if index < 0:
+        return None
+    return prompt[index + len(marker):].split("\n", 1)[0].strip()
+
+def respond(prompt: str) -> str:
+    """
+    Deterministic reply for one prompt: the SQL for text-to-SQL prompts, otherwise the next
+    ReAct step - a tool call for the scripted prompt, then a final answer once an observation
+    is in the scratchpad.
+    """
+    if "SQL Query:" in prompt:
+        question = _last_line_after(prompt, "Question: ") or ""
+        found = match(question)
+        return found[0].sql if found and found[0].sql else "SELECT COUNT(*) FROM orders"
+
+    question = _last_line_after(prompt, "\nHuman: ") or ""
+    scratchpad = prompt[prompt.rfind("\nHuman: "):]
+    observations = scratchpad.split("Observation:")
+    if len(observations) > 1:
+        observation = observations[-1].split("\nThought:")[0].strip()
+        lines = observation.splitlines()[:MAX_ANSWER_LINES]
+        return "I now know the final answer.\nFinal Answer: " + "\n".join(lines)
+
+    tools = [t.strip() for t in (_TOOL_NAMES.findall(prompt) or [""])[-1].split(",") if t.strip()]
+    if tools == ["intent_classifier"]:
+        return f"I should classify the request.\nAction: intent_classifier\nAction Input: {question}"
+    found = match(question)
+    if found is None or found[0].tool not in tools:
+        return "I cannot help with that.\nFinal Answer: I don't have a scripted answer for that request."
+    script, values = found
+    return (f"I should use the {script.tool} tool.\nAction: {script.tool}\n"
+            f"Action Input: {script.action_input.format(**values)}")
+
+class ScriptedLLM(LLM):
+    """
+    Local stand-in for the Ollama LLM used by benchmarks. Replies come from bench.scenarios;
+    `latency_ms` plus `ms_per_token` per generated token (about four characters) simulate
+    model time, so runs measure the system around the LLM rather than the model itself.
+    """
+    latency_ms: float = 0.0
+    ms_per_token: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ScriptedLLM":
+        return cls(latency_ms=float(os.getenv("ERP_BENCH_LLM_LATENCY_MS", "0")),
+                   ms_per_token=float(os.getenv("ERP_BENCH_LLM_MS_PER_TOKEN", "0")))
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        text = respond(prompt)
+        delay_ms = self.latency_ms + self.ms_per_token * len(text) / 4
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return text
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> LLMResult:
+        # Report token counts the way Ollama does, so traces show them.
+        generations = []
+        for prompt in prompts:
+            text = self._call(prompt, stop, run_manager, **kwargs)
+            generations.append([Generation(text=text, generation_info={
+                "prompt_eval_count": len(prompt) // 4, "eval_count": len(text) // 4})])
+        return LLMResult(generations=generations)
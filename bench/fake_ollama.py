@@ -0,0 +1,140 @@
+# bench/fake_ollama.py
+"""
+A local stand-in for the Ollama HTTP API, for measuring the LLM gateway without a model.
+
+    python -m bench.fake_ollama --port 11500 --num-parallel 4 --latency-ms 200 --ms-per-token 5
+
+It implements /api/generate (streamed NDJSON or a single JSON object) with replies from the
+benchmark scripts. Like Ollama it serves at most --num-parallel generations at once and queues
+the rest. GET /stats reports how many generations it served and the peak concurrency.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bench.fake_llm import respond
+
+class FakeOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, num_parallel: int = 4, latency_ms: float = 200.0, ms_per_token: float = 5.0):
+        super().__init__(address, _Handler)
+        self.latency = latency_ms / 1000
+        self.per_token = ms_per_token / 1000
+        self.slots = threading.Semaphore(num_parallel)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "generations": 0, "connections": 0, "running": 0, "max_running": 0}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[key] += amount
+            if key == "running":
+                self.counters["max_running"] = max(self.counters["max_running"], self.counters["running"])
+
+def _tokens(text: str):
+    # Roughly one token per word, keeping the whitespace so the pieces join back up.
+    start = 0
+    for index, char in enumerate(text):
+        if char in " \n" and index > start:
+            yield text[start:index]
+            start = index
+    if start < len(text):
+        yield text[start:]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible in the stats
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.lock:
+                self._send_json(200, dict(self.server.counters))
+        elif self.path in ("/", "/api/tags"):
+            self._send_json(200, {"models": [{"name": "llama3"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.count("requests")
+        prompt = request.get("prompt", "")
+        model = request.get("model", "llama3")
+        if not prompt:
+            # A load/keep-alive request, as sent by the warm-up.
+            self._send_json(200, {"model": model, "response": "", "done": True})
+            return
+
+        text = respond(prompt)
+        for stop in (request.get("options") or {}).get("stop") or []:
+            if stop in text:
+                text = text[:text.index(stop)]
+        tokens = list(_tokens(text))
+        final = {"model": model, "response": "", "done": True,
+                 "prompt_eval_count": len(prompt) // 4, "eval_count": len(tokens)}
+        with self.server.slots:
+            self.server.count("running")
+            try:
+                time.sleep(self.server.latency)
+                if request.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in tokens:
+                        time.sleep(self.server.per_token)
+                        self._write_chunk(json.dumps({"model": model, "response": token, "done": False}).encode() + b"\n")
+                    self._write_chunk(json.dumps(final).encode() + b"\n")
+                    self._write_chunk(b"")
+                else:
+                    time.sleep(self.server.per_token * len(tokens))
+                    self._send_json(200, dict(final, response=text))
+            finally:
+                self.server.count("running", -1)
+        self.server.count("generations")
+
+def start(port: int = 0, **kwargs) -> FakeOllama:
+    """Starts a server on a background thread; port 0 picks a free port (see server.server_port)."""
+    server = FakeOllama(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.fake_ollama", description="Fake Ollama server.")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--num-parallel", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="time before the first token")
+    parser.add_argument("--ms-per-token", type=float, default=5.0)
+    args = parser.parse_args(argv)
+    server = FakeOllama(("127.0.0.1", args.port), args.num_parallel, args.latency_ms, args.ms_per_token)
+    print(f"Fake Ollama listening on http://127.0.0.1:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
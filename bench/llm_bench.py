@@ -0,0 +1,144 @@
+# bench/llm_bench.py
+"""
+Measures the LLM gateway against direct, per-call Ollama requests using the fake Ollama server.
+
+    python -m bench.llm_bench --callers 16 --prompts 200 --duplicates 0.3
+
+"direct" opens a new HTTP request per generation with no coordination, like the original
+per-agent Ollama clients. "gateway" sends the same prompts through OllamaGateway: pooled
+keep-alive connections, a parallelism limit matching the server and coalescing of identical
+in-flight prompts. --duplicates is the share of prompts that repeat one another, as when many
+sessions ask the router about the same thing.
+
+Before timing anything it checks that concurrent identical prompts, which the gateway merges
+into one generation, each get the full answer through the LangChain LLM wrapper.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+import requests
+from bench.fake_ollama import start
+from bench.run import summarize
+from bench.scenarios import prompts
+from tools.llm_gateway import GatewayLLM, OllamaGateway
+
+MODEL = "llama3"
+
+def react_prompt(question: str) -> str:
+    return f"Answer with the right tool.\nshould be one of [sales_sql_read, finance_sql_read, inventory_sql_read]\n" \
+           f"Human: {question}\nThought:"
+
+def workload(count: int, duplicates: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    ranges = {"customer_id": 100000, "order_id": 1000000, "product_id": 5000, "invoice_id": 900000}
+    unique = [react_prompt(p) for _, p in prompts("mixed", count, ranges, seed)]
+    hot = unique[:max(1, count // 20)]
+    return [rng.choice(hot) if rng.random() < duplicates else prompt for prompt in unique]
+
+def direct_call(base_url: str) -> Callable[[str], str]:
+    def call(prompt: str) -> str:
+        text = ""
+        with requests.post(f"{base_url}/api/generate", json={"model": MODEL, "prompt": prompt, "stream": True},
+                           stream=True, timeout=300) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    text += json.loads(line).get("response", "")
+        return text
+    return call
+
+def drive(call: Callable[[str], str], work: List[str], callers: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def one(prompt: str):
+        start = time.perf_counter()
+        call(prompt)
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(one, work))
+    elapsed = time.perf_counter() - start
+    return {"duration_s": elapsed, "throughput_rps": len(work) / elapsed, "latency_ms": summarize(latencies)}
+
+def check_coalescing(base_url: str, callers: int = 8) -> List[str]:
+    """Runs `callers` identical prompts at once through GatewayLLM; returns the problems found."""
+    gateway = OllamaGateway(base_url, parallelism=2, batch_window_ms=50)
+    llm = GatewayLLM(gateway=gateway, model=MODEL)
+    prompt = react_prompt("How many units of product 7 are in stock?")
+    expected = direct_call(base_url)(prompt)
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(llm.invoke, prompt) for _ in range(callers)]
+    problems = []
+    for future in futures:
+        try:
+            answer = future.result()
+        except Exception as e:
+            problems.append(f"coalesced caller failed: {e!r}")
+            continue
+        if answer != expected:
+            problems.append(f"coalesced caller got {answer!r}, expected {expected!r}")
+    stats = gateway.stats()
+    if stats["generations"] != 1:
+        problems.append(f"{callers} identical prompts took {stats['generations']} generations, expected 1")
+    if stats["in_flight"]:
+        problems.append(f"{stats['in_flight']} generation(s) left in flight")
+    return problems
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.llm_bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--callers", type=int, default=16, help="concurrent callers (chat sessions)")
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--num-parallel", type=int, default=4, help="fake server's parallel slots")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--ms-per-token", type=float, default=2.0)
+    parser.add_argument("--batch-window-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    server = start(num_parallel=args.num_parallel, latency_ms=args.latency_ms, ms_per_token=args.ms_per_token)
+    problems = check_coalescing(f"http://127.0.0.1:{server.server_port}")
+    server.shutdown()
+    for problem in problems:
+        print(f"FAIL {problem}", file=sys.stderr)
+    if problems:
+        return 1
+
+    work = workload(args.prompts, args.duplicates, args.seed)
+    report = {"callers": args.callers, "prompts": len(work), "duplicates": args.duplicates}
+    for mode in ("direct", "gateway"):
+        server = start(num_parallel=args.num_parallel, latency_ms=args.latency_ms, ms_per_token=args.ms_per_token)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        gateway = None
+        if mode == "direct":
+            call = direct_call(base_url)
+        else:
+            gateway = OllamaGateway(base_url, parallelism=args.num_parallel, batch_window_ms=args.batch_window_ms)
+            call = lambda prompt: gateway.generate(MODEL, prompt)["text"]  # noqa: E731
+        result = drive(call, work, args.callers)
+        result["server"] = dict(server.counters)
+        if gateway is not None:
+            result["gateway"] = gateway.stats()
+        server.shutdown()
+        report[mode] = result
+        latency = result["latency_ms"]
+        print(f"{mode:8} {result['throughput_rps']:7.2f} req/s  p50={latency['p50']:.0f} ms  "
+              f"p95={latency['p95']:.0f} ms  p99={latency['p99']:.0f} ms  "
+              f"generations={result['server']['generations']} connections={result['server']['connections']}")
+    print(f"speed-up: {report['gateway']['throughput_rps'] / report['direct']['throughput_rps']:.2f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# bench/run.py
+"""
+Load benchmark for the /chat/ endpoint.
+
+    python -m bench.run --scenario mixed --concurrency 8 --requests 200
+    python -m bench.run --baseline bench/baseline.json      # exit 1 on a p95/throughput regression
+
+By default it generates the synthetic database if needed and starts the backend with the
+scripted LLM (bench.app) on a local port; --url targets an already running server instead.
+Latency percentiles and throughput come from the client side, the per-stage breakdown from
+the request traces the server records. Afterwards the analytics rollups, which the scripted
+writes updated through their triggers, are checked against a rebuild.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import requests
+from bench.dataset import generate
+from bench.scenarios import SCENARIOS, id_ranges, prompts
+
+STAGES = ("router", "agent", "llm", "sql_generation", "tool", "sql", "request")
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+    }
+
+class Server:
+    """Runs bench.app under uvicorn in a subprocess against the benchmark database."""
+
+    def __init__(self, db_path: str, port: int, llm_latency_ms: float, requests_total: int, log_path: str,
+                 startup_timeout: float = 300.0, workers: int = 1):
+        self.startup_timeout = startup_timeout
+        self.workers = workers
+        self.url = f"http://127.0.0.1:{port}"
+        self.port = port
+        self.log_path = log_path
+        self.env = dict(
+            os.environ,
+            ERP_DB_PATH=os.path.abspath(db_path),
+            ERP_BENCH_LLM_LATENCY_MS=str(llm_latency_ms),
+            # Keyword routing avoids downloading an embedding model in CI.
+            ERP_CLASSIFIER_BACKEND=os.getenv("ERP_CLASSIFIER_BACKEND", "keyword"),
+            ERP_GLOSSARY_SEMANTIC=os.getenv("ERP_GLOSSARY_SEMANTIC", "0"),
+            ERP_SESSION_STORE="memory",
+            ERP_TRACE_SAMPLE_RATE="1.0",
+            ERP_TRACE_BUFFER_SIZE=str(max(requests_total, 200)),
+            ERP_QUERY_LOG_PATH=os.path.abspath(db_path) + ".query_log",
+        )
+        if workers > 1:
+            db_path = os.path.abspath(db_path)
+            self.env.update(ERP_WORKERS=str(workers), ERP_BIND=f"127.0.0.1:{port}", ERP_SESSION_STORE="sqlite",
+                            ERP_SESSION_DB_PATH=db_path + ".sessions", ERP_SHARED_STORE_PATH=db_path + ".shared",
+                            ERP_WRITER_ADDRESS=db_path + ".writer.sock")
+        self.process = None
+
+    def __enter__(self):
+        log = open(self.log_path, "w")
+        if self.workers > 1:
+            # The multi-worker deployment: gunicorn workers plus the single writer process.
+            command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning",
+                       "bench.app:app"]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "bench.app:app", "--port", str(self.port),
+                       "--log-level", "warning"]
+        self.process = subprocess.Popen(command, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+        # Startup installs and backfills the rollups, which takes a while on large datasets.
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Benchmark server exited; see {self.log_path}")
+            try:
+                requests.get(self.url + "/", timeout=1).raise_for_status()
+                return self
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError(f"Benchmark server did not start; see {self.log_path}")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def drive(url: str, work: List[tuple], concurrency: int, timeout: float) -> List[dict]:
+    """Sends the prompts with `concurrency` client threads, one chat session per thread."""
+    items = iter(work)
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        session = requests.Session()
+        session_id = f"bench-{uuid.uuid4().hex[:8]}"
+        while True:
+            with lock:
+                item = next(items, None)
+            if item is None:
+                return
+            name, prompt = item
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{url}/chat/", json={"prompt": prompt, "session_id": session_id},
+                                        timeout=timeout)
+                status = response.status_code
+                body = response.json() if status == 200 else {}
+            except requests.RequestException as e:
+                status, body = type(e).__name__, {}
+            results.append({
+                "script": name,
+                "status": status,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "agent": body.get("agent_used"),
+                "trace_id": body.get("trace_id"),
+            })
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return results
+
+def stage_breakdown(url: str, trace_ids: List[str]) -> Dict[str, dict]:
+    """Per-request self time by span kind, summarised across the sampled traces."""
+    per_stage = {stage: [] for stage in STAGES}
+    for trace_id in trace_ids:
+        try:
+            trace = requests.get(f"{url}/traces/{trace_id}", timeout=10).json()
+        except (requests.RequestException, ValueError):
+            continue
+        breakdown = trace.get("breakdown_ms")
+        if not breakdown:
+            continue  # unknown to the worker that answered, or not sampled
+        for stage in STAGES:
+            per_stage[stage].append(breakdown.get(stage, 0.0))
+    return {stage: summarize(values) for stage, values in per_stage.items() if any(values)}
+
+def run(args) -> dict:
+    if not args.url and not os.path.exists(args.db):
+        print(f"Generating {args.db} with {args.orders} orders...", file=sys.stderr)
+        generate(args.db, args.orders, args.seed)
+    ranges = id_ranges(args.db)
+    work = prompts(args.scenario, args.warmup + args.requests, ranges, args.seed)
+    warmup, measured = work[:args.warmup], work[args.warmup:]
+
+    def measure(url: str) -> dict:
+        drive(url, warmup, args.concurrency, args.timeout)
+        start = time.perf_counter()
+        results = drive(url, measured, args.concurrency, args.timeout)
+        elapsed = time.perf_counter() - start
+        ok = [r for r in results if r["status"] == 200]
+        statuses = {}
+        for r in results:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+        by_script = {}
+        for name, group in itertools.groupby(sorted(ok, key=lambda r: r["script"]), key=lambda r: r["script"]):
+            latencies = [r["latency_ms"] for r in group]
+            by_script[name] = {"count": len(latencies), **summarize(latencies)}
+        report = {
+            "scenario": args.scenario,
+            "concurrency": args.concurrency,
+            "requests": len(results),
+            "succeeded": len(ok),
+            "statuses": statuses,
+            "duration_s": elapsed,
+            "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+            "latency_ms": summarize([r["latency_ms"] for r in ok]),
+            "scripts": by_script,
+            "stages_ms": stage_breakdown(url, [r["trace_id"] for r in ok if r["trace_id"]]),
+        }
+        for name in ("tools", "cache", "db", "router"):
+            try:
+                report[f"{name}_stats"] = requests.get(f"{url}/{name}/stats", timeout=10).json()
+            except (requests.RequestException, ValueError):
+                pass
+        return report
+
+    if args.url:
+        return measure(args.url.rstrip("/"))
+    with Server(args.db, args.port, args.llm_latency_ms, args.requests, args.server_log,
+                args.startup_timeout, args.workers) as server:
+        report = measure(server.url)
+    # The scripted writes went through the rollup triggers; they must still match a rebuild.
+    check = subprocess.run([sys.executable, "-m", "tools.rollups", "verify"], capture_output=True, text=True,
+                           env=dict(os.environ, ERP_DB_PATH=args.db))
+    report["rollups_consistent"] = check.returncode == 0
+    if check.returncode != 0:
+        print(check.stdout + check.stderr, file=sys.stderr)
+    return report
+
+def print_report(report: dict):
+    latency = report["latency_ms"]
+
+    def fmt(value) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    print(f"scenario={report['scenario']} concurrency={report['concurrency']} "
+          f"requests={report['requests']} ok={report['succeeded']} statuses={report['statuses']}")
+    print(f"throughput: {report['throughput_rps']:.2f} req/s")
+    print(f"latency ms: p50={fmt(latency['p50'])} p95={fmt(latency['p95'])} p99={fmt(latency['p99'])}")
+    print("stage self time ms (mean / p95):")
+    for stage, values in report["stages_ms"].items():
+        print(f"  {stage:15} {fmt(values['mean']):>9} / {fmt(values['p95'])}")
+    print("per script ms (p50 / p95):")
+    for name, values in report["scripts"].items():
+        print(f"  {name:18} n={values['count']:<5} {fmt(values['p50']):>9} / {fmt(values['p95'])}")
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    problems = []
+    for q in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"].get(q), report["latency_ms"].get(q)
+        if old and new and new > old * (1 + tolerance):
+            problems.append(f"latency {q} {new:.1f} ms vs baseline {old:.1f} ms")
+    old, new = baseline.get("throughput_rps"), report["throughput_rps"]
+    if old and new < old * (1 - tolerance):
+        problems.append(f"throughput {new:.2f} req/s vs baseline {old:.2f} req/s")
+    if report["succeeded"] < report["requests"]:
+        problems.append(f"{report['requests'] - report['succeeded']} requests failed: {report['statuses']}")
+    return problems
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Load benchmark for /chat/.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--db", default="bench/erp_bench.db")
+    parser.add_argument("--orders", type=int, default=10000, help="dataset scale if the database is generated")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated time per LLM call")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="run the multi-worker deployment (gunicorn.conf.py)")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--server-log", default="bench/server.log")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression vs the baseline")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if report.get("rollups_consistent") is False:
+        print("FAIL: analytics rollups drifted from a rebuild", file=sys.stderr)
+        return 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = regressions(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
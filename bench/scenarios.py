@@ -0,0 +1,123 @@
+# bench/scenarios.py
+"""
+Benchmark prompts and the scripted agent behaviour that goes with them.
+
+Each Script pairs a prompt template with the tool call the scripted LLM makes for it, so the
+load generator (which renders prompts) and the stand-in LLM (which only sees prompt text,
+possibly in another process) agree without sharing state.
+"""
+import random
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+@dataclass(frozen=True)
+class Script:
+    name: str
+    agent: str
+    prompt: str  # may use {customer_id}, {order_id}, {product_id}, {invoice_id}, {qty}, {amount}
+    tool: str
+    action_input: str
+    sql: Optional[str] = None  # what the text-to-SQL prompt returns, for text_to_sql_tool scripts
+
+    def pattern(self) -> re.Pattern:
+        parts = _PLACEHOLDER.split(self.prompt)
+        regex = "".join(re.escape(p) if i % 2 == 0 else rf"(?P<{p}>\d+(?:\.\d+)?)" for i, p in enumerate(parts))
+        return re.compile(rf"^{regex}$", re.IGNORECASE)
+
+SCRIPTS = [
+    Script("customer_orders", "sales_agent", "list the orders placed by customer {customer_id}", "sales_sql_read",
+           "SELECT order_id, order_date, status, total_amount FROM orders WHERE customer_id = {customer_id} "
+           "ORDER BY order_date DESC"),
+    Script("order_items", "sales_agent", "show the items in order {order_id}", "sales_sql_read",
+           "SELECT product_id, quantity, unit_price FROM order_items WHERE order_id = {order_id}"),
+    Script("update_customer", "sales_agent", "update the phone number of customer {customer_id} to 555{qty}",
+           "sales_sql_write", "UPDATE customers SET phone = '555{qty}' WHERE customer_id = {customer_id}"),
+    Script("customer_invoices", "finance_agent", "show the invoice and payment status for customer {customer_id}",
+           "finance_sql_read",
+           "SELECT invoice_id, amount, status, due_date FROM invoices WHERE customer_id = {customer_id}"),
+    Script("invoice_payments", "finance_agent", "list payments for invoice {invoice_id}", "finance_sql_read",
+           "SELECT payment_id, amount, payment_date FROM payments WHERE invoice_id = {invoice_id}"),
+    Script("record_payment", "finance_agent", "record a payment of {amount} for invoice {invoice_id}",
+           "finance_sql_write",
+           "INSERT INTO payments (invoice_id, amount, payment_date, method) "
+           "VALUES ({invoice_id}, {amount}, date('now'), 'bank transfer')"),
+    Script("product_stock", "inventory_agent", "what is the stock of product {product_id}", "inventory_sql_read",
+           "SELECT p.name, s.quantity FROM stock s JOIN products p ON p.product_id = s.product_id "
+           "WHERE s.product_id = {product_id}"),
+    Script("low_stock", "inventory_agent", "which products are below their reorder level", "inventory_sql_read",
+           "SELECT p.product_id, p.name, s.quantity, p.reorder_level FROM products p "
+           "JOIN stock s ON s.product_id = p.product_id WHERE s.quantity < p.reorder_level"),
+    Script("add_stock", "inventory_agent", "add {qty} units of product {product_id} to stock", "inventory_sql_write",
+           "UPDATE stock SET quantity = quantity + {qty} WHERE product_id = {product_id}"),
+    Script("total_revenue", "analytics_agent", "report the total revenue from all orders data", "text_to_sql_tool",
+           "report the total revenue from all orders data",
+           sql="SELECT SUM(total_amount) AS revenue FROM orders"),
+    Script("monthly_revenue", "analytics_agent", "give me a data report of revenue by month", "text_to_sql_tool",
+           "give me a data report of revenue by month",
+           sql="SELECT strftime('%Y-%m', order_date) AS month, SUM(total_amount) AS revenue "
+               "FROM orders GROUP BY 1 ORDER BY 1"),
+    Script("top_customers", "analytics_agent", "analytics report of the top 10 customers by revenue",
+           "text_to_sql_tool", "analytics report of the top 10 customers by revenue",
+           sql="SELECT customer_id, SUM(total_amount) AS revenue FROM orders GROUP BY customer_id "
+               "ORDER BY revenue DESC LIMIT 10"),
+    Script("glossary", "analytics_agent", "explain the analytics term churn rate", "glossary_read", "churn rate"),
+]
+
+_COMPILED = [(script, script.pattern()) for script in SCRIPTS]
+
+# Weights per script name; "cached" reuses a handful of ids so caches and memoization get hits.
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "mixed": {"customer_orders": 4, "order_items": 3, "update_customer": 1, "customer_invoices": 3,
+              "invoice_payments": 2, "record_payment": 1, "product_stock": 3, "low_stock": 1, "add_stock": 1,
+              "total_revenue": 1, "monthly_revenue": 1, "top_customers": 1, "glossary": 1},
+    "reads": {"customer_orders": 1, "order_items": 1, "customer_invoices": 1, "invoice_payments": 1,
+              "product_stock": 1, "low_stock": 1},
+    "writes": {"update_customer": 1, "record_payment": 1, "add_stock": 1},
+    "analytics": {"total_revenue": 1, "monthly_revenue": 1, "top_customers": 1, "glossary": 1},
+    "cached": {"customer_orders": 1, "customer_invoices": 1, "product_stock": 1, "total_revenue": 1},
+}
+CACHED_ID_POOL = 5
+
+def match(question: str) -> Optional[Tuple[Script, Dict[str, str]]]:
+    """Finds the script whose prompt produced `question` and the values it was rendered with."""
+    question = question.strip()
+    for script, pattern in _COMPILED:
+        found = pattern.match(question)
+        if found:
+            return script, found.groupdict()
+    return None
+
+def id_ranges(db_path: str) -> Dict[str, int]:
+    """Largest id per entity in the benchmark database, used to draw realistic prompt values."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return {
+            name: conn.execute(f"SELECT COALESCE(MAX({column}), 1) FROM {table}").fetchone()[0]
+            for name, table, column in (("customer_id", "customers", "customer_id"),
+                                        ("order_id", "orders", "order_id"),
+                                        ("product_id", "products", "product_id"),
+                                        ("invoice_id", "invoices", "invoice_id"))
+        }
+    finally:
+        conn.close()
+
+def prompts(scenario: str, count: int, ranges: Dict[str, int], seed: int = 0) -> List[Tuple[str, str]]:
+    """Deterministic list of (script name, prompt) pairs for a scenario."""
+    rng = random.Random(seed)
+    weights = SCENARIOS[scenario]
+    scripts = [s for s in SCRIPTS if s.name in weights]
+    cached = scenario == "cached"
+    rendered = []
+    for script in rng.choices(scripts, weights=[weights[s.name] for s in scripts], k=count):
+        values = {
+            name: rng.randrange(1, min(upper, CACHED_ID_POOL) + 1 if cached else upper + 1)
+            for name, upper in ranges.items()
+        }
+        values["qty"] = rng.randrange(1, 50)
+        values["amount"] = rng.randrange(10, 5000)
+        rendered.append((script.name, script.prompt.format(**values)))
+    return rendered
@@ -1,10 +1,14 @@
 # frontend.py
 
+import json
+import uuid
 import streamlit as st
 import requests
 
 # Define the backend API URL
-API_URL = "http://localhost:8000/chat/"
+STREAM_URL = "http://localhost:8000/chat/stream"
+ALERTS_URL = "http://localhost:8000/inventory/alerts"
+ALERTS_REFRESH_SECONDS = 30
 
 st.set_page_config(page_title="Helios Dynamics - Agent-Driven ERP", layout="wide")
 st.title("💡 Helios Dynamics Agent-Driven ERP")
@@ -14,6 +18,39 @@ st.caption("A modular, agent-driven platform to streamline your business operati
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Each browser session gets its own conversation memory on the backend
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
+def render_inventory_alerts():
+    # Served from the backend's reorder monitor; no agent or LLM call involved.
+    try:
+        alerts = requests.get(ALERTS_URL, params={"limit": 10}, timeout=2).json()
+    except (requests.exceptions.RequestException, ValueError):
+        st.caption("Inventory alerts are unavailable.")
+        return
+    count = alerts.get("low_stock_count", 0)
+    if not count:
+        st.success("All products are above their reorder level.")
+    else:
+        st.warning(f"{count} product(s) at or below their reorder level.")
+        for item in alerts["low_stock"]:
+            status = f"PO #{item['open_po']}" if item.get("open_po") else "no open PO"
+            st.markdown(f"- **{item['name']}**: {item['quantity']:g} on hand, "
+                        f"reorder at {item['reorder_level']:g} ({status})")
+    if alerts.get("recent_drafts"):
+        st.caption("Recently drafted purchase orders")
+        for draft in alerts["recent_drafts"][:5]:
+            st.markdown(f"- PO #{draft['po_id']}: {draft['quantity']} x {draft['name']}")
+
+with st.sidebar:
+    st.header("Inventory alerts")
+    # Newer Streamlit versions refresh just this part on a timer; older ones on every rerun.
+    if hasattr(st, "fragment"):
+        st.fragment(run_every=ALERTS_REFRESH_SECONDS)(render_inventory_alerts)()
+    else:
+        render_inventory_alerts()
+
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -26,22 +63,50 @@ if prompt := st.chat_input("What can I help you with?"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Send request to the backend API and get the response
-    with st.spinner("Thinking..."):
+    # Stream the agent's progress from the backend and render it as it arrives
+    with st.chat_message("assistant"):
+        header = st.empty()
+        header.markdown("_Routing your request..._")
+        steps = st.expander("Agent steps", expanded=False)
+        answer = st.empty()
+        streamed_answer = ""
+        agent_name = None
+        full_response = None
+
         try:
-            response = requests.post(API_URL, json={"prompt": prompt})
-            response_json = response.json()
-            agent_response = response_json["response"]
-            agent_name = response_json["agent_used"]
-            
-            full_response = f"**Agent Used:** `{agent_name}`\n\n{agent_response}"
-
-            # Add the agent's full response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": full_response})
-            
-            # Display the agent's response
-            with st.chat_message("assistant"):
-                st.markdown(full_response)
+            payload = {"prompt": prompt, "session_id": st.session_state.session_id}
+            with requests.post(STREAM_URL, json=payload, stream=True, timeout=(5, None)) as response:
+                if response.status_code != 200:
+                    retry = response.headers.get("Retry-After")
+                    hint = f" Please retry in {retry}s." if retry else ""
+                    st.error(f"The backend is busy ({response.status_code}).{hint}")
+                else:
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event["type"] == "route":
+                            agent_name = event["agent"]
+                            header.markdown(f"**Agent Used:** `{agent_name}`")
+                        elif event["type"] == "tool_call":
+                            steps.markdown(f"🔧 `{event['tool']}`: `{event['input']}`")
+                        elif event["type"] == "tool_result":
+                            steps.text(event["output"])
+                        elif event["type"] == "token":
+                            streamed_answer += event["text"]
+                            answer.markdown(streamed_answer + "▌")
+                        elif event["type"] == "final":
+                            agent_name = event["agent_used"]
+                            header.markdown(f"**Agent Used:** `{agent_name}`")
+                            answer.markdown(event["response"])
+                            full_response = f"**Agent Used:** `{agent_name}`\n\n{event['response']}"
+                        elif event["type"] == "error":
+                            answer.empty()
+                            st.error(event["detail"])
 
         except requests.exceptions.RequestException as e:
             st.error(f"Error connecting to the backend: {e}")
+
+    # Add the agent's full response to chat history
+    if full_response:
+        st.session_state.messages.append({"role": "assistant", "content": full_response})
@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+"""
+Multi-worker deployment of the backend:
+
+    gunicorn -c gunicorn.conf.py backend.main:app
+
+Each worker is a separate uvicorn process with its own agents and connection pool. What has
+to be shared goes through local files instead of module globals:
+- conversation memory uses the SQLite session store (database/sessions.db)
+- the text-to-SQL, result and tool memo caches, the ids behind /results download links and
+  the table write versions that keep the caches fresh live in the shared store
+  (database/shared.db)
+- every write is sent to one writer process (tools/write_queue.py), started here, so erp.db
+  never has more than one writer
+
+The app is not preloaded: SQLite connections must be opened after the fork, in each worker.
+"""
+import multiprocessing
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+bind = os.getenv("ERP_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("ERP_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Agent runs wait on the LLM for a long time.
+timeout = int(os.getenv("ERP_WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+preload_app = False
+
+# Inherited by the writer process and every worker.
+os.environ.setdefault("ERP_SESSION_STORE", "sqlite")
+os.environ.setdefault("ERP_SHARED_STORE_PATH", "database/shared.db")
+os.environ.setdefault("ERP_WRITER_ADDRESS", os.path.abspath("database/writer.sock"))
+os.environ.setdefault("ERP_WRITER_AUTHKEY", secrets.token_hex(16))
+
+_writer = None
+
+def on_starting(server):
+    global _writer
+    address = os.environ["ERP_WRITER_ADDRESS"]
+    os.makedirs(os.path.dirname(address), exist_ok=True)
+    if os.path.exists(address):
+        os.unlink(address)  # left over from an unclean shutdown
+    _writer = subprocess.Popen([sys.executable, "-m", "tools.write_queue"])
+    # Workers retry until the socket exists, but a writer that dies at startup should stop the deploy.
+    deadline = time.monotonic() + 60
+    while not os.path.exists(address):
+        if _writer.poll() is not None:
+            raise RuntimeError(f"writer process exited with status {_writer.returncode}")
+        if time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    server.log.info("Writer process %s listening on %s", _writer.pid, address)
+
+def on_exit(server):
+    if _writer is not None and _writer.poll() is None:
+        _writer.terminate()
+        try:
+            _writer.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _writer.kill()
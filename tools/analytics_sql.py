@@ -1,50 +1,98 @@
 # tools/analytics_sql.py
 import sqlite3
-import pandas as pd
-from tools.mcp_registry import BaseTool, mcp_registry
-from langchain_community.llms import Ollama
+import time
+from tools.mcp_registry import BaseTool, ToolPolicy, check_deadline, mcp_registry, tool_error
 from langchain.prompts import PromptTemplate
-
-DB_PATH = 'database/erp.db'
-llm = Ollama(model="llama3")
+from tools.db import db
+from tools.sql_cache import query_cache
+from tools.schema_catalog import schema_catalog
+from tools.glossary_index import glossary_index
+from tools.llm import get_llm
+from tools.query_result import keep_links_alive, run_query
+from tools import rollups
+from tools.tracing import tracer
 
 class TextToSQLTool(BaseTool):
     name = "text_to_sql_tool"
     description = "Converts a natural language question into a SQLite SQL query and executes it."
+    # Generated SQL can be arbitrarily expensive, so fewer of these run at once.
+    policy = ToolPolicy(max_concurrency=2)
     
     sql_prompt = PromptTemplate.from_template("""
     Given the database schema below, write a concise, valid SQLite SQL query that answers the user's question.
-    Tables: customers, orders, order_items, invoices, payments, glossary, stock.
+    Only use the tables and columns listed.
+    Schema:
+    {schema}
+    {rollups}
     Question: {question}
     SQL Query: 
     """)
 
+    def _generate_sql(self, user_question: str) -> str:
+        sql_query = query_cache.get_sql(user_question)
+        if sql_query is None:
+            start = time.perf_counter()
+            chain = self.sql_prompt | get_llm()
+            schema = schema_catalog.describe_for(user_question)
+            with tracer.span("text_to_sql", "sql_generation"):
+                sql_query = chain.invoke({"question": user_question, "schema": schema,
+                                          "rollups": rollups.prompt_hint(user_question)},
+                                         config={"callbacks": tracer.callbacks()})
+            sql_query = sql_query.strip().replace("```sql", "").replace("```", "").strip()
+            query_cache.put_sql(user_question, sql_query, (time.perf_counter() - start) * 1000)
+        return sql_query
+
     def run(self, user_question: str) -> str:
         try:
-            chain = self.sql_prompt | llm
-            sql_query = chain.invoke({"question": user_question}).strip().replace("```sql", "").replace("```", "")
-            
-            conn = sqlite3.connect(DB_PATH)
-            df = pd.read_sql_query(sql_query, conn)
-            conn.close()
-            return df.to_markdown(index=False)
+            sql_query = self._generate_sql(user_question)
+
+            # Catch invalid SQL locally before it is executed.
+            error = schema_catalog.validate(sql_query)
+            if error:
+                query_cache.forget_sql(user_question)
+                return (
+                    f"Generated SQL is invalid ({error}). Query: {sql_query}\n"
+                    f"Available schema:\n{schema_catalog.describe_for(user_question)}"
+                )
+
+            result = query_cache.get_result(sql_query)
+            if result is None or not keep_links_alive(result):
+                # Generation may have used up the time limit, and an expired limit cannot stop a
+                # query that has not started yet.
+                check_deadline()
+                start = time.perf_counter()
+                versions = query_cache.versions_for(sql_query)
+                try:
+                    result = run_query(sql_query, source=self.name).to_prompt()
+                except Exception:
+                    query_cache.forget_sql(user_question)
+                    raise
+                query_cache.put_result(sql_query, result, (time.perf_counter() - start) * 1000, versions)
+            return result
         except Exception as e:
-            return f"Error translating or executing SQL: {e}"
+            return tool_error("Error translating or executing SQL", e)
 
 class GlossaryReadTool(BaseTool):
     name = "glossary_read"
-    description = "Retrieves the definition of a specific business term from the glossary table."
+    description = (
+        "Retrieves the definition of a business term from the glossary table. "
+        "Tolerates synonyms and typos: without an exact entry it returns the closest terms."
+    )
+    # Not memoized: the index is already in memory and, unlike the memo, notices glossary
+    # edits made outside the app.
 
     def run(self, term: str) -> str:
+        term = term.strip().strip("'\"")
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT definition FROM glossary WHERE term = ?", (term,))
-            result = cursor.fetchone()
-            conn.close()
-            return result[0] if result else f"Term '{term}' not found."
+            matches = glossary_index.search(term)
         except sqlite3.Error as e:
-            return f"SQL Error: {e}"
+            return tool_error("SQL Error", e)
+        if not matches:
+            return f"Term '{term}' not found."
+        if matches[0].exact:
+            return matches[0].definition
+        lines = [f"- {m.term}: {m.definition}" for m in matches]
+        return f"No exact glossary entry for '{term}'. Closest terms:\n" + "\n".join(lines)
 
 mcp_registry.register(TextToSQLTool())
 mcp_registry.register(GlossaryReadTool())
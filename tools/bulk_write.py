@@ -0,0 +1,175 @@
+# tools/bulk_write.py
+import csv
+import io
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence
+from tools.db import db
+
+BULK_CHUNK_SIZE = int(os.getenv("ERP_BULK_CHUNK_SIZE", "500"))
+OPERATIONS = ("insert", "upsert", "update", "delete")
+MAX_REPORTED_ERRORS = 10
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class BatchError(ValueError):
+    pass
+
+def _valid_identifier(name) -> bool:
+    # CSV rows longer than the header have a None column.
+    return isinstance(name, str) and bool(_IDENTIFIER.match(name))
+
+def _check_identifier(name: str) -> str:
+    if not _valid_identifier(name):
+        raise BatchError(f"Invalid identifier: {name!r}")
+    return name
+
+def _quote(name: str) -> str:
+    return f'"{name}"'
+
+def _build_statement(table: str, operation: str, columns: Sequence[str], key: Sequence[str]) -> str:
+    values = [c for c in columns if c not in key]
+    column_list = ", ".join(_quote(c) for c in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    where = " AND ".join(f"{_quote(k)} = ?" for k in key)
+    if operation == "insert":
+        return f"INSERT INTO {_quote(table)} ({column_list}) VALUES ({placeholders})"
+    if operation == "upsert":
+        updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in values)
+        action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        conflict = ", ".join(_quote(k) for k in key)
+        return f"INSERT INTO {_quote(table)} ({column_list}) VALUES ({placeholders}) ON CONFLICT ({conflict}) {action}"
+    if operation == "update":
+        if not values:
+            raise BatchError("update rows need at least one column besides the key")
+        assignments = ", ".join(f"{_quote(c)} = ?" for c in values)
+        return f"UPDATE {_quote(table)} SET {assignments} WHERE {where}"
+    return f"DELETE FROM {_quote(table)} WHERE {where}"
+
+def _params(operation: str, row: Dict, columns: Sequence[str], key: Sequence[str]) -> tuple:
+    if operation in ("insert", "upsert"):
+        return tuple(row.get(c) for c in columns)
+    if operation == "update":
+        return tuple(row.get(c) for c in columns if c not in key) + tuple(row[k] for k in key)
+    return tuple(row[k] for k in key)
+
+def write_rows(table: str, operation: str, rows: List[Dict], key: Optional[Sequence[str]] = None,
+               allowed_tables=None, chunk_size: int = BULK_CHUNK_SIZE, source: str = None) -> dict:
+    """
+    Applies a structured batch of writes through the shared writer connection.
+    Rows are grouped by column set, run with executemany and committed every `chunk_size`
+    rows, so a large import costs a handful of transactions instead of one per row.
+    Returns a summary with one outcome per input row. A malformed batch raises BatchError
+    before anything is written; problems with single rows are reported in their outcomes.
+    """
+    if not isinstance(operation, str) or operation.lower() not in OPERATIONS:
+        raise BatchError(f"Unsupported operation {operation!r}; expected one of {', '.join(OPERATIONS)}")
+    operation = operation.lower()
+    table = _check_identifier(table)
+    if allowed_tables is not None and table not in allowed_tables:
+        raise BatchError(f"Table '{table}' is not writable by this tool.")
+    if not isinstance(rows, list):
+        raise BatchError("'rows' must be a list of objects")
+    if key is not None and not isinstance(key, (list, tuple)):
+        raise BatchError("'key' must be a column name or a list of column names")
+    key = [_check_identifier(k) for k in (key or [])]
+    if operation != "insert" and not key:
+        raise BatchError(f"{operation} needs a 'key' listing the column(s) that identify a row")
+    if db.write_forwarder is not None:
+        return db.write_forwarder.write_rows(table, operation, rows, key, allowed_tables, chunk_size, source)
+
+    outcomes = [None] * len(rows)
+    for start in range(0, len(rows), chunk_size):
+        chunk = list(enumerate(rows[start:start + chunk_size], start))
+        # Rows with the same columns share one prepared statement.
+        groups = {}
+        for index, row in chunk:
+            if not isinstance(row, dict) or not row:
+                outcomes[index] = {"row": index, "ok": False, "error": "row must be a non-empty object"}
+                continue
+            invalid = [c for c in row if not _valid_identifier(c)]
+            if invalid:
+                outcomes[index] = {"row": index, "ok": False, "error": f"invalid column name(s): {invalid}"}
+                continue
+            missing = [k for k in key if k not in row]
+            if missing:
+                outcomes[index] = {"row": index, "ok": False, "error": f"missing key column(s): {missing}"}
+                continue
+            if operation == "update" and all(c in key for c in row):
+                outcomes[index] = {"row": index, "ok": False, "error": "no columns to update besides the key"}
+                continue
+            groups.setdefault(tuple(row), []).append((index, row))
+
+        with db.write_connection() as conn:
+            for columns, members in groups.items():
+                statement = _build_statement(table, operation, columns, key)
+                params = [_params(operation, row, columns, key) for _, row in members]
+                group_start = time.perf_counter()
+                for (index, _), (ok, error) in zip(members, db.execute_many(conn, statement, params)):
+                    outcomes[index] = {"row": index, "ok": ok, "error": error}
+                db.record_query(statement, (time.perf_counter() - group_start) * 1000, len(params), "write", source)
+
+    failed = [o for o in outcomes if not o["ok"]]
+    return {
+        "table": table,
+        "operation": operation,
+        "rows": len(rows),
+        "succeeded": len(rows) - len(failed),
+        "failed": len(failed),
+        "outcomes": outcomes,
+    }
+
+def parse_batch(payload: str) -> Optional[dict]:
+    """
+    Recognises a JSON batch passed to a write tool instead of raw SQL:
+        {"table": "orders", "operation": "insert", "rows": [{...}, ...]}
+        {"table": "stock", "operation": "update", "key": ["product_id"], "csv": "product_id,quantity\\n1,40"}
+    Returns None when the payload is not a batch and raises BatchError for a malformed one.
+    """
+    text = (payload or "").strip()
+    if not text.startswith("{"):
+        return None
+    try:
+        batch = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(batch, dict) or "table" not in batch or "operation" not in batch:
+        return None
+    if "csv" in batch:
+        if not isinstance(batch["csv"], str):
+            raise BatchError("'csv' must be a string with a header line")
+        # An empty field is a missing value: NULL, so NOT NULL columns fail that row.
+        batch["rows"] = [{column: None if value == "" else value for column, value in row.items()}
+                         for row in csv.DictReader(io.StringIO(batch.pop("csv")))]
+    key = batch.get("key")
+    batch["key"] = [key] if isinstance(key, str) else key
+    batch.setdefault("rows", [])
+    return batch
+
+def summarize(result: dict) -> str:
+    """Compact text form of a write_rows result for the agent's context."""
+    text = (f"Batch {result['operation']} on {result['table']}: {result['succeeded']} of "
+            f"{result['rows']} rows succeeded, {result['failed']} failed.")
+    errors = [o for o in result["outcomes"] if not o["ok"]][:MAX_REPORTED_ERRORS]
+    if errors:
+        text += " Errors: " + "; ".join(f"row {o['row']}: {o['error']}" for o in errors)
+    return text
+
+class BatchWriteMixin:
+    """Adds the structured batch API to a SQL write tool; `tables` lists what it may write."""
+    tables: frozenset = frozenset()
+
+    def write_rows(self, table: str, operation: str, rows: List[Dict], key: Optional[Sequence[str]] = None) -> dict:
+        return write_rows(table, operation, rows, key, allowed_tables=self.tables, source=getattr(self, "name", None))
+
+    def run_batch(self, payload: str) -> Optional[str]:
+        """Runs the payload if it is a JSON/CSV batch and returns its summary, otherwise None."""
+        try:
+            batch = parse_batch(payload)
+            if batch is None:
+                return None
+            return summarize(self.write_rows(batch["table"], batch["operation"], batch["rows"], batch["key"]))
+        except (BatchError, KeyError) as e:
+            return f"Batch Error: {e}"
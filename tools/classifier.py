@@ -1,21 +1,205 @@
 # tools/classifier.py
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
 from .mcp_registry import BaseTool, mcp_registry
 
+logger = logging.getLogger(__name__)
+
+GENERAL_PURPOSE = "general_purpose"
+
+# "embedding" uses the FAISS nearest-neighbour backend, "keyword" the original keyword matcher.
+CLASSIFIER_BACKEND = os.getenv("ERP_CLASSIFIER_BACKEND", "embedding")
+INTENT_INDEX_PATH = os.getenv("ERP_INTENT_INDEX_PATH", "database/intent_index.faiss")
+
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "sales_agent": ["customer", "lead", "order", "sale", "crm"],
+    "analytics_agent": ["report", "analytics", "data", "insights"],
+    "finance_agent": ["invoice", "payment", "finance", "ledger"],
+    "inventory_agent": ["inventory", "stock", "product", "reorder"],
+}
+
+# Labelled example prompts used to build the embedding index.
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "sales_agent": [
+        "show all customers",
+        "create a new lead with a name 'Ahmed' and email 'ahmed@example.com'",
+        "list the orders placed by customer 5",
+        "update the phone number of customer 12",
+        "add a new order for customer 3 with two items",
+        "which leads have not been contacted yet",
+        "delete the lead with id 7",
+        "show the items in order 42",
+        "open a support ticket for customer 9",
+        "what is the status of my order",
+    ],
+    "analytics_agent": [
+        "what is the total revenue from all orders?",
+        "explain the term 'sales pipeline'",
+        "show revenue by month for this year",
+        "who are our top 10 customers by sales volume",
+        "give me a report on average order value",
+        "what does churn rate mean",
+        "compare this quarter's sales with last quarter",
+        "which product category grew the most",
+        "how many orders did we get per day last week",
+        "give me insights on customer retention",
+    ],
+    "finance_agent": [
+        "list all invoices",
+        "create a new invoice for customer with ID 1",
+        "show invoices for customer 3",
+        "which invoices are overdue",
+        "record a payment of 500 for invoice 17",
+        "mark invoice 8 as paid",
+        "show the ledger entries for March",
+        "how much does customer 4 still owe us",
+        "list payments received this week",
+        "cancel invoice 21",
+    ],
+    "inventory_agent": [
+        "show me the current stock levels for all products",
+        "add 10 units of product 'P-101' to stock",
+        "which products are below their reorder point",
+        "create a purchase order for 50 units of product 3",
+        "list all products from supplier Acme",
+        "remove 5 units of product P-200 from the warehouse",
+        "what is the stock of product P-101",
+        "update the reorder level for product 12",
+        "show pending purchase orders",
+        "add a new product called steel bolts",
+    ],
+}
+
+class KeywordIntentBackend:
+    def classify(self, user_prompt: str) -> Tuple[str, float]:
+        """
+        Returns the best matching agent and a confidence score in [0, 1].
+        The confidence is the share of matched keywords that point to the winning agent,
+        so a tie between two agents (or no match at all) never scores above 0.5.
+        """
+        user_prompt_lower = user_prompt.lower()
+        scores = {
+            agent: sum(1 for k in keywords if k in user_prompt_lower)
+            for agent, keywords in INTENT_KEYWORDS.items()
+        }
+        total = sum(scores.values())
+        if total == 0:
+            return GENERAL_PURPOSE, 0.0
+
+        # Keep the original keyword order as the tie-breaker.
+        best_agent = max(scores, key=lambda agent: scores[agent])
+        runner_up = max(score for agent, score in scores.items() if agent != best_agent)
+        if runner_up == scores[best_agent]:
+            return best_agent, 0.5 * scores[best_agent] / total
+        return best_agent, scores[best_agent] / total
+
+    def classify_many(self, user_prompts: List[str]) -> List[Tuple[str, float]]:
+        return [self.classify(p) for p in user_prompts]
+
+class EmbeddingIntentBackend:
+    """
+    Nearest-neighbour intent classifier over an in-memory FAISS index of labelled examples.
+    The index is persisted next to the database and reused on restart as long as the
+    examples and embedding model have not changed.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]] = INTENT_EXAMPLES, index_path: str = INTENT_INDEX_PATH,
+                 k: int = 5, min_similarity: float = 0.35):
+        import faiss
+        from tools.embeddings import EMBEDDING_MODEL
+
+        self._faiss = faiss
+        self.k = k
+        self.min_similarity = min_similarity
+        self.index_path = index_path
+        self.labels = [agent for agent, prompts in examples.items() for _ in prompts]
+        texts = [prompt for prompts in examples.values() for prompt in prompts]
+        self.fingerprint = hashlib.sha256(
+            json.dumps({"model": EMBEDDING_MODEL, "examples": examples}, sort_keys=True).encode()
+        ).hexdigest()
+        self.index = self._load_index() or self._build_index(texts)
+
+    def _meta_path(self) -> str:
+        return self.index_path + ".json"
+
+    def _load_index(self):
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") != self.fingerprint:
+                return None
+            index = self._faiss.read_index(self.index_path)
+            return index if index.ntotal == len(self.labels) else None
+        except (OSError, ValueError, RuntimeError):
+            return None
+
+    def _build_index(self, texts: List[str]):
+        from tools.embeddings import embed
+
+        vectors = embed(texts)
+        index = self._faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            self._faiss.write_index(index, self.index_path)
+            with open(self._meta_path(), "w") as f:
+                json.dump({"fingerprint": self.fingerprint}, f)
+        except (OSError, RuntimeError) as e:
+            logger.warning("Could not persist intent index: %s", e)
+        return index
+
+    def _vote(self, similarities, neighbours) -> Tuple[str, float]:
+        votes = defaultdict(float)
+        for similarity, idx in zip(similarities, neighbours):
+            if idx < 0 or similarity < self.min_similarity:
+                continue
+            votes[self.labels[idx]] += float(similarity)
+        if not votes:
+            return GENERAL_PURPOSE, 0.0
+        best_agent = max(votes, key=votes.get)
+        return best_agent, votes[best_agent] / sum(votes.values())
+
+    def classify_many(self, user_prompts: List[str]) -> List[Tuple[str, float]]:
+        from tools.embeddings import embed
+
+        if not user_prompts:
+            return []
+        similarities, neighbours = self.index.search(embed(user_prompts), self.k)
+        return [self._vote(s, n) for s, n in zip(similarities, neighbours)]
+
+    def classify(self, user_prompt: str) -> Tuple[str, float]:
+        return self.classify_many([user_prompt])[0]
+
+def build_backend(name: str = CLASSIFIER_BACKEND):
+    if name == "embedding":
+        try:
+            return EmbeddingIntentBackend()
+        except (ImportError, OSError, RuntimeError) as e:
+            # Missing packages, or a model that cannot be downloaded or loaded.
+            logger.warning("Embedding classifier unavailable (%s); falling back to keyword matching.", e)
+    return KeywordIntentBackend()
+
 class IntentClassifierTool(BaseTool):
     name = "intent_classifier"
     description = "Classifies a user's prompt to determine the correct domain agent (e.g., sales, finance, analytics)."
+    fallback_label = GENERAL_PURPOSE
+
+    def __init__(self, backend=None):
+        self.backend = backend or build_backend()
+
+    def classify(self, user_prompt: str) -> Tuple[str, float]:
+        """Returns the best matching agent and a confidence score in [0, 1]."""
+        return self.backend.classify(user_prompt)
+
+    def classify_many(self, user_prompts: List[str]) -> List[Tuple[str, float]]:
+        """Batch variant of classify, used for offline evaluation."""
+        return self.backend.classify_many(user_prompts)
 
     def run(self, user_prompt: str) -> str:
-        user_prompt_lower = user_prompt.lower()
-        if any(k in user_prompt_lower for k in ["customer", "lead", "order", "sale", "crm"]):
-            return "sales_agent"
-        elif any(k in user_prompt_lower for k in ["report", "analytics", "data", "insights"]):
-            return "analytics_agent"
-        elif any(k in user_prompt_lower for k in ["invoice", "payment", "finance", "ledger"]):
-            return "finance_agent"
-        elif any(k in user_prompt_lower for k in ["inventory", "stock", "product", "reorder"]):
-            return "inventory_agent"
-        else:
-            return "general_purpose"
+        return self.classify(user_prompt)[0]
 
 mcp_registry.register(IntentClassifierTool())
@@ -0,0 +1,293 @@
+# tools/db.py
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from tools.shared_store import shared_store
+
+DB_PATH = os.getenv("ERP_DB_PATH", "database/erp.db")
+
+# Pragmas applied to every connection. mmap/cache sizes are per connection.
+CONNECTION_PRAGMAS = {
+    "busy_timeout": int(os.getenv("ERP_DB_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("ERP_DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("ERP_DB_CACHE_SIZE", str(-64 * 1024))),  # negative = KiB
+    "temp_store": "MEMORY",
+}
+# Authorizer action codes that mean a statement modifies data or schema.
+_DATA_WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+_SCHEMA_WRITE_ACTIONS = {
+    sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_ALTER_TABLE,
+    sqlite3.SQLITE_CREATE_INDEX, sqlite3.SQLITE_DROP_INDEX,
+    sqlite3.SQLITE_CREATE_VIEW, sqlite3.SQLITE_DROP_VIEW,
+    sqlite3.SQLITE_CREATE_TRIGGER, sqlite3.SQLITE_DROP_TRIGGER,
+}
+# Pseudo table bumped on schema changes; every cached result depends on it.
+ANY_TABLE = "*"
+
+# Pragmas that only make sense on the writer connection (WAL is persistent in the file).
+WRITER_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+}
+
+class ConnectionPool:
+    """
+    Shared connection manager for all SQL tools.
+    Readers get one read-only (mode=ro) connection per thread that is reused across calls;
+    writers share a single connection serialised behind a lock, so concurrent writes queue
+    here instead of failing with 'database is locked'.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._read_connections = []
+        self._readers_by_thread = {}
+        self._table_versions = {}
+        self._query_observers = []
+        self._pending_tables = set()
+        # Set by tools.write_queue in worker processes: writes are sent to the writer process.
+        self.write_forwarder = None
+        self._stats = {
+            "read_hits": 0,
+            "read_misses": 0,
+            "writes": 0,
+            "write_errors": 0,
+            "write_wait_ms_total": 0.0,
+            "write_wait_ms_max": 0.0,
+        }
+
+    def _apply_pragmas(self, conn: sqlite3.Connection, pragmas: dict):
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            with self._init_lock:
+                if self._writer is None:
+                    os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                    # Statements are not cached so the authorizer sees every write it prepares.
+                    conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                           cached_statements=0)
+                    self._apply_pragmas(conn, WRITER_PRAGMAS)
+                    self._apply_pragmas(conn, CONNECTION_PRAGMAS)
+                    conn.set_authorizer(self._track_writes)
+                    self._writer = conn
+        return self._writer
+
+    def _track_writes(self, action, arg1, arg2, db_name, source):
+        # Runs while statements are prepared on the writer, including trigger bodies.
+        if action in _DATA_WRITE_ACTIONS and arg1 and not arg1.startswith("sqlite_"):
+            self._pending_tables.add(arg1.lower())
+        elif action in _SCHEMA_WRITE_ACTIONS:
+            self._pending_tables.add(ANY_TABLE)
+        return sqlite3.SQLITE_OK
+
+    def _track_reads(self, action, arg1, arg2, db_name, source):
+        # Runs while tables_read compiles a statement, including the views it selects from.
+        if action == sqlite3.SQLITE_READ and arg1 and not arg1.startswith("sqlite_"):
+            self._local.tables_read.add(arg1.lower())
+        return sqlite3.SQLITE_OK
+
+    def _open_reader(self, **kwargs) -> sqlite3.Connection:
+        # Make sure the file exists and is in WAL mode before opening it read-only.
+        self._get_writer()
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, **kwargs)
+        self._apply_pragmas(conn, CONNECTION_PRAGMAS)
+        return conn
+
+    def _count(self, key: str, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    @contextmanager
+    def read_connection(self):
+        """Yields this thread's pooled read-only connection."""
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            self._count("read_misses")
+            conn = self._open_reader()
+            self._local.reader = conn
+            with self._stats_lock:
+                self._read_connections.append(conn)
+                self._readers_by_thread[threading.get_ident()] = conn
+        else:
+            self._count("read_hits")
+        try:
+            yield conn
+        finally:
+            # Never leave a read transaction open on a pooled connection.
+            if conn.in_transaction:
+                conn.rollback()
+
+    def tables_read(self, sql_query: str) -> set:
+        """
+        The tables a query reads, as SQLite reports them to an authorizer while compiling it
+        (under EXPLAIN, so nothing runs). Unlike parsing the SQL this sees comma joins,
+        subqueries and the tables behind views. Empty if the query does not compile.
+        """
+        conn = getattr(self._local, "planner", None)
+        if conn is None:
+            # Statements are not cached so the authorizer sees every prepare.
+            conn = self._open_reader(cached_statements=0)
+            conn.set_authorizer(self._track_reads)
+            self._local.planner = conn
+            with self._stats_lock:
+                self._read_connections.append(conn)
+        self._local.tables_read = tables = set()
+        try:
+            conn.execute(f"EXPLAIN {sql_query}").close()
+        except (sqlite3.Error, sqlite3.Warning):
+            return set()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+        return tables
+
+    def open_reader(self) -> sqlite3.Connection:
+        """A read-only connection outside the pool, owned and closed by the caller."""
+        return self._open_reader()
+
+    @contextmanager
+    def dedicated_reader(self):
+        """Yields a private read-only connection, closed afterwards (for long-running streams)."""
+        conn = self._open_reader()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def write_connection(self):
+        """
+        Yields the single writer connection inside a transaction.
+        Commits when the block succeeds and rolls back if it raises.
+        """
+        conn = self._get_writer()
+        start = time.perf_counter()
+        with self._writer_lock:
+            waited_ms = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self._stats["write_wait_ms_total"] += waited_ms
+                self._stats["write_wait_ms_max"] = max(self._stats["write_wait_ms_max"], waited_ms)
+            self._pending_tables.clear()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+                self._count("writes")
+                self._bump_table_versions(self._pending_tables)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                self._count("write_errors")
+                raise
+            finally:
+                self._pending_tables.clear()
+
+    def execute_write(self, query: str, params=(), source: str = None) -> int:
+        """Runs a single write statement through the serialised writer and returns the row count."""
+        start = time.perf_counter()
+        if self.write_forwarder is not None:
+            rowcount = self.write_forwarder.execute(query, params)
+        else:
+            with self.write_connection() as conn:
+                rowcount = conn.execute(query, params).rowcount
+        self.record_query(query, (time.perf_counter() - start) * 1000, rowcount, "write", source)
+        return rowcount
+
+    def observe_queries(self, observer):
+        """Registers observer(sql, duration_ms, rows, kind, source), called after each tool query."""
+        self._query_observers.append(observer)
+
+    def record_query(self, sql_query: str, duration_ms: float, rows: int, kind: str, source: str = None):
+        for observer in self._query_observers:
+            try:
+                observer(sql_query, duration_ms, rows, kind, source)
+            except Exception:
+                # Observability must never break a query.
+                pass
+
+    def interrupt(self, thread_id: int):
+        """Aborts whatever query the given thread's read connection is running (safe from any thread)."""
+        with self._stats_lock:
+            conn = self._readers_by_thread.get(thread_id)
+        if conn is not None:
+            conn.interrupt()
+
+    def execute_many(self, conn: sqlite3.Connection, query: str, param_rows: list) -> list:
+        """
+        Runs one statement for many parameter rows on the writer connection, inside the
+        caller's transaction. Returns one (ok, error) pair per row: the fast path is a single
+        executemany; if that fails, the rows are replayed one by one under savepoints so only
+        the failing rows are skipped.
+        """
+        conn.execute("SAVEPOINT batch")
+        try:
+            conn.executemany(query, param_rows)
+            conn.execute("RELEASE batch")
+            return [(True, None)] * len(param_rows)
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO batch")
+            conn.execute("RELEASE batch")
+
+        outcomes = []
+        for params in param_rows:
+            conn.execute("SAVEPOINT row")
+            try:
+                conn.execute(query, params)
+                outcomes.append((True, None))
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO row")
+                outcomes.append((False, str(e)))
+            conn.execute("RELEASE row")
+        return outcomes
+
+    def _bump_table_versions(self, tables):
+        if shared_store is not None:
+            shared_store.bump_versions(tables)
+            return
+        with self._stats_lock:
+            for table in tables:
+                self._table_versions[table] = self._table_versions.get(table, 0) + 1
+
+    def table_versions(self, tables) -> dict:
+        """
+        Returns the write version of each table plus the schema pseudo table: in-process, or
+        from the shared store when several worker processes share one writer.
+        A cached value built from these tables is stale once any of the versions moves.
+        """
+        if shared_store is not None:
+            return shared_store.versions(set(tables) | {ANY_TABLE})
+        with self._stats_lock:
+            return {t: self._table_versions.get(t, 0) for t in set(tables) | {ANY_TABLE}}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+            snapshot["read_connections"] = len(self._read_connections)
+        reads = snapshot["read_hits"] + snapshot["read_misses"]
+        snapshot["read_hit_ratio"] = (snapshot["read_hits"] / reads) if reads else 0.0
+        attempts = snapshot["writes"] + snapshot["write_errors"]
+        snapshot["write_wait_ms_avg"] = (snapshot["write_wait_ms_total"] / attempts) if attempts else 0.0
+        return snapshot
+
+    def close_all(self):
+        with self._stats_lock:
+            for conn in self._read_connections:
+                conn.close()
+            self._read_connections.clear()
+            self._readers_by_thread.clear()
+        self._local = threading.local()
+        with self._init_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+db = ConnectionPool()
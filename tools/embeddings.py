@@ -0,0 +1,33 @@
+# tools/embeddings.py
+import os
+import threading
+from typing import List
+
+EMBEDDING_MODEL = os.getenv("ERP_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_embedding_model():
+    """
+    Returns the process-wide SentenceTransformer, loading it on first use.
+    All embedding users (intent classifier, schema catalog, glossary) share this instance.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _model
+
+def embed(texts: List[str]):
+    """Encodes texts into L2-normalised float32 vectors, so inner product equals cosine similarity."""
+    model = get_embedding_model()
+    return model.encode(
+        texts,
+        batch_size=64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    ).astype("float32")
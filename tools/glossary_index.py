@@ -0,0 +1,186 @@
+# tools/glossary_index.py
+import difflib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+from tools.db import db
+
+logger = logging.getLogger(__name__)
+
+# "0" skips the embedding index (no model download); lookups then rank on lexical matches only.
+GLOSSARY_SEMANTIC = os.getenv("ERP_GLOSSARY_SEMANTIC", "1") == "1"
+GLOSSARY_TOP_K = int(os.getenv("ERP_GLOSSARY_TOP_K", "3"))
+# Matches scoring below this are not worth showing the model.
+GLOSSARY_MIN_SCORE = float(os.getenv("ERP_GLOSSARY_MIN_SCORE", "0.35"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Question filler that would otherwise match half the definitions.
+_STOPWORDS = {
+    "a", "an", "and", "the", "of", "in", "for", "to", "is", "are", "what", "whats", "does", "do",
+    "mean", "means", "meaning", "define", "definition", "term", "explain", "by", "we", "our",
+}
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+class GlossaryMatch:
+    def __init__(self, term: str, definition: str, score: float, exact: bool = False):
+        self.term = term
+        self.definition = definition
+        self.score = score
+        self.exact = exact
+
+    def to_dict(self) -> dict:
+        return {"term": self.term, "definition": self.definition, "score": round(self.score, 3), "exact": self.exact}
+
+class GlossaryIndex:
+    """
+    In-memory search over the glossary table. Each lookup ranks every term on three signals:
+    an FTS5 index (word and prefix matches over term and definition), a fuzzy match on the
+    term itself (typos, word order) and, when sentence-transformers is available, embedding
+    similarity (synonyms such as "sales funnel" for "sales pipeline").
+    The index is rebuilt on the first lookup after the glossary table changes, including
+    edits made outside the app; unchanged entries keep their embeddings.
+    """
+
+    def __init__(self, semantic: bool = GLOSSARY_SEMANTIC):
+        self.semantic = semantic
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._entries: List[Tuple[str, str]] = []
+        self._by_term: Dict[str, int] = {}
+        self._fts = None
+        self._vectors = None
+        self._vector_cache: Dict[str, object] = {}
+        self._stats = {"builds": 0, "build_ms": 0.0, "lookups": 0, "exact_hits": 0, "semantic": semantic}
+
+    def _build_fts(self, entries: List[Tuple[str, str]]) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute(
+            "CREATE VIRTUAL TABLE glossary_fts USING fts5(term, definition, tokenize='porter unicode61', prefix='2 3')"
+        )
+        conn.executemany("INSERT INTO glossary_fts(rowid, term, definition) VALUES (?, ?, ?)",
+                         [(i, term, definition) for i, (term, definition) in enumerate(entries)])
+        return conn
+
+    def _embed_entries(self, entries: List[Tuple[str, str]]):
+        if not self.semantic or not entries:
+            return None
+        try:
+            from tools.embeddings import embed
+            import numpy as np
+
+            texts = [f"{term}: {definition}" for term, definition in entries]
+            missing = [text for text in texts if text not in self._vector_cache]
+            if missing:
+                self._vector_cache.update(zip(missing, embed(missing)))
+            self._vector_cache = {text: self._vector_cache[text] for text in texts}
+            return np.stack([self._vector_cache[text] for text in texts])
+        except (ImportError, OSError) as e:
+            logger.warning("Glossary embeddings unavailable, using lexical search only: %s", e)
+            self.semantic = False
+            self._stats["semantic"] = False
+            return None
+
+    def refresh(self, force: bool = False):
+        """
+        Rebuilds the index if the glossary table changed since the last build. PRAGMA
+        data_version moves whenever another connection commits to the file, whether it is
+        this app's writer or an external tool, so until then a lookup costs one pragma. After
+        a commit the rows are re-read and the index is only rebuilt if they differ.
+        """
+        with self._lock:
+            if self._conn is None:
+                # data_version is only comparable on the same connection, so keep one.
+                self._conn = db.open_reader()
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if not force and version == self._data_version:
+                return
+            start = time.perf_counter()
+            entries = self._conn.execute("SELECT term, definition FROM glossary ORDER BY term").fetchall()
+            entries = [(str(term), str(definition)) for term, definition in entries]
+            # Recorded after the read: a commit in between moves it again and is picked up next time.
+            self._data_version = version
+            if not force and self._fts is not None and entries == self._entries:
+                return
+            if self._fts is not None:
+                self._fts.close()
+            self._fts = self._build_fts(entries)
+            self._vectors = self._embed_entries(entries)
+            self._entries = entries
+            self._by_term = {_normalize(term): i for i, (term, _) in enumerate(entries)}
+            self._stats["builds"] += 1
+            self._stats["build_ms"] = (time.perf_counter() - start) * 1000
+
+    def _fts_scores(self, words: List[str]) -> Dict[int, float]:
+        # Each word also matches as a prefix ("invoic" -> "invoice", "invoices").
+        terms = [f'"{word}"*' for word in words if word not in _STOPWORDS]
+        if not terms:
+            return {}
+        rows = self._fts.execute(
+            "SELECT rowid, bm25(glossary_fts, 10.0, 1.0) FROM glossary_fts WHERE glossary_fts MATCH ? LIMIT 50",
+            (" OR ".join(terms),),
+        ).fetchall()
+        if not rows:
+            return {}
+        # bm25 is negative, lower is better; scale to (0, 1] relative to the best hit.
+        best = min(rank for _, rank in rows) or -1.0
+        return {rowid: rank / best for rowid, rank in rows}
+
+    def _fuzzy_score(self, query: str, words: List[str], term: str) -> float:
+        whole = difflib.SequenceMatcher(None, query, term).ratio()
+        term_words = term.split()
+        content = [w for w in words if w not in _STOPWORDS] or words
+        if not content or not term_words:
+            return whole
+        # Best match per term word, so extra words in the question don't drown a typo'd term.
+        per_word = sum(
+            max(difflib.SequenceMatcher(None, word, term_word).ratio() for word in content)
+            for term_word in term_words
+        ) / len(term_words)
+        return max(whole, per_word)
+
+    def search(self, query: str, k: int = GLOSSARY_TOP_K, min_score: float = GLOSSARY_MIN_SCORE) -> List[GlossaryMatch]:
+        """Returns up to k matches, best first. An exact term match always ranks first with score 1."""
+        self.refresh()
+        normalized = _normalize(query)
+        with self._lock:
+            self._stats["lookups"] += 1
+            entries, vectors = self._entries, self._vectors
+            exact = self._by_term.get(normalized)
+            if exact is not None:
+                self._stats["exact_hits"] += 1
+            words = normalized.split()
+            fts = self._fts_scores(words) if words else {}
+        if not entries or not normalized:
+            return []
+
+        semantic = None
+        if vectors is not None:
+            from tools.embeddings import embed
+            semantic = vectors @ embed([query])[0]
+
+        matches = []
+        for i, (term, definition) in enumerate(entries):
+            if i == exact:
+                matches.append(GlossaryMatch(term, definition, 1.0, exact=True))
+                continue
+            lexical = 0.5 * self._fuzzy_score(normalized, words, _normalize(term)) + 0.5 * fts.get(i, 0.0)
+            score = 0.6 * float(semantic[i]) + 0.4 * lexical if semantic is not None else lexical
+            if score >= min_score:
+                matches.append(GlossaryMatch(term, definition, score))
+        matches.sort(key=lambda m: -m.score)
+        return matches[:k]
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["terms"] = len(self._entries)
+        return snapshot
+
+glossary_index = GlossaryIndex()
@@ -0,0 +1,269 @@
+# tools/index_advisor.py
+"""
+Recommends indexes for erp.db from the queries recorded in the query log.
+
+    python -m tools.index_advisor                  # show recommendations and before/after latency
+    python -m tools.index_advisor --apply          # also create the recommended indexes
+    python -m tools.index_advisor --foreign-keys   # include unindexed foreign-key columns
+
+Recommendations are measured by replaying the logged SELECTs inside a writer transaction
+before and after creating the indexes; without --apply the transaction is rolled back.
+"""
+import argparse
+import re
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from tools.db import db
+from tools.query_log import query_log, fingerprint
+from tools.schema_catalog import schema_catalog
+
+MAX_INDEX_COLUMNS = 5
+
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+\"?(\w+)\"?(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|JOIN|LEFT|RIGHT|INNER|OUTER|CROSS|"
+    r"NATURAL|GROUP|ORDER|LIMIT|HAVING|UNION|EXCEPT|INTERSECT)\b)(\w+))?",
+    re.IGNORECASE,
+)
+_COLUMN = r"(?:(\w+)\.)?\"?(\w+)\"?"
+_JOIN_EQUALITY = re.compile(rf"{_COLUMN}\s*=\s*{_COLUMN}")
+_EQUALITY = re.compile(rf"{_COLUMN}\s*(?:=|\bIN\b|\bIS\b)", re.IGNORECASE)
+_RANGE = re.compile(rf"{_COLUMN}\s*(?:<=|>=|<|>|\bBETWEEN\b|\bLIKE\s+'[^%_'])", re.IGNORECASE)
+_CLAUSE = re.compile(r"\b(?:WHERE|ON|HAVING)\b(.*?)(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bJOIN\b|\bUNION\b|$)",
+                     re.IGNORECASE | re.DOTALL)
+_SELECT_LIST = re.compile(r"^\s*SELECT\s+(?:DISTINCT\s+)?(.*?)\bFROM\b", re.IGNORECASE | re.DOTALL)
+_ORDER_GROUP = re.compile(r"\b(?:GROUP|ORDER)\s+BY\b(.*?)(?=\bLIMIT\b|\bHAVING\b|\bORDER\b|$)",
+                          re.IGNORECASE | re.DOTALL)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+class TableUsage:
+    """Columns of one table that a query filters, joins, ranges over and reads."""
+
+    def __init__(self):
+        self.equality: List[str] = []
+        self.range: List[str] = []
+        self.read: List[str] = []
+
+    def add(self, bucket: List[str], column: str):
+        if column not in bucket:
+            bucket.append(column)
+
+    def index_columns(self, rowid: Optional[str] = None) -> List[str]:
+        """
+        Equality columns first, then one range column; covering columns only if the index stays small.
+        The rowid alias is never added for coverage because every index entry already carries it.
+        """
+        key = list(self.equality)
+        for column in self.range:
+            if column not in key:
+                key.append(column)
+                break
+        covering = [c for c in self.read if c not in key and c != rowid]
+        if key and len(key) + len(covering) <= MAX_INDEX_COLUMNS:
+            key += covering
+        return key
+
+class Recommendation:
+    def __init__(self, table: str, columns: Tuple[str, ...]):
+        self.table = table
+        self.columns = columns
+        self.queries = 0
+        self.total_ms = 0.0
+        self.reason = "query workload"
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    def statement(self) -> str:
+        columns = ", ".join(f'"{c}"' for c in self.columns)
+        return f'CREATE INDEX IF NOT EXISTS "{self.name}" ON "{self.table}" ({columns})'
+
+def _resolve(qualifier: Optional[str], column: str, aliases: Dict[str, str], columns: Dict[str, Set[str]]) -> Optional[str]:
+    """Maps an (alias, column) reference to its table, or None when it is ambiguous or unknown."""
+    column = column.lower()
+    if qualifier:
+        table = aliases.get(qualifier.lower())
+        return table if table and column in columns.get(table, ()) else None
+    owners = [t for t in set(aliases.values()) if column in columns.get(t, ())]
+    return owners[0] if len(owners) == 1 else None
+
+def analyze(sql_query: str, columns: Dict[str, Set[str]], scanned: Optional[List[str]] = None) -> Dict[str, TableUsage]:
+    """
+    Extracts per-table equality, range and read columns from a SELECT (best effort, regex based).
+    `scanned` limits the result to the tables (or aliases) the query plan reads with a full scan.
+    """
+    text = _STRING.sub("?", sql_query)
+    aliases = {}
+    for match in _TABLE_REF.finditer(text):
+        table = match.group(1).lower()
+        if table in columns:
+            aliases[table] = table
+            if match.group(2):
+                aliases[match.group(2).lower()] = table
+    usage = defaultdict(TableUsage)
+
+    def note(bucket_name: str, qualifier, column):
+        table = _resolve(qualifier, column, aliases, columns)
+        if table:
+            usage[table].add(getattr(usage[table], bucket_name), column.lower())
+
+    for clause in _CLAUSE.findall(text):
+        for match in _JOIN_EQUALITY.finditer(clause):
+            note("equality", match.group(1), match.group(2))
+            note("equality", match.group(3), match.group(4))
+        for match in _EQUALITY.finditer(clause):
+            note("equality", match.group(1), match.group(2))
+        for match in _RANGE.finditer(clause):
+            note("range", match.group(1), match.group(2))
+    select_list = _SELECT_LIST.search(text)
+    read_parts = [select_list.group(1)] if select_list else []
+    read_parts += _ORDER_GROUP.findall(text)
+    for part in read_parts:
+        if "*" in part.replace("COUNT(*)", "").replace("count(*)", ""):
+            continue
+        for match in re.finditer(_COLUMN, part):
+            note("read", match.group(1), match.group(2))
+    if scanned is not None:
+        scanned_tables = {aliases.get(name.lower(), name.lower()) for name in scanned}
+        return {table: u for table, u in usage.items() if table in scanned_tables}
+    return dict(usage)
+
+def _existing_indexes(conn: sqlite3.Connection, table: str) -> List[List[str]]:
+    indexes = []
+    for row in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        indexes.append([r[2].lower() for r in conn.execute(f'PRAGMA index_info("{row[1]}")').fetchall() if r[2]])
+    # Candidate table names are lower-cased; the catalog keeps them as declared.
+    info = next((t for name, t in schema_catalog.tables().items() if name.lower() == table.lower()), None)
+    primary = [name.lower() for name, _, is_pk in info.columns if is_pk] if info is not None else []
+    if len(primary) == 1:
+        indexes.append(primary)
+    return indexes
+
+def _covered(columns: Tuple[str, ...], existing: List[List[str]]) -> bool:
+    """An index is redundant if an existing one starts with the same columns."""
+    return any(index[:len(columns)] == list(columns) for index in existing)
+
+def workload(limit: int = 200) -> List[tuple]:
+    """
+    Logged SELECT shapes with a full scan, hottest first:
+    (fingerprint, sample_sql, count, avg_ms, scanned_tables).
+    """
+    query_log.flush()
+    conn = query_log.connect()
+    try:
+        return conn.execute(
+            "SELECT fingerprint, MAX(sql), COUNT(*), AVG(duration_ms), MAX(full_scan) FROM query_log "
+            "WHERE kind = 'read' AND full_scan IS NOT NULL GROUP BY fingerprint "
+            "ORDER BY COUNT(*) * AVG(duration_ms) DESC LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+def recommend(entries: List[tuple], include_foreign_keys: bool = False) -> List[Recommendation]:
+    tables = schema_catalog.tables()
+    columns = {name.lower(): {c[0].lower() for c in info.columns} for name, info in tables.items()}
+    rowids = {}
+    for name, info in tables.items():
+        primary = [(c[0].lower(), c[1].upper()) for c in info.columns if c[2]]
+        if len(primary) == 1 and primary[0][1] == "INTEGER":
+            rowids[name.lower()] = primary[0][0]
+    candidates: Dict[Tuple[str, Tuple[str, ...]], Recommendation] = {}
+    for _, sql_query, count, avg_ms, scanned in entries:
+        for table, usage in analyze(sql_query, columns, scanned.split(",")).items():
+            index_columns = tuple(usage.index_columns(rowids.get(table)))
+            if not index_columns:
+                continue
+            rec = candidates.setdefault((table, index_columns), Recommendation(table, index_columns))
+            rec.queries += count
+            rec.total_ms += count * avg_ms
+    if include_foreign_keys:
+        for name, info in tables.items():
+            for column, ref_table, _ in info.foreign_keys:
+                key = (name.lower(), (column.lower(),))
+                if key not in candidates:
+                    candidates[key] = Recommendation(key[0], key[1])
+                    candidates[key].reason = f"foreign key to {ref_table}"
+
+    with db.read_connection() as conn:
+        existing = {table: _existing_indexes(conn, table) for table in {t for t, _ in candidates}}
+    ranked = sorted(candidates.values(), key=lambda r: r.total_ms, reverse=True)
+    chosen = []
+    for rec in ranked:
+        # Prefer the hottest candidate per leading column; narrower ones it covers are dropped.
+        if _covered(rec.columns, existing[rec.table]):
+            continue
+        existing[rec.table].append(list(rec.columns))
+        chosen.append(rec)
+    return chosen
+
+def _time_queries(conn: sqlite3.Connection, samples: List[str], repeat: int = 3) -> Dict[str, float]:
+    timings = {}
+    for sql_query in samples:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                conn.execute(sql_query).fetchall()
+            except sqlite3.Error:
+                break
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        if best is not None:
+            timings[sql_query] = best
+    return timings
+
+class _Rollback(Exception):
+    pass
+
+def evaluate(recommendations: List[Recommendation], samples: List[str], apply: bool = False) -> Tuple[dict, dict]:
+    """
+    Times the sample queries, creates the indexes and times them again in one writer
+    transaction. The indexes are committed only when `apply` is set.
+    """
+    before, after = {}, {}
+    try:
+        with db.write_connection() as conn:
+            before = _time_queries(conn, samples)
+            for rec in recommendations:
+                conn.execute(rec.statement())
+            conn.execute("ANALYZE")
+            after = _time_queries(conn, samples)
+            if not apply:
+                raise _Rollback()
+    except _Rollback:
+        pass
+    return before, after
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tools.index_advisor", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    parser.add_argument("--top", type=int, default=10, help="maximum number of indexes to recommend")
+    parser.add_argument("--samples", type=int, default=20, help="logged queries replayed for timing")
+    parser.add_argument("--foreign-keys", action="store_true", help="also index unindexed foreign-key columns")
+    args = parser.parse_args(argv)
+
+    entries = workload()
+    recommendations = recommend(entries, args.foreign_keys)[:args.top]
+    if not recommendations:
+        print(f"No index recommendations ({len(entries)} full-scan query shapes in the log).")
+        return 0
+    for rec in recommendations:
+        detail = f"{rec.queries} queries, {rec.total_ms:.1f} ms total" if rec.queries else rec.reason
+        print(f"{rec.statement()};  -- {detail}")
+
+    samples = [entry[1] for entry in entries[:args.samples]]
+    before, after = evaluate(recommendations, samples, args.apply)
+    if samples:
+        print("\nReplayed workload (best of 3, ms):")
+        for sql_query in samples:
+            if sql_query in before and sql_query in after:
+                print(f"  {before[sql_query]:9.2f} -> {after[sql_query]:9.2f}  {fingerprint(sql_query)[:100]}")
+        print(f"  total: {sum(before.values()):.2f} -> {sum(after.values()):.2f}")
+    print("\nIndexes created." if args.apply else "\nDry run; re-run with --apply to create these indexes.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
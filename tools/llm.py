@@ -0,0 +1,73 @@
+# tools/llm.py
+import logging
+import os
+import threading
+import time
+import requests
+from langchain_community.llms import Ollama
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_MODEL = os.getenv("ERP_OLLAMA_MODEL", "llama3")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_KEEP_ALIVE = os.getenv("ERP_OLLAMA_KEEP_ALIVE", "30m")
+# "1" sends every generation through the shared OllamaGateway; "0" uses a plain Ollama client.
+LLM_GATEWAY = os.getenv("ERP_LLM_GATEWAY", "1") == "1"
+
+_llm = None
+_gateway = None
+_llm_lock = threading.Lock()
+warmup_report = {"status": "not_run"}
+
+def get_gateway():
+    """Returns the shared OllamaGateway (pooled connections, coalescing, parallelism limit)."""
+    global _gateway
+    if _gateway is None:
+        with _llm_lock:
+            if _gateway is None:
+                from tools.llm_gateway import OllamaGateway
+                _gateway = OllamaGateway(OLLAMA_BASE_URL)
+    return _gateway
+
+def get_llm():
+    """Returns the LLM client shared by every agent and tool, creating it on first use."""
+    global _llm
+    if _llm is None:
+        gateway = get_gateway() if LLM_GATEWAY else None
+        with _llm_lock:
+            if _llm is None:
+                if gateway is not None:
+                    from tools.llm_gateway import GatewayLLM
+                    _llm = GatewayLLM(gateway=gateway, model=OLLAMA_MODEL, keep_alive=OLLAMA_KEEP_ALIVE)
+                else:
+                    _llm = Ollama(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE)
+    return _llm
+
+def llm_stats() -> dict:
+    return get_gateway().stats() if _gateway is not None else {"gateway": LLM_GATEWAY, "generations": 0}
+
+def set_llm(llm):
+    """Replaces the shared LLM (e.g. with a scripted stand-in for benchmarks)."""
+    global _llm
+    with _llm_lock:
+        _llm = llm
+
+def warm_up(timeout: float = 300.0) -> dict:
+    """
+    Asks Ollama to load the model into memory without generating anything, so the first
+    chat request does not pay the model load time.
+    """
+    start = time.perf_counter()
+    try:
+        response = requests.post(
+            f"{OLLAMA_BASE_URL}/api/generate",
+            json={"model": OLLAMA_MODEL, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        warmup_report.update(status="ok", error=None)
+    except requests.RequestException as e:
+        logger.warning("Ollama warm-up failed: %s", e)
+        warmup_report.update(status="failed", error=str(e))
+    warmup_report["duration_ms"] = (time.perf_counter() - start) * 1000
+    return warmup_report
@@ -0,0 +1,205 @@
+# tools/llm_gateway.py
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, LLMResult
+
+logger = logging.getLogger(__name__)
+
+# Generations sent to Ollama at once; match the server's OLLAMA_NUM_PARALLEL.
+LLM_PARALLELISM = int(os.getenv("ERP_LLM_PARALLELISM", "4"))
+# Extra time a new generation waits before it is sent, so identical prompts arriving within
+# the window share it. 0 only merges prompts that are already in flight.
+LLM_BATCH_WINDOW_MS = float(os.getenv("ERP_LLM_BATCH_WINDOW_MS", "0"))
+LLM_TIMEOUT = float(os.getenv("ERP_LLM_TIMEOUT", "300"))
+
+class _Generation:
+    """One request to Ollama and every caller waiting on it."""
+
+    def __init__(self, key: str, payload: dict):
+        self.key = key
+        self.payload = payload
+        self.subscribers: List[queue.Queue] = []
+        self.text = ""
+        self.enqueued_at = time.perf_counter()
+
+class OllamaGateway:
+    """
+    Shared access to the Ollama server for every agent and tool. It keeps a pool of
+    keep-alive HTTP connections and runs at most `parallelism` generations at once, queueing
+    the rest. Identical prompts (same model, prompt, stop words and options) that are in
+    flight at the same time are sent once and the result is fanned out to every caller,
+    including the streamed tokens.
+    """
+
+    def __init__(self, base_url: str, parallelism: int = LLM_PARALLELISM,
+                 batch_window_ms: float = LLM_BATCH_WINDOW_MS, timeout: float = LLM_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.parallelism = parallelism
+        self.batch_window = batch_window_ms / 1000
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=parallelism)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="ollama")
+        self._in_flight: Dict[str, _Generation] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0, "generations": 0, "errors": 0, "running": 0,
+                       "max_running": 0, "queue_ms_total": 0.0, "generation_ms_total": 0.0,
+                       "prompt_tokens": 0, "completion_tokens": 0}
+
+    @staticmethod
+    def _key(payload: dict) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def generate(self, model: str, prompt: str, stop: Optional[List[str]] = None, options: Optional[dict] = None,
+                 keep_alive: Optional[str] = None, on_token: Callable[[str], None] = None) -> dict:
+        """
+        Generates a completion and returns Ollama's final response fields plus the full "text".
+        Tokens are passed to `on_token` on the calling thread as they arrive.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": dict(options or {})}
+        if stop:
+            payload["options"]["stop"] = list(stop)
+        if keep_alive:
+            payload["keep_alive"] = keep_alive
+        key = self._key(payload)
+        inbox = queue.Queue()
+        with self._lock:
+            self._stats["calls"] += 1
+            generation = self._in_flight.get(key)
+            if generation is not None:
+                self._stats["coalesced"] += 1
+                # Catch up on what has streamed so far.
+                if generation.text:
+                    inbox.put(("token", generation.text))
+                generation.subscribers.append(inbox)
+            else:
+                generation = _Generation(key, payload)
+                generation.subscribers.append(inbox)
+                self._in_flight[key] = generation
+                self._executor.submit(self._run, generation)
+
+        while True:
+            kind, value = inbox.get()
+            if kind == "token":
+                if on_token is not None:
+                    on_token(value)
+            elif kind == "done":
+                return value
+            else:
+                raise value
+
+    def _publish(self, generation: _Generation, message: tuple):
+        for inbox in generation.subscribers:
+            inbox.put(message)
+
+    def _run(self, generation: _Generation):
+        try:
+            self._generate(generation)
+        except Exception as e:
+            # Never leave the key in _in_flight: later identical prompts would wait on it forever.
+            logger.exception("LLM generation failed")
+            with self._lock:
+                if self._in_flight.get(generation.key) is generation:
+                    del self._in_flight[generation.key]
+                    self._stats["errors"] += 1
+                    self._publish(generation, ("error", e))
+
+    def _generate(self, generation: _Generation):
+        if self.batch_window:
+            remaining = generation.enqueued_at + self.batch_window - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+        start = time.perf_counter()
+        with self._lock:
+            self._stats["running"] += 1
+            self._stats["max_running"] = max(self._stats["max_running"], self._stats["running"])
+            self._stats["queue_ms_total"] += (start - generation.enqueued_at) * 1000
+        final = {}
+        error = None
+        try:
+            with self.session.post(f"{self.base_url}/api/generate", json=generation.payload,
+                                   stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise ValueError(chunk["error"])
+                    token = chunk.get("response", "")
+                    if token:
+                        with self._lock:
+                            generation.text += token
+                            self._publish(generation, ("token", token))
+                    if chunk.get("done"):
+                        final = chunk
+        except Exception as e:  # HTTP errors, Ollama error chunks and anything unexpected
+            error = e
+        with self._lock:
+            # Callers arriving from now on start a new generation.
+            self._in_flight.pop(generation.key, None)
+            self._stats["running"] -= 1
+            self._stats["generations"] += 1
+            self._stats["generation_ms_total"] += (time.perf_counter() - start) * 1000
+            if error is not None:
+                self._stats["errors"] += 1
+                self._publish(generation, ("error", error))
+                return
+            self._stats["prompt_tokens"] += final.get("prompt_eval_count") or 0
+            self._stats["completion_tokens"] += final.get("eval_count") or 0
+            final = {k: v for k, v in final.items() if k not in ("response", "context")}
+            final["text"] = generation.text
+            for inbox in generation.subscribers:
+                # A copy each, so one caller changing its result does not affect the others.
+                inbox.put(("done", dict(final)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["in_flight"] = len(self._in_flight)
+        generations = snapshot["generations"]
+        snapshot["parallelism"] = self.parallelism
+        snapshot["batch_window_ms"] = self.batch_window * 1000
+        snapshot["coalesced_ratio"] = (snapshot["coalesced"] / snapshot["calls"]) if snapshot["calls"] else 0.0
+        snapshot["queue_ms_avg"] = (snapshot["queue_ms_total"] / generations) if generations else 0.0
+        snapshot["generation_ms_avg"] = (snapshot["generation_ms_total"] / generations) if generations else 0.0
+        return snapshot
+
+class GatewayLLM(LLM):
+    """LangChain LLM that sends its generations through an OllamaGateway."""
+    gateway: Any
+    model: str
+    keep_alive: Optional[str] = None
+    options: Dict[str, Any] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "ollama-gateway"
+
+    def _complete(self, prompt: str, stop: Optional[List[str]], run_manager) -> dict:
+        on_token = run_manager.on_llm_new_token if run_manager is not None else None
+        return self.gateway.generate(self.model, prompt, stop, self.options, self.keep_alive, on_token)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        return self._complete(prompt, stop, run_manager)["text"]
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> LLMResult:
+        generations = []
+        for prompt in prompts:
+            final = self._complete(prompt, stop, run_manager)
+            info = {k: v for k, v in final.items() if k != "text"}
+            generations.append([Generation(text=final["text"], generation_info=info)])
+        return LLMResult(generations=generations)
@@ -1,10 +1,22 @@
 # tools/mcp_registry.py
-from typing import Dict, Type
+import functools
+import importlib
+import logging
+import threading
+import time
+from typing import Dict, Optional, Type
 from abc import ABC, abstractmethod
+# ToolError, check_deadline and tool_error are re-exported for the tool modules.
+from tools.tool_policy import (ToolError, ToolPolicy, ToolRunner, check_deadline,  # noqa: F401
+                               resolve_policy, tool_error)
+
+logger = logging.getLogger(__name__)
 
 class BaseTool(ABC):
     name: str
     description: str
+    # Execution limits applied by the registry; None means the defaults.
+    policy: Optional[ToolPolicy] = None
 
     @abstractmethod
     def run(self, **kwargs):
@@ -13,10 +25,47 @@ class BaseTool(ABC):
 class ToolRegistry:
     def __init__(self):
         self._tools: Dict[str, BaseTool] = {}
+        self._modules: Dict[str, dict] = {}
+        self._runners: Dict[str, ToolRunner] = {}
+        self._lock = threading.RLock()
 
-    def register(self, tool: BaseTool):
+    def register(self, tool: BaseTool, policy: ToolPolicy = None):
+        """
+        Registers a tool and wraps its run method with its policy (concurrency limit, timeout,
+        output cap, memoization) and a tracing span. The policy comes from the argument, the
+        tool's `policy` attribute or the defaults, with ERP_TOOL_POLICIES overrides on top.
+        """
+        self._instrument(tool, resolve_policy(tool.name, policy or tool.policy))
         self._tools[tool.name] = tool
-        print(f"Tool '{tool.name}' registered.")
+        logger.debug("Tool '%s' registered.", tool.name)
+
+    def _instrument(self, tool: BaseTool, policy: ToolPolicy):
+        runner = ToolRunner(tool.name, tool.run, policy, getattr(tool, "tables_read", None))
+
+        @functools.wraps(runner._run)
+        def governed_run(*args, **kwargs):
+            return runner(*args, **kwargs)
+
+        tool.run = governed_run
+        self._runners[tool.name] = runner
+
+    def load(self, module_name: str):
+        """
+        Imports a tool module (which registers its tools) once, recording how long the
+        import took and which tools it provided.
+        """
+        if module_name in self._modules:
+            return
+        with self._lock:
+            if module_name in self._modules:
+                return
+            before = set(self._tools)
+            start = time.perf_counter()
+            importlib.import_module(module_name)
+            self._modules[module_name] = {
+                "import_ms": (time.perf_counter() - start) * 1000,
+                "tools": sorted(set(self._tools) - before),
+            }
 
     def get_tool(self, tool_name: str) -> BaseTool:
         tool = self._tools.get(tool_name)
@@ -24,4 +73,12 @@ class ToolRegistry:
             raise ValueError(f"Tool '{tool_name}' not found.")
         return tool
 
+    def load_report(self) -> dict:
+        with self._lock:
+            return {name: dict(info) for name, info in self._modules.items()}
+
+    def tool_stats(self) -> dict:
+        """Per-tool call counts, latency percentiles, queueing, timeouts and memo hit rates."""
+        return {name: runner.report() for name, runner in sorted(self._runners.items())}
+
 mcp_registry = ToolRegistry()
@@ -0,0 +1,138 @@
+# tools/query_log.py
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from tools.db import db
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_ENABLED = os.getenv("ERP_QUERY_LOG", "1") == "1"
+QUERY_LOG_PATH = os.getenv("ERP_QUERY_LOG_PATH", "database/query_log.db")
+QUERY_LOG_MAX_ROWS = int(os.getenv("ERP_QUERY_LOG_MAX_ROWS", "100000"))
+PLAN_CACHE_SIZE = 1024
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+def fingerprint(sql_query: str) -> str:
+    """Normalises a statement by replacing literals with '?' and collapsing whitespace."""
+    return re.sub(r"\s+", " ", _LITERAL.sub("?", sql_query)).strip().rstrip(";").lower()
+
+def full_scans(plan: List[str]) -> List[str]:
+    """Tables the plan reads with a full scan (no index, no rowid lookup)."""
+    tables = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if match and "USING" not in detail and match.group(1) not in ("CONSTANT", "SUBQUERY"):
+            tables.append(match.group(1))
+    return tables
+
+def explain(sql_query: str) -> Optional[List[str]]:
+    """EXPLAIN QUERY PLAN details for a statement, or None if it cannot be planned read-only."""
+    try:
+        with db.read_connection() as conn:
+            return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql_query}").fetchall()]
+    except sqlite3.Error:
+        return None
+
+class QueryLog:
+    """
+    Records every tool query with its timing and query plan in a separate SQLite file,
+    flagging full table scans. Plans are cached per statement fingerprint and rows are
+    written by a background thread, so the tool call only pays for one cached lookup.
+    """
+
+    def __init__(self, path: str = QUERY_LOG_PATH):
+        self.path = path
+        self._plans = OrderedDict()
+        self._plans_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.dropped = 0
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_log ("
+            "id INTEGER PRIMARY KEY, ts REAL NOT NULL, kind TEXT, source TEXT, fingerprint TEXT NOT NULL, "
+            "sql TEXT NOT NULL, duration_ms REAL NOT NULL, rows INTEGER, plan TEXT, full_scan TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_query_log_fingerprint ON query_log(fingerprint)")
+        return conn
+
+    def _plan_for(self, key: str, sql_query: str) -> Optional[List[str]]:
+        with self._plans_lock:
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                return self._plans[key]
+        plan = explain(sql_query)
+        with self._plans_lock:
+            self._plans[key] = plan
+            while len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    def record(self, sql_query: str, duration_ms: float, rows: int, kind: str, source: str = None):
+        key = fingerprint(sql_query)
+        plan = self._plan_for(key, sql_query)
+        scans = full_scans(plan or [])
+        entry = (time.time(), kind, source, key, sql_query, duration_ms, rows,
+                 "\n".join(plan) if plan else None, ",".join(scans) or None)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="query-log", daemon=True)
+                    self._thread.start()
+
+    def _write_loop(self):
+        conn = self.connect()
+        written = 0
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO query_log (ts, kind, source, fingerprint, sql, duration_ms, rows, plan, full_scan) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                written += len(batch)
+                if written >= 1000:
+                    written = 0
+                    with conn:
+                        conn.execute("DELETE FROM query_log WHERE id <= (SELECT MAX(id) FROM query_log) - ?",
+                                     (QUERY_LOG_MAX_ROWS,))
+            except sqlite3.Error as e:
+                logger.warning("Could not write query log: %s", e)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0):
+        """Waits until queued entries are written (used by the advisor and tests)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+query_log = QueryLog()
+
+if QUERY_LOG_ENABLED:
+    db.observe_queries(query_log.record)
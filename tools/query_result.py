@@ -0,0 +1,225 @@
+# tools/query_result.py
+import csv
+import io
+import os
+import re
+import time
+import uuid
+from typing import Iterator, List, Optional
+from tools.db import db
+from tools.sql_cache import make_cache
+
+PREVIEW_ROWS = int(os.getenv("ERP_RESULT_PREVIEW_ROWS", "20"))
+FETCH_PAGE_SIZE = int(os.getenv("ERP_RESULT_FETCH_PAGE_SIZE", "1000"))
+# Upper bound on rows scanned to build the summary, so one huge SELECT cannot stall a tool call.
+SUMMARY_SCAN_LIMIT = int(os.getenv("ERP_RESULT_SUMMARY_SCAN_LIMIT", "100000"))
+RESULT_STORE_SIZE = int(os.getenv("ERP_RESULT_STORE_SIZE", "256"))
+RESULT_STORE_TTL = float(os.getenv("ERP_RESULT_STORE_TTL", "3600"))
+MAX_CELL_CHARS = 80
+
+_RESULT_LINK = re.compile(r"/results/([0-9a-f]{32})")
+
+class ColumnSummary:
+    def __init__(self, name: str):
+        self.name = name
+        self.non_null = 0
+        self.numeric = True
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+
+    def add(self, value):
+        if value is None:
+            return
+        self.non_null += 1
+        if not self.numeric:
+            return
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.total += value
+            self.minimum = value if self.minimum is None else min(self.minimum, value)
+            self.maximum = value if self.maximum is None else max(self.maximum, value)
+        else:
+            self.numeric = False
+
+    def to_dict(self) -> dict:
+        summary = {"name": self.name, "type": "numeric" if self.numeric and self.non_null else "text",
+                   "non_null": self.non_null}
+        if self.numeric and self.non_null:
+            summary.update(min=self.minimum, max=self.maximum, sum=self.total, avg=self.total / self.non_null)
+        return summary
+
+class QueryResult:
+    """
+    Structured result of a read query: column metadata, a bounded preview and an aggregate
+    summary computed while paging through the cursor. Rows beyond the preview are never held
+    in memory; the full result is re-read page by page when downloaded.
+    """
+
+    def __init__(self, result_id: str, sql_query: str, params: tuple, columns: List[str], preview: List[tuple],
+                 row_count: int, truncated: bool, summaries: List[ColumnSummary]):
+        self.result_id = result_id
+        self.sql_query = sql_query
+        self.params = params
+        self.columns = columns
+        self.preview = preview
+        self.row_count = row_count
+        self.truncated = truncated
+        self.summaries = summaries
+
+    def to_dict(self) -> dict:
+        return {
+            "result_id": self.result_id,
+            "columns": self.columns,
+            "preview": [list(row) for row in self.preview],
+            "row_count": self.row_count,
+            "row_count_is_lower_bound": self.truncated,
+            "summary": [s.to_dict() for s in self.summaries],
+        }
+
+    def to_prompt(self) -> str:
+        """Compact text for the LLM: preview table, row count, numeric aggregates and a download link."""
+        if not self.columns:
+            return "Query returned no columns."
+
+        def cell(value) -> str:
+            text = "" if value is None else str(value).replace("|", "\\|").replace("\n", " ")
+            return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 3] + "..."
+
+        lines = [
+            "| " + " | ".join(self.columns) + " |",
+            "|" + "|".join("---" for _ in self.columns) + "|",
+        ]
+        lines.extend("| " + " | ".join(cell(v) for v in row) + " |" for row in self.preview)
+        count = f"at least {self.row_count}" if self.truncated else str(self.row_count)
+        lines.append("")
+        lines.append(f"Rows: {count} (showing {len(self.preview)}).")
+        for s in self.summaries if self.row_count > 1 else []:
+            info = s.to_dict()
+            if info["type"] == "numeric":
+                lines.append(f"{info['name']}: min={info['min']}, max={info['max']}, "
+                             f"sum={info['sum']:.2f}, avg={info['avg']:.2f}")
+        if self.row_count > len(self.preview):
+            lines.append(f"Full result: /results/{self.result_id}")
+        return "\n".join(lines)
+
+class ResultStore:
+    """
+    Remembers recent queries (not their rows) so their full results can be downloaded later.
+    With a shared store the ids are visible to every worker, whichever one serves the link.
+    """
+
+    def __init__(self, max_entries: int = RESULT_STORE_SIZE, ttl: float = RESULT_STORE_TTL):
+        self._entries = make_cache("result_ids", max_entries, ttl)
+
+    def put(self, result: QueryResult):
+        self._entries.put(result.result_id, (result.sql_query, list(result.params), result.columns))
+
+    def get(self, result_id: str) -> Optional[tuple]:
+        entry = self._entries.get(result_id)
+        return tuple(entry) if entry is not None else None
+
+    def touch(self, result_id: str) -> bool:
+        """Restarts the id's lifetime; False if it has already expired or been evicted."""
+        entry = self._entries.get(result_id)
+        if entry is None:
+            return False
+        self._entries.put(result_id, entry)
+        return True
+
+result_store = ResultStore()
+
+def keep_links_alive(text) -> bool:
+    """
+    Called when a cached answer is reused: the ids of the download links in it are renewed
+    so they last as long as the answer keeps being served. False if any of them is already
+    gone, in which case the caller should recompute rather than hand out a dead link.
+    """
+    if not isinstance(text, str):
+        return True
+    return all(result_store.touch(result_id) for result_id in _RESULT_LINK.findall(text))
+
+def run_query(sql_query: str, params: tuple = (), preview_rows: int = PREVIEW_ROWS,
+              source: str = None) -> QueryResult:
+    """Executes a read query on the pooled read-only connection and returns a QueryResult."""
+    start = time.perf_counter()
+    with db.read_connection() as conn:
+        cursor = conn.execute(sql_query, params)
+        columns = [d[0] for d in cursor.description] if cursor.description else []
+        summaries = [ColumnSummary(c) for c in columns]
+        preview, row_count, truncated = [], 0, False
+        while True:
+            page = cursor.fetchmany(FETCH_PAGE_SIZE)
+            if not page:
+                break
+            for row in page:
+                if len(preview) < preview_rows:
+                    preview.append(row)
+                for summary, value in zip(summaries, row):
+                    summary.add(value)
+            row_count += len(page)
+            if row_count >= SUMMARY_SCAN_LIMIT:
+                truncated = cursor.fetchone() is not None
+                break
+        cursor.close()
+    db.record_query(sql_query, (time.perf_counter() - start) * 1000, row_count, "read", source)
+
+    result = QueryResult(uuid.uuid4().hex, sql_query, params, columns, preview, row_count, truncated, summaries)
+    if columns:
+        result_store.put(result)
+    return result
+
+def fetch_page(result_id: str, page: int, page_size: int) -> Optional[dict]:
+    entry = result_store.get(result_id)
+    if entry is None:
+        return None
+    sql_query, params, columns = entry
+    with db.read_connection() as conn:
+        cursor = conn.execute(sql_query, params)
+        # Skip earlier pages on the cursor rather than wrapping the SQL in LIMIT/OFFSET,
+        # which would change the meaning of queries with their own ORDER BY/LIMIT.
+        skipped = 0
+        while skipped < page * page_size:
+            chunk = cursor.fetchmany(min(FETCH_PAGE_SIZE, page * page_size - skipped))
+            if not chunk:
+                break
+            skipped += len(chunk)
+        rows = cursor.fetchmany(page_size + 1)
+        cursor.close()
+    return {
+        "result_id": result_id,
+        "columns": columns,
+        "page": page,
+        "page_size": page_size,
+        "rows": [list(row) for row in rows[:page_size]],
+        "has_more": len(rows) > page_size,
+    }
+
+def stream_csv(result_id: str) -> Optional[Iterator[str]]:
+    """
+    Returns a generator of CSV chunks for the full result, or None if the id is unknown.
+    It uses its own read-only connection because a streaming response may be iterated
+    from several threads.
+    """
+    entry = result_store.get(result_id)
+    if entry is None:
+        return None
+    sql_query, params, columns = entry
+
+    def generate():
+        with db.dedicated_reader() as conn:
+            cursor = conn.execute(sql_query, params)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            while True:
+                page = cursor.fetchmany(FETCH_PAGE_SIZE)
+                if not page:
+                    break
+                writer.writerows(page)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+
+    return generate()
@@ -0,0 +1,362 @@
+# tools/reorder.py
+"""
+Background reorder monitoring for the inventory tables.
+
+Triggers on stock and products append the id of every product whose quantity or reorder
+level changes to a small stock_changes log. The ReorderMonitor thread reads the log from its
+last position, re-evaluates only those products and keeps the low-stock set in memory, so
+checking reorder points never scans the stock table after the initial load. For low-stock
+products without an open purchase order it creates draft purchase orders in batches.
+Use `python -m tools.reorder install` to create the change log and triggers by hand.
+"""
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+from tools.db import db
+
+logger = logging.getLogger(__name__)
+
+REORDER_MONITOR_ENABLED = os.getenv("ERP_REORDER_MONITOR", "1") == "1"
+# Seconds between checks when nothing wakes the monitor earlier; writes through the pool do.
+REORDER_INTERVAL = float(os.getenv("ERP_REORDER_INTERVAL", "5"))
+REORDER_DRAFTS = os.getenv("ERP_REORDER_DRAFTS", "1") == "1"
+REORDER_BATCH_SIZE = int(os.getenv("ERP_REORDER_BATCH_SIZE", "200"))
+# Drafts order enough to bring stock up to this multiple of the reorder level.
+REORDER_TARGET_FACTOR = float(os.getenv("ERP_REORDER_TARGET_FACTOR", "2"))
+CHANGE_LOG_RETENTION_HOURS = float(os.getenv("ERP_REORDER_CHANGE_RETENTION_HOURS", "24"))
+
+# Purchase orders in these states already cover a shortfall.
+OPEN_PO_STATUSES = ("draft", "ordered")
+SOURCE = "reorder_monitor"
+# Products per IN (...) list; stays under SQLite's default variable limit.
+CHUNK = 400
+
+SOURCES = {"stock": ["product_id", "quantity"], "products": ["product_id", "name", "reorder_level"]}
+DRAFT_SOURCES = {"purchase_orders": ["product_id", "quantity", "status"]}
+
+CHANGE_LOG = [
+    """CREATE TABLE IF NOT EXISTS stock_changes (
+        change_id INTEGER PRIMARY KEY AUTOINCREMENT, product_id INTEGER,
+        changed_at TEXT NOT NULL DEFAULT (datetime('now')))""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stock_changes_ins AFTER INSERT ON stock BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (NEW.product_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stock_changes_del AFTER DELETE ON stock BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (OLD.product_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stock_changes_upd AFTER UPDATE OF product_id, quantity ON stock BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (NEW.product_id);
+        INSERT INTO stock_changes (product_id) SELECT OLD.product_id WHERE OLD.product_id IS NOT NEW.product_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stock_changes_product_ins AFTER INSERT ON products BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (NEW.product_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stock_changes_product_del AFTER DELETE ON products BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (OLD.product_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stock_changes_level AFTER UPDATE OF reorder_level ON products BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (NEW.product_id);
+    END""",
+]
+# Lets the open purchase order check read a few rows per product.
+PO_INDEX = "CREATE INDEX IF NOT EXISTS idx_purchase_orders_product_status ON purchase_orders(product_id, status)"
+
+_PRODUCT_LEVELS = """
+    SELECT p.product_id, p.name, p.reorder_level, COALESCE(SUM(s.quantity), 0) AS quantity
+    FROM products p LEFT JOIN stock s ON s.product_id = p.product_id
+    WHERE {where}
+    GROUP BY p.product_id
+"""
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")').fetchall()}
+
+def _missing(conn, sources: Dict[str, List[str]]) -> List[str]:
+    missing = []
+    for table, columns in sources.items():
+        existing = _columns(conn, table)
+        missing.extend(f"{table}.{c}" for c in columns if c not in existing)
+    return missing
+
+def _chunks(items: List, size: int = CHUNK) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def install() -> bool:
+    """Creates the change log, its triggers and the purchase order index; False if the tables don't fit."""
+    with db.write_connection() as conn:
+        missing = _missing(conn, SOURCES)
+        if missing:
+            logger.info("Skipping reorder monitoring; missing columns: %s", ", ".join(missing))
+            return False
+        for statement in CHANGE_LOG:
+            conn.execute(statement)
+        if not _missing(conn, DRAFT_SOURCES):
+            conn.execute(PO_INDEX)
+    return True
+
+@dataclass
+class LowStockItem:
+    product_id: int
+    name: str
+    quantity: float
+    reorder_level: float
+    since: float
+    open_po: Optional[int] = None  # id of a draft/ordered purchase order covering it, once known
+
+    @property
+    def shortfall(self) -> float:
+        return self.reorder_level - self.quantity
+
+    def reorder_quantity(self, factor: float = REORDER_TARGET_FACTOR) -> int:
+        return max(1, math.ceil(factor * self.reorder_level - self.quantity))
+
+    def to_dict(self) -> dict:
+        return dict(asdict(self), shortfall=self.shortfall)
+
+class ReorderMonitor:
+    """
+    Keeps the set of products at or below their reorder level current by following the
+    stock_changes log, and drafts purchase orders for them. The first check loads the
+    low-stock products with one query; after that each check reads only the changes since
+    the previous one. If the log was pruned past the monitor's position, it reloads.
+    """
+
+    def __init__(self, interval: float = REORDER_INTERVAL, drafts: bool = REORDER_DRAFTS,
+                 batch_size: int = REORDER_BATCH_SIZE):
+        self.interval = interval
+        self.drafts = drafts
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._cursor = None
+        self._low: Dict[int, LowStockItem] = {}
+        self._recent_drafts = deque(maxlen=100)
+        self._po_columns = None
+        self._last_error = None
+        self._last_prune = 0.0
+        self._stats = {"checks": 0, "changes_applied": 0, "products_evaluated": 0, "reloads": 0,
+                       "drafts_created": 0, "errors": 0, "last_check_ms": 0.0, "updated_at": None}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        db.observe_queries(self._on_query)
+        self._thread = threading.Thread(target=self._run, name="reorder-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _on_query(self, sql_query: str, duration_ms: float, rows: int, kind: str, source: str = None):
+        # Any committed write may have touched stock; the check itself only reads the change log.
+        if kind == "write" and source != SOURCE:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+                self._last_error = None
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                if str(e) != self._last_error:
+                    # e.g. the writer process has not created the change log yet; retried next time.
+                    logger.warning("Reorder check failed: %s", e)
+                    self._last_error = str(e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def check(self):
+        """Applies pending stock changes and drafts purchase orders for uncovered low-stock products."""
+        start = time.perf_counter()
+        if self._cursor is None:
+            self._reload()
+        else:
+            self._apply_changes()
+        if self.drafts:
+            self._draft_purchase_orders()
+        self._prune()
+        with self._lock:
+            self._stats["checks"] += 1
+            self._stats["last_check_ms"] = (time.perf_counter() - start) * 1000
+            self._stats["updated_at"] = time.time()
+
+    def _reload(self):
+        with db.read_connection() as conn:
+            # Position first: changes committed during the scan are re-evaluated next time.
+            cursor = conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM stock_changes").fetchone()[0]
+            rows = conn.execute(
+                _PRODUCT_LEVELS.format(where="p.reorder_level > 0") + " HAVING COALESCE(SUM(s.quantity), 0) <= p.reorder_level"
+            ).fetchall()
+        now = time.time()
+        with self._lock:
+            previous = self._low
+            self._low = {}
+            for product_id, name, level, quantity in rows:
+                old = previous.get(product_id)
+                self._low[product_id] = LowStockItem(product_id, name, quantity, level, old.since if old else now)
+            self._cursor = cursor
+            self._stats["reloads"] += 1
+
+    def _apply_changes(self):
+        while True:
+            with db.read_connection() as conn:
+                changes = conn.execute(
+                    "SELECT change_id, product_id FROM stock_changes WHERE change_id > ? ORDER BY change_id LIMIT ?",
+                    (self._cursor, self.batch_size * 10),
+                ).fetchall()
+            if not changes:
+                return
+            if changes[0][0] > self._cursor + 1:
+                # Ids only have gaps where the log was pruned before this monitor read it.
+                self._reload()
+                return
+            self._evaluate({product_id for _, product_id in changes if product_id is not None})
+            with self._lock:
+                self._cursor = changes[-1][0]
+                self._stats["changes_applied"] += len(changes)
+            if len(changes) < self.batch_size * 10:
+                return
+
+    def _evaluate(self, product_ids: set):
+        ids = sorted(product_ids)
+        levels = {}
+        with db.read_connection() as conn:
+            for chunk in _chunks(ids):
+                where = f"p.product_id IN ({', '.join('?' for _ in chunk)})"
+                for product_id, name, level, quantity in conn.execute(_PRODUCT_LEVELS.format(where=where), chunk):
+                    levels[product_id] = (name, level, quantity)
+        now = time.time()
+        with self._lock:
+            for product_id in ids:
+                name, level, quantity = levels.get(product_id, (None, None, None))
+                if not level or level <= 0 or quantity > level:
+                    self._low.pop(product_id, None)  # restocked, deleted or no reorder level
+                    continue
+                old = self._low.get(product_id)
+                # A change may have received or cancelled its purchase order, so look again.
+                self._low[product_id] = LowStockItem(product_id, name, quantity, level, old.since if old else now)
+            self._stats["products_evaluated"] += len(ids)
+
+    def _purchase_order_columns(self) -> set:
+        if self._po_columns is None:
+            with db.read_connection() as conn:
+                missing = _missing(conn, DRAFT_SOURCES)
+                self._po_columns = _columns(conn, "purchase_orders")
+            if missing:
+                logger.info("Not drafting purchase orders; missing columns: %s", ", ".join(missing))
+                self.drafts = False
+        return self._po_columns
+
+    def _open_purchase_orders(self, product_ids: List[int]) -> Dict[int, int]:
+        found = {}
+        statuses = ", ".join("?" for _ in OPEN_PO_STATUSES)
+        with db.read_connection() as conn:
+            for chunk in _chunks(product_ids):
+                rows = conn.execute(
+                    f"SELECT product_id, MAX(rowid) FROM purchase_orders "
+                    f"WHERE product_id IN ({', '.join('?' for _ in chunk)}) AND status IN ({statuses}) "
+                    f"GROUP BY product_id",
+                    list(chunk) + list(OPEN_PO_STATUSES),
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def _draft_insert(self, rows: int, with_created_at: bool) -> str:
+        # One statement per batch. NOT EXISTS keeps it idempotent when every worker runs a
+        # monitor, because their writes are serialised by the single writer.
+        columns, values = "product_id, quantity, status", "v.column1, v.column2, 'draft'"
+        if with_created_at:
+            columns, values = columns + ", created_at", values + ", datetime('now')"
+        statuses = ", ".join("?" for _ in OPEN_PO_STATUSES)
+        return (
+            f"INSERT INTO purchase_orders ({columns}) SELECT {values} "
+            f"FROM (VALUES {', '.join('(?, ?)' for _ in range(rows))}) AS v "
+            f"WHERE NOT EXISTS (SELECT 1 FROM purchase_orders po "
+            f"WHERE po.product_id = v.column1 AND po.status IN ({statuses}))"
+        )
+
+    def _draft_purchase_orders(self):
+        columns = self._purchase_order_columns()
+        if not self.drafts:
+            return
+        with self._lock:
+            uncovered = [item for item in self._low.values() if item.open_po is None]
+        if not uncovered:
+            return
+        open_orders = self._open_purchase_orders([item.product_id for item in uncovered])
+        needed = [item for item in uncovered if item.product_id not in open_orders]
+        for batch in _chunks(needed, min(self.batch_size, CHUNK // 2)):
+            params = [v for item in batch for v in (item.product_id, item.reorder_quantity())]
+            created = db.execute_write(self._draft_insert(len(batch), "created_at" in columns),
+                                       params + list(OPEN_PO_STATUSES), source=SOURCE)
+            drafted = self._open_purchase_orders([item.product_id for item in batch])
+            open_orders.update(drafted)
+            with self._lock:
+                self._stats["drafts_created"] += created
+                for item in batch:
+                    if item.product_id in drafted:
+                        self._recent_drafts.appendleft({
+                            "po_id": drafted[item.product_id], "product_id": item.product_id, "name": item.name,
+                            "quantity": item.reorder_quantity(), "created_at": time.time(),
+                        })
+        with self._lock:
+            for item in uncovered:
+                # Skip items replaced by a newer evaluation while the drafts were written.
+                if self._low.get(item.product_id) is item:
+                    item.open_po = open_orders.get(item.product_id)
+
+    def _prune(self):
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        db.execute_write(
+            "DELETE FROM stock_changes WHERE changed_at < datetime('now', ?)",
+            (f"-{CHANGE_LOG_RETENTION_HOURS:g} hours",),
+            source=SOURCE,
+        )
+
+    def alerts(self, limit: int = 50) -> dict:
+        """The low-stock products, most severe first, and the latest drafts. Reads memory only."""
+        with self._lock:
+            items = sorted(self._low.values(),
+                           key=lambda i: (i.quantity / i.reorder_level if i.reorder_level else 0.0, -i.shortfall))
+            return {
+                "low_stock_count": len(items),
+                "low_stock": [item.to_dict() for item in items[:limit]],
+                "recent_drafts": list(self._recent_drafts)[:limit],
+                "uncovered": sum(1 for item in items if item.open_po is None),
+                "updated_at": self._stats["updated_at"],
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, low_stock=len(self._low), cursor=self._cursor, drafts_enabled=self.drafts)
+
+reorder_monitor = ReorderMonitor()
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "install"
+    if command == "install":
+        print("Reorder change log installed" if install() else "Reorder monitoring unavailable for this schema")
+    elif command == "check":
+        install()
+        monitor = ReorderMonitor(drafts="--drafts" in sys.argv)
+        monitor.check()
+        for item in monitor.alerts()["low_stock"]:
+            print(f"{item['product_id']:>8}  {item['name']}: {item['quantity']:g} on hand, reorder at {item['reorder_level']:g}")
+    else:
+        print("Usage: python -m tools.reorder [install | check [--drafts]]")
+        sys.exit(2)
@@ -0,0 +1,325 @@
+# tools/rollups.py
+"""
+Precomputed analytics rollups kept up to date incrementally by SQLite triggers.
+
+Each rollup is a small summary table plus triggers on its source tables that apply the
+delta of every INSERT/UPDATE/DELETE, so analytics questions can read a few rows instead
+of scanning orders, invoices or stock. Triggers fire for every writer (agents, bulk
+imports, external scripts). Use `python -m tools.rollups rebuild` to backfill.
+"""
+import logging
+import os
+import re
+import sys
+from typing import Dict, List
+from tools.db import db
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_ENABLED = os.getenv("ERP_ROLLUPS", "1") == "1"
+
+class Rollup:
+    def __init__(self, name: str, description: str, sources: Dict[str, List[str]], ddl: str,
+                 triggers: List[str], rebuild: List[str]):
+        self.name = name
+        self.description = description
+        self.sources = sources  # table -> columns the rollup reads
+        self.ddl = ddl
+        self.triggers = triggers
+        self.rebuild_sql = rebuild
+
+    def trigger_names(self) -> List[str]:
+        return [re.search(r"CREATE TRIGGER IF NOT EXISTS (\w+)", t).group(1) for t in self.triggers]
+
+ROLLUPS = [
+    Rollup(
+        name="rollup_daily_revenue",
+        description="rollup_daily_revenue(day, order_count, revenue): number of orders and revenue per day "
+                    "(day is 'YYYY-MM-DD'; use strftime('%Y-%m', day) for months).",
+        sources={"orders": ["order_date", "total_amount"]},
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_daily_revenue (
+            day TEXT PRIMARY KEY, order_count INTEGER NOT NULL DEFAULT 0, revenue REAL NOT NULL DEFAULT 0)""",
+        triggers=[
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_daily_revenue_ins AFTER INSERT ON orders BEGIN
+                INSERT INTO rollup_daily_revenue (day, order_count, revenue)
+                VALUES (COALESCE(date(NEW.order_date), 'unknown'), 1, COALESCE(NEW.total_amount, 0))
+                ON CONFLICT(day) DO UPDATE SET order_count = order_count + 1,
+                                               revenue = revenue + COALESCE(NEW.total_amount, 0);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_daily_revenue_del AFTER DELETE ON orders BEGIN
+                UPDATE rollup_daily_revenue SET order_count = order_count - 1,
+                                                revenue = revenue - COALESCE(OLD.total_amount, 0)
+                WHERE day = COALESCE(date(OLD.order_date), 'unknown');
+                DELETE FROM rollup_daily_revenue WHERE day = COALESCE(date(OLD.order_date), 'unknown') AND order_count <= 0;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_daily_revenue_upd AFTER UPDATE OF order_date, total_amount ON orders BEGIN
+                UPDATE rollup_daily_revenue SET order_count = order_count - 1,
+                                                revenue = revenue - COALESCE(OLD.total_amount, 0)
+                WHERE day = COALESCE(date(OLD.order_date), 'unknown');
+                DELETE FROM rollup_daily_revenue WHERE day = COALESCE(date(OLD.order_date), 'unknown') AND order_count <= 0;
+                INSERT INTO rollup_daily_revenue (day, order_count, revenue)
+                VALUES (COALESCE(date(NEW.order_date), 'unknown'), 1, COALESCE(NEW.total_amount, 0))
+                ON CONFLICT(day) DO UPDATE SET order_count = order_count + 1,
+                                               revenue = revenue + COALESCE(NEW.total_amount, 0);
+            END""",
+        ],
+        rebuild=[
+            "DELETE FROM rollup_daily_revenue",
+            """INSERT INTO rollup_daily_revenue (day, order_count, revenue)
+               SELECT COALESCE(date(order_date), 'unknown'), COUNT(*), COALESCE(SUM(total_amount), 0)
+               FROM orders GROUP BY 1""",
+        ],
+    ),
+    Rollup(
+        name="rollup_customer_balances",
+        description="rollup_customer_balances(customer_id, invoiced_total, paid_total, outstanding): "
+                    "invoiced and paid amounts per customer; outstanding = invoiced_total - paid_total.",
+        sources={"invoices": ["invoice_id", "customer_id", "amount"], "payments": ["invoice_id", "amount"]},
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_customer_balances (
+            customer_id INTEGER PRIMARY KEY, invoiced_total REAL NOT NULL DEFAULT 0,
+            paid_total REAL NOT NULL DEFAULT 0,
+            outstanding REAL GENERATED ALWAYS AS (invoiced_total - paid_total) VIRTUAL)""",
+        triggers=[
+            # An invoice carries its payments: whatever moves or removes the invoice moves or
+            # removes them from paid_total too, matching the rebuild query.
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_balances_inv_ins AFTER INSERT ON invoices BEGIN
+                INSERT INTO rollup_customer_balances (customer_id, invoiced_total, paid_total)
+                SELECT NEW.customer_id, COALESCE(NEW.amount, 0),
+                       (SELECT COALESCE(SUM(COALESCE(amount, 0)), 0) FROM payments WHERE invoice_id = NEW.invoice_id)
+                WHERE NEW.customer_id IS NOT NULL
+                ON CONFLICT(customer_id) DO UPDATE SET invoiced_total = invoiced_total + excluded.invoiced_total,
+                                                       paid_total = paid_total + excluded.paid_total;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_balances_inv_del AFTER DELETE ON invoices BEGIN
+                UPDATE rollup_customer_balances
+                SET invoiced_total = invoiced_total - COALESCE(OLD.amount, 0),
+                    paid_total = paid_total - (SELECT COALESCE(SUM(COALESCE(amount, 0)), 0)
+                                               FROM payments WHERE invoice_id = OLD.invoice_id)
+                WHERE customer_id = OLD.customer_id;
+                DELETE FROM rollup_customer_balances WHERE customer_id = OLD.customer_id
+                    AND NOT EXISTS (SELECT 1 FROM invoices WHERE customer_id = OLD.customer_id);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_balances_inv_upd AFTER UPDATE OF invoice_id, customer_id, amount ON invoices BEGIN
+                UPDATE rollup_customer_balances
+                SET invoiced_total = invoiced_total - COALESCE(OLD.amount, 0),
+                    paid_total = paid_total - (SELECT COALESCE(SUM(COALESCE(amount, 0)), 0)
+                                               FROM payments WHERE invoice_id = OLD.invoice_id)
+                WHERE customer_id = OLD.customer_id;
+                DELETE FROM rollup_customer_balances WHERE customer_id = OLD.customer_id
+                    AND NOT EXISTS (SELECT 1 FROM invoices WHERE customer_id = OLD.customer_id);
+                INSERT INTO rollup_customer_balances (customer_id, invoiced_total, paid_total)
+                SELECT NEW.customer_id, COALESCE(NEW.amount, 0),
+                       (SELECT COALESCE(SUM(COALESCE(amount, 0)), 0) FROM payments WHERE invoice_id = NEW.invoice_id)
+                WHERE NEW.customer_id IS NOT NULL
+                ON CONFLICT(customer_id) DO UPDATE SET invoiced_total = invoiced_total + excluded.invoiced_total,
+                                                       paid_total = paid_total + excluded.paid_total;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_balances_pay_ins AFTER INSERT ON payments BEGIN
+                INSERT INTO rollup_customer_balances (customer_id, paid_total)
+                SELECT customer_id, COALESCE(NEW.amount, 0) FROM invoices
+                WHERE invoice_id = NEW.invoice_id AND customer_id IS NOT NULL
+                ON CONFLICT(customer_id) DO UPDATE SET paid_total = paid_total + excluded.paid_total;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_balances_pay_del AFTER DELETE ON payments BEGIN
+                UPDATE rollup_customer_balances SET paid_total = paid_total - COALESCE(OLD.amount, 0)
+                WHERE customer_id = (SELECT customer_id FROM invoices WHERE invoice_id = OLD.invoice_id);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_balances_pay_upd AFTER UPDATE OF invoice_id, amount ON payments BEGIN
+                UPDATE rollup_customer_balances SET paid_total = paid_total - COALESCE(OLD.amount, 0)
+                WHERE customer_id = (SELECT customer_id FROM invoices WHERE invoice_id = OLD.invoice_id);
+                INSERT INTO rollup_customer_balances (customer_id, paid_total)
+                SELECT customer_id, COALESCE(NEW.amount, 0) FROM invoices
+                WHERE invoice_id = NEW.invoice_id AND customer_id IS NOT NULL
+                ON CONFLICT(customer_id) DO UPDATE SET paid_total = paid_total + excluded.paid_total;
+            END""",
+        ],
+        rebuild=[
+            "DELETE FROM rollup_customer_balances",
+            """INSERT INTO rollup_customer_balances (customer_id, invoiced_total, paid_total)
+               SELECT i.customer_id, SUM(COALESCE(i.amount, 0)),
+                      COALESCE(SUM((SELECT SUM(COALESCE(p.amount, 0)) FROM payments p WHERE p.invoice_id = i.invoice_id)), 0)
+               FROM invoices i WHERE i.customer_id IS NOT NULL GROUP BY i.customer_id""",
+        ],
+    ),
+    Rollup(
+        name="rollup_stock_value",
+        description="rollup_stock_value(product_id, quantity, unit_price, stock_value): units on hand per product "
+                    "across all stock rows and their value at the product's unit price.",
+        sources={"stock": ["product_id", "quantity"], "products": ["product_id", "unit_price"]},
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_stock_value (
+            product_id INTEGER PRIMARY KEY, quantity REAL NOT NULL DEFAULT 0, unit_price REAL NOT NULL DEFAULT 0,
+            stock_value REAL GENERATED ALWAYS AS (quantity * unit_price) VIRTUAL)""",
+        triggers=[
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_stock_ins AFTER INSERT ON stock BEGIN
+                INSERT INTO rollup_stock_value (product_id, quantity, unit_price)
+                SELECT NEW.product_id, COALESCE(NEW.quantity, 0),
+                       COALESCE((SELECT unit_price FROM products WHERE product_id = NEW.product_id), 0)
+                WHERE NEW.product_id IS NOT NULL
+                ON CONFLICT(product_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_stock_del AFTER DELETE ON stock BEGIN
+                UPDATE rollup_stock_value SET quantity = quantity - COALESCE(OLD.quantity, 0)
+                WHERE product_id = OLD.product_id;
+                DELETE FROM rollup_stock_value WHERE product_id = OLD.product_id
+                    AND NOT EXISTS (SELECT 1 FROM stock WHERE product_id = OLD.product_id);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_stock_upd AFTER UPDATE OF product_id, quantity ON stock BEGIN
+                UPDATE rollup_stock_value SET quantity = quantity - COALESCE(OLD.quantity, 0)
+                WHERE product_id = OLD.product_id;
+                DELETE FROM rollup_stock_value WHERE product_id = OLD.product_id
+                    AND NOT EXISTS (SELECT 1 FROM stock WHERE product_id = OLD.product_id);
+                INSERT INTO rollup_stock_value (product_id, quantity, unit_price)
+                SELECT NEW.product_id, COALESCE(NEW.quantity, 0),
+                       COALESCE((SELECT unit_price FROM products WHERE product_id = NEW.product_id), 0)
+                WHERE NEW.product_id IS NOT NULL
+                ON CONFLICT(product_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+            END""",
+            # Stock can arrive before its product; the price follows the product row either way.
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_stock_product_ins AFTER INSERT ON products BEGIN
+                UPDATE rollup_stock_value SET unit_price = COALESCE(NEW.unit_price, 0)
+                WHERE product_id = NEW.product_id;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_stock_product_del AFTER DELETE ON products BEGIN
+                UPDATE rollup_stock_value SET unit_price = 0 WHERE product_id = OLD.product_id;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_rollup_stock_price AFTER UPDATE OF product_id, unit_price ON products BEGIN
+                UPDATE rollup_stock_value SET unit_price = 0
+                WHERE product_id = OLD.product_id AND OLD.product_id IS NOT NEW.product_id;
+                UPDATE rollup_stock_value SET unit_price = COALESCE(NEW.unit_price, 0)
+                WHERE product_id = NEW.product_id;
+            END""",
+        ],
+        rebuild=[
+            "DELETE FROM rollup_stock_value",
+            """INSERT INTO rollup_stock_value (product_id, quantity, unit_price)
+               SELECT s.product_id, SUM(COALESCE(s.quantity, 0)), COALESCE(p.unit_price, 0)
+               FROM stock s LEFT JOIN products p ON p.product_id = s.product_id
+               WHERE s.product_id IS NOT NULL GROUP BY s.product_id""",
+        ],
+    ),
+]
+
+# Questions that look like aggregates get pointed at the rollups.
+_AGGREGATE_QUESTION = re.compile(
+    r"\b(total|sum|revenue|average|avg|per (day|month|week|year|customer|product)|by (day|month|week|year|customer)"
+    r"|daily|monthly|outstanding|balance|owe|stock value|inventory value|how much|how many)\b",
+    re.IGNORECASE,
+)
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")').fetchall()}
+
+def _missing_sources(conn, rollup: Rollup) -> List[str]:
+    missing = []
+    for table, columns in rollup.sources.items():
+        existing = _columns(conn, table)
+        missing.extend(f"{table}.{c}" for c in columns if c not in existing)
+    return missing
+
+def installed() -> List[Rollup]:
+    """Rollups whose summary table and triggers exist in the database."""
+    with db.read_connection() as conn:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    return [r for r in ROLLUPS if r.name in names and all(t in names for t in r.trigger_names())]
+
+def install(rebuild_new: bool = True) -> List[str]:
+    """
+    Creates the summary tables and triggers for every rollup whose source columns exist,
+    backfilling newly created tables. Triggers from an older definition are replaced and
+    their rollup rebuilt, since it may have drifted. Returns the names of the active rollups.
+    """
+    active = []
+    with db.write_connection() as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        triggers = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall())
+        for rollup in ROLLUPS:
+            missing = _missing_sources(conn, rollup)
+            if missing:
+                logger.info("Skipping rollup %s; missing source columns: %s", rollup.name, ", ".join(missing))
+                continue
+            conn.execute(rollup.ddl)
+            replaced = False
+            for name, trigger in zip(rollup.trigger_names(), rollup.triggers):
+                # SQLite stores the statement without IF NOT EXISTS.
+                current = triggers.get(name)
+                if current is not None and current != trigger.replace(" IF NOT EXISTS", "", 1):
+                    conn.execute(f"DROP TRIGGER {name}")
+                    replaced = True
+                conn.execute(trigger)
+            if replaced:
+                logger.info("Updated the triggers of rollup %s", rollup.name)
+            if rebuild_new and (rollup.name not in existing or replaced):
+                for statement in rollup.rebuild_sql:
+                    conn.execute(statement)
+            active.append(rollup.name)
+    return active
+
+def rebuild(names: List[str] = None) -> List[str]:
+    """Recomputes rollups from their source tables (for backfills or after bulk external loads)."""
+    rebuilt = []
+    targets = [r for r in installed() if not names or r.name in names]
+    with db.write_connection() as conn:
+        for rollup in targets:
+            for statement in rollup.rebuild_sql:
+                conn.execute(statement)
+            rebuilt.append(rollup.name)
+    return rebuilt
+
+class _Rollback(Exception):
+    pass
+
+def _snapshot(conn, table: str) -> set:
+    # Rounded, since sums accumulated in a different order differ in the last bits.
+    return {tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+            for row in conn.execute(f'SELECT * FROM "{table}"')}
+
+def verify(names: List[str] = None) -> Dict[str, List[str]]:
+    """
+    Compares each installed rollup with what rebuild() would produce. The rebuild runs in a
+    writer transaction that is rolled back, so nothing changes. Returns the rows that differ
+    per rollup; an empty list means the triggers kept it exact.
+    """
+    report = {}
+    targets = [r for r in installed() if not names or r.name in names]
+    try:
+        with db.write_connection() as conn:
+            for rollup in targets:
+                live = _snapshot(conn, rollup.name)
+                for statement in rollup.rebuild_sql:
+                    conn.execute(statement)
+                expected = _snapshot(conn, rollup.name)
+                report[rollup.name] = ([f"unexpected {row}" for row in sorted(live - expected, key=repr)] +
+                                       [f"missing {row}" for row in sorted(expected - live, key=repr)])
+            raise _Rollback()
+    except _Rollback:
+        pass
+    return report
+
+def prompt_hint(question: str) -> str:
+    """Describes the available rollups when the question looks like an aggregate, else ''."""
+    if not _AGGREGATE_QUESTION.search(question):
+        return ""
+    rollups = installed()
+    if not rollups:
+        return ""
+    lines = ["Precomputed summary tables (prefer these over scanning the source tables for totals and aggregates):"]
+    lines.extend(f"- {r.description}" for r in rollups)
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "install"
+    if command == "install":
+        print("Active rollups:", ", ".join(install()) or "none")
+    elif command == "rebuild":
+        install(rebuild_new=False)
+        print("Rebuilt rollups:", ", ".join(rebuild(sys.argv[2:])) or "none")
+    elif command == "verify":
+        differences = verify(sys.argv[2:])
+        for name, rows in differences.items():
+            print(f"{name}: {'ok' if not rows else f'{len(rows)} row(s) differ from a rebuild'}")
+            for row in rows[:20]:
+                print(f"  {row}")
+        sys.exit(1 if any(differences.values()) else 0)
+    else:
+        print("Usage: python -m tools.rollups [install | rebuild [rollup_name ...] | verify [rollup_name ...]]")
+        sys.exit(2)
@@ -1,37 +1,41 @@
 # tools/sales_sql.py
 import sqlite3
-import pandas as pd
-from tools.mcp_registry import BaseTool, mcp_registry
-
-DB_PATH = 'database/erp.db'
+from tools.mcp_registry import BaseTool, ToolPolicy, mcp_registry, tool_error
+from tools.db import db
+from tools.bulk_write import BatchWriteMixin
+from tools.query_result import QueryResult, run_query
 
 class SalesSQLReadTool(BaseTool):
     name = "sales_sql_read"
     description = "Executes read-only SQL queries on sales tables (customers, leads, orders, order_items)."
+    # Pure reads, so repeated queries are served from memory until their tables change.
+    policy = ToolPolicy(memoize=True)
+
+    def query(self, query: str) -> QueryResult:
+        return run_query(query, source=self.name)
 
     def run(self, query: str) -> str:
         try:
-            conn = sqlite3.connect(DB_PATH)
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            return df.to_markdown(index=False)
+            return self.query(query).to_prompt()
         except sqlite3.Error as e:
-            return f"SQL Error: {e}"
+            return tool_error("SQL Error", e)
 
-class SalesSQLWriteTool(BaseTool):
+class SalesSQLWriteTool(BatchWriteMixin, BaseTool):
     name = "sales_sql_write"
-    description = "Executes write SQL operations (INSERT, UPDATE, DELETE) on sales tables. Requires approval for sensitive actions."
+    description = "Executes write SQL operations (INSERT, UPDATE, DELETE) on sales tables. Requires approval for sensitive actions. For bulk changes, pass a JSON batch instead of SQL: {\"table\": ..., \"operation\": \"insert|upsert|update|delete\", \"key\": [...], \"rows\": [{...}]} (or \"csv\": \"header\\nvalues\" instead of rows)."
+    tables = frozenset({"customers", "leads", "orders", "order_items", "tickets"})
+    # A write cannot be stopped once sent, so no timeout: the agent always gets the real outcome.
+    policy = ToolPolicy(timeout=None)
 
     def run(self, query: str) -> str:
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(query)
-            conn.commit()
-            conn.close()
-            return f"SQL write operation successful. Rows affected: {cursor.rowcount}"
+            batch_result = self.run_batch(query)
+            if batch_result is not None:
+                return batch_result
+            rowcount = db.execute_write(query, source=self.name)
+            return f"SQL write operation successful. Rows affected: {rowcount}"
         except sqlite3.Error as e:
-            return f"SQL Error: {e}"
+            return tool_error("SQL Error", e)
 
 mcp_registry.register(SalesSQLReadTool())
 mcp_registry.register(SalesSQLWriteTool())
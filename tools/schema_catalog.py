@@ -0,0 +1,145 @@
+# tools/schema_catalog.py
+import logging
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from tools.db import db
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+class TableInfo:
+    def __init__(self, name: str, columns: List[tuple], foreign_keys: List[tuple]):
+        self.name = name
+        self.columns = columns  # (name, type, is_pk)
+        self.foreign_keys = foreign_keys  # (column, ref_table, ref_column)
+
+    def describe(self) -> str:
+        fk_map = {col: f"{ref_table}.{ref_col}" for col, ref_table, ref_col in self.foreign_keys}
+        parts = []
+        for name, col_type, is_pk in self.columns:
+            part = f"{name} {col_type}".strip()
+            if is_pk:
+                part += " PK"
+            if name in fk_map:
+                part += f" -> {fk_map[name]}"
+            parts.append(part)
+        return f"{self.name}({', '.join(parts)})"
+
+    def search_text(self) -> str:
+        # Underscores split so "customer_id" also matches questions about "customer".
+        return f"{self.name} " + " ".join(name for name, _, _ in self.columns).replace("_", " ")
+
+class SchemaCatalog:
+    """
+    Introspected view of erp.db built from sqlite_master and PRAGMA table_info.
+    It is cached until PRAGMA schema_version changes, so each question only pays
+    for a single pragma read before the prompt is assembled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schema_version = None
+        self._tables: Dict[str, TableInfo] = {}
+        self._vectors = None
+        # Cleared when the embedding model cannot be used, so it is not retried on every call.
+        self._semantic = True
+
+    def _current_version(self, conn) -> int:
+        return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+    def _load(self, conn) -> Dict[str, TableInfo]:
+        tables = {}
+        names = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()
+        for (name,) in names:
+            columns = [
+                (row[1], row[2], bool(row[5]))
+                for row in conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+            ]
+            foreign_keys = [
+                (row[3], row[2], row[4])
+                for row in conn.execute(f'PRAGMA foreign_key_list("{name}")').fetchall()
+            ]
+            tables[name] = TableInfo(name, columns, foreign_keys)
+        return tables
+
+    def tables(self) -> Dict[str, TableInfo]:
+        with db.read_connection() as conn:
+            version = self._current_version(conn)
+            with self._lock:
+                if version != self._schema_version:
+                    self._tables = self._load(conn)
+                    self._vectors = None
+                    self._schema_version = version
+                return self._tables
+
+    def _table_vectors(self, tables: Dict[str, TableInfo]):
+        with self._lock:
+            if self._vectors is None:
+                from tools.embeddings import embed
+                self._vectors = embed([t.search_text() for t in tables.values()])
+            return self._vectors
+
+    def _rank_by_embedding(self, question: str, tables: Dict[str, TableInfo]) -> List[str]:
+        from tools.embeddings import embed
+
+        similarities = self._table_vectors(tables) @ embed([question])[0]
+        order = sorted(range(len(tables)), key=lambda i: -similarities[i])
+        names = list(tables)
+        return [names[i] for i in order]
+
+    def _rank_by_overlap(self, question: str, tables: Dict[str, TableInfo]) -> List[str]:
+        words = set(_WORD.findall(question.lower()))
+        # Crude singularisation so "invoices" also hits the invoice_id column.
+        words |= {w[:-1] for w in words if w.endswith("s")}
+
+        def score(table: TableInfo) -> int:
+            return len(words & set(_WORD.findall(table.search_text().lower())))
+
+        return sorted(tables, key=lambda name: -score(tables[name]))
+
+    def relevant_tables(self, question: str, k: int = 4) -> List[TableInfo]:
+        """
+        Picks the k tables most similar to the question, plus the tables their foreign keys
+        point at so the model can write the joins.
+        """
+        tables = self.tables()
+        if len(tables) <= k:
+            return list(tables.values())
+        ranked = None
+        if self._semantic:
+            try:
+                ranked = self._rank_by_embedding(question, tables)
+            except (ImportError, OSError, RuntimeError) as e:
+                logger.warning("Schema embeddings unavailable, ranking tables by word overlap: %s", e)
+                self._semantic = False
+        if ranked is None:
+            ranked = self._rank_by_overlap(question, tables)
+
+        selected = ranked[:k]
+        for name in list(selected):
+            for _, ref_table, _ in tables[name].foreign_keys:
+                if ref_table in tables and ref_table not in selected:
+                    selected.append(ref_table)
+        return [tables[name] for name in selected]
+
+    def describe_for(self, question: str, k: int = 4) -> str:
+        return "\n".join(t.describe() for t in self.relevant_tables(question, k))
+
+    def validate(self, sql_query: str) -> Optional[str]:
+        """
+        Compiles the query with EXPLAIN without running it.
+        Returns None when it is valid, or the SQLite error message otherwise.
+        """
+        try:
+            with db.read_connection() as conn:
+                conn.execute(f"EXPLAIN {sql_query}").fetchall()
+            return None
+        except (sqlite3.Error, sqlite3.Warning) as e:
+            return str(e)
+
+schema_catalog = SchemaCatalog()
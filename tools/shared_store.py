@@ -0,0 +1,152 @@
+# tools/shared_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+# Set in multi-process deployments (see gunicorn.conf.py); empty keeps all state in-process.
+SHARED_STORE_PATH = os.getenv("ERP_SHARED_STORE_PATH", "")
+
+class SharedStore:
+    """
+    State shared by every worker process on the host, kept in a small SQLite file next to
+    erp.db: the per-table write versions that cached values are validated against, and the
+    entries of the shared caches. Each thread gets its own connection; WAL lets readers in
+    all workers proceed while one of them writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, meta TEXT, "
+            "cost_ms REAL NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_age ON cache(namespace, created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def bump_versions(self, tables):
+        tables = list(tables)
+        if not tables:
+            return
+        self._conn().executemany(
+            "INSERT INTO table_versions (name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            [(t,) for t in tables],
+        )
+
+    def versions(self, tables) -> dict:
+        tables = list(tables)
+        placeholders = ", ".join("?" for _ in tables)
+        rows = self._conn().execute(
+            f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})", tables
+        ).fetchall()
+        found = dict(rows)
+        return {t: found.get(t, 0) for t in tables}
+
+    def reset(self):
+        """Drops every cached entry, e.g. when the deployment starts against a database that may have changed."""
+        self._conn().execute("DELETE FROM cache")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class SharedCache:
+    """
+    Drop-in replacement for LRUCache whose entries live in the SharedStore, so a SQL query
+    generated or a result computed in one worker is reused by all of them. Values and
+    metadata must be JSON serialisable. Eviction is oldest-first rather than least recently
+    used, so a hit never writes; hit and miss counts are per process.
+    """
+
+    def __init__(self, store: SharedStore, namespace: str, max_entries: int, ttl: float):
+        self.store = store
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.time_saved_ms = 0.0
+
+    def _count(self, hit: bool, cost_ms: float = 0.0):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.time_saved_ms += cost_ms
+            else:
+                self.misses += 1
+
+    def get(self, key, is_valid=None) -> Optional[Any]:
+        row = self.store._conn().execute(
+            "SELECT value, meta, cost_ms, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is not None:
+            value, meta, cost_ms, expires_at = row
+            meta = json.loads(meta) if meta is not None else None
+            if expires_at >= time.time() and (is_valid is None or is_valid(meta)):
+                self._count(True, cost_ms)
+                return json.loads(value)
+            self.pop(key)
+        self._count(False)
+        return None
+
+    def put(self, key, value, cost_ms: float = 0.0, meta=None):
+        try:
+            value, meta = json.dumps(value), json.dumps(meta) if meta is not None else None
+        except TypeError:
+            return  # not shareable; the next call recomputes it
+        now = time.time()
+        conn = self.store._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, meta, cost_ms, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, value, meta, cost_ms, now, now + self.ttl),
+        )
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def pop(self, key):
+        self.store._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        self.store._conn().execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def stats(self) -> dict:
+        entries = self.store._conn().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "time_saved_ms": self.time_saved_ms,
+                "shared": True,
+            }
+
+shared_store = SharedStore(SHARED_STORE_PATH) if SHARED_STORE_PATH else None
@@ -0,0 +1,137 @@
+# tools/sql_cache.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from tools.db import db
+from tools.shared_store import SharedCache, shared_store
+
+SQL_CACHE_SIZE = int(os.getenv("ERP_SQL_CACHE_SIZE", "512"))
+SQL_CACHE_TTL = float(os.getenv("ERP_SQL_CACHE_TTL", "3600"))
+RESULT_CACHE_SIZE = int(os.getenv("ERP_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("ERP_RESULT_CACHE_TTL", "600"))
+
+def normalize_question(question: str) -> str:
+    """Lower-cases, collapses whitespace and drops trailing punctuation so trivially different phrasings share a key."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?.!; ")
+
+def normalize_sql(sql_query: str) -> str:
+    return re.sub(r"\s+", " ", sql_query).strip().rstrip(";").strip()
+
+def referenced_tables(sql_query: str) -> set:
+    """Lower-cased names of the tables a SELECT reads; empty when it does not compile."""
+    return db.tables_read(sql_query)
+
+class LRUCache:
+    """A thread-safe LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.time_saved_ms = 0.0
+
+    def get(self, key, is_valid=None) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, cost_ms, meta = entry
+                if expires_at < time.monotonic() or (is_valid is not None and not is_valid(meta)):
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.time_saved_ms += cost_ms
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value, cost_ms: float = 0.0, meta=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl, cost_ms, meta)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "time_saved_ms": self.time_saved_ms,
+            }
+
+def make_cache(namespace: str, max_entries: int, ttl: float):
+    """An in-process LRUCache, or a SharedCache seen by every worker when a shared store is configured."""
+    if shared_store is not None:
+        return SharedCache(shared_store, namespace, max_entries, ttl)
+    return LRUCache(max_entries, ttl)
+
+class QueryCache:
+    """
+    Two-level cache for TextToSQLTool.
+    Level 1 maps a normalised question to the SQL the LLM generated for it.
+    Level 2 maps that SQL to its rendered result and is keyed on the write versions of the
+    tables it reads, so a committed write to any of them invalidates the entry.
+    """
+
+    def __init__(self):
+        self.sql = make_cache("sql", SQL_CACHE_SIZE, SQL_CACHE_TTL)
+        self.results = make_cache("results", RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+    def get_sql(self, question: str) -> Optional[str]:
+        return self.sql.get(normalize_question(question))
+
+    def put_sql(self, question: str, sql_query: str, cost_ms: float):
+        self.sql.put(normalize_question(question), sql_query, cost_ms)
+
+    def forget_sql(self, question: str):
+        """Drops generated SQL that turned out not to run, so the next ask regenerates it."""
+        self.sql.pop(normalize_question(question))
+
+    def get_result(self, sql_query: str):
+        return self.results.get(
+            normalize_sql(sql_query),
+            is_valid=lambda versions: db.table_versions(versions.keys()) == versions,
+        )
+
+    def put_result(self, sql_query: str, result, cost_ms: float, versions: Optional[dict]):
+        """`versions` must be captured with versions_for before the query ran."""
+        if versions is not None:
+            self.results.put(normalize_sql(sql_query), result, cost_ms, versions)
+
+    def versions_for(self, sql_query: str) -> Optional[dict]:
+        """Returns None when the tables a query reads cannot be determined; such results are not cached."""
+        tables = referenced_tables(sql_query)
+        return db.table_versions(tables) if tables else None
+
+    def clear(self):
+        self.sql.clear()
+        self.results.clear()
+
+    def stats(self) -> dict:
+        sql_stats = self.sql.stats()
+        result_stats = self.results.stats()
+        return {
+            "sql": sql_stats,
+            "results": result_stats,
+            "time_saved_ms": sql_stats["time_saved_ms"] + result_stats["time_saved_ms"],
+        }
+
+query_cache = QueryCache()
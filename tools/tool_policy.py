@@ -0,0 +1,278 @@
+# tools/tool_policy.py
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Optional
+from tools.db import db
+from tools.query_result import keep_links_alive
+from tools.sql_cache import make_cache, referenced_tables
+from tools.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+TOOL_MAX_CONCURRENCY = int(os.getenv("ERP_TOOL_MAX_CONCURRENCY", "4"))
+TOOL_QUEUE_TIMEOUT = float(os.getenv("ERP_TOOL_QUEUE_TIMEOUT", "10"))
+TOOL_TIMEOUT = float(os.getenv("ERP_TOOL_TIMEOUT", "30"))
+TOOL_MAX_OUTPUT_ROWS = int(os.getenv("ERP_TOOL_MAX_OUTPUT_ROWS", "200"))
+TOOL_MAX_OUTPUT_BYTES = int(os.getenv("ERP_TOOL_MAX_OUTPUT_BYTES", "16000"))
+# Per-tool overrides, e.g. {"text_to_sql_tool": {"timeout": 20, "max_concurrency": 1}}
+TOOL_POLICY_OVERRIDES = os.getenv("ERP_TOOL_POLICIES", "")
+LATENCY_SAMPLES = 1000
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    max_concurrency: int = TOOL_MAX_CONCURRENCY
+    queue_timeout: float = TOOL_QUEUE_TIMEOUT  # how long a call may wait for a free slot
+    # Wall-clock limit enforced by interrupting the caller's SQLite read; None for tools that
+    # write, whose statements cannot be stopped once sent.
+    timeout: Optional[float] = TOOL_TIMEOUT
+    max_output_rows: int = TOOL_MAX_OUTPUT_ROWS  # lines of text output kept
+    max_output_bytes: int = TOOL_MAX_OUTPUT_BYTES
+    memoize: bool = False  # only for pure read tools; entries are dropped when a read table changes
+    memo_size: int = 256
+    memo_ttl: float = 300.0
+
+class ToolError(str):
+    """
+    Error text a tool returns to the agent instead of raising. It is never memoized;
+    `interrupted` is set when the error is a SQLite statement aborted by an interrupt.
+    """
+    interrupted = False
+
+def tool_error(prefix: str, error: Exception) -> ToolError:
+    result = ToolError(f"{prefix}: {error}")
+    result.interrupted = isinstance(error, sqlite3.OperationalError) and str(error) == "interrupted"
+    return result
+
+def configured_overrides() -> dict:
+    if not TOOL_POLICY_OVERRIDES:
+        return {}
+    try:
+        overrides = json.loads(TOOL_POLICY_OVERRIDES)
+        return overrides if isinstance(overrides, dict) else {}
+    except json.JSONDecodeError as e:
+        logger.warning("Ignoring invalid ERP_TOOL_POLICIES: %s", e)
+        return {}
+
+def resolve_policy(tool_name: str, policy: Optional[ToolPolicy]) -> ToolPolicy:
+    """The tool's own policy (or the defaults) with any ERP_TOOL_POLICIES overrides applied."""
+    policy = policy or ToolPolicy()
+    overrides = configured_overrides().get(tool_name) or {}
+    try:
+        return replace(policy, **overrides)
+    except TypeError as e:
+        logger.warning("Ignoring invalid policy override for '%s': %s", tool_name, e)
+        return policy
+
+class _Call:
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.expired = False
+        self.done = False
+        self._lock = threading.Lock()
+
+    def expire(self):
+        with self._lock:
+            if self.done:
+                return
+            self.expired = True
+            # Aborts the SQLite read this thread is running; writes are never interrupted.
+            db.interrupt(self.thread_id)
+
+    def finish(self):
+        with self._lock:
+            self.done = True
+
+class Watchdog:
+    """One background thread that expires overdue tool calls, instead of a timer per call."""
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def watch(self, timeout: float) -> _Call:
+        call = _Call(threading.get_ident())
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + timeout, next(self._sequence), call))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="tool-watchdog", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return call
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                deadline, _, call = self._heap[0]
+                if call.done:
+                    heapq.heappop(self._heap)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+            call.expire()
+
+watchdog = Watchdog()
+_active = threading.local()
+
+def check_deadline():
+    """
+    Raises the error of an interrupted read if the running tool call is past its timeout.
+    Expiry can only abort a SQLite statement that is already running, so a tool that spends
+    its time elsewhere (text-to-SQL waiting on the LLM) calls this before starting its query.
+    """
+    call = getattr(_active, "call", None)
+    if call is not None and call.expired:
+        raise sqlite3.OperationalError("interrupted")
+
+class ToolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counts = {"calls": 0, "errors": 0, "timed_out": 0, "rejected": 0, "memo_hits": 0, "truncated": 0}
+        self._latency_ms_total = 0.0
+        self._latency_ms_max = 0.0
+        self._wait_ms_total = 0.0
+        self.in_flight = 0
+
+    def count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def started(self, wait_ms: float):
+        with self._lock:
+            self.in_flight += 1
+            self._wait_ms_total += wait_ms
+
+    def finished(self, latency_ms: float):
+        with self._lock:
+            self.in_flight -= 1
+            self._counts["calls"] += 1
+            self._latencies.append(latency_ms)
+            self._latency_ms_total += latency_ms
+            self._latency_ms_max = max(self._latency_ms_max, latency_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._counts)
+            calls = snapshot["calls"]
+            ordered = sorted(self._latencies)
+            snapshot.update(
+                in_flight=self.in_flight,
+                latency_ms_avg=(self._latency_ms_total / calls) if calls else 0.0,
+                latency_ms_max=self._latency_ms_max,
+                wait_ms_avg=(self._wait_ms_total / calls) if calls else 0.0,
+            )
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            snapshot[f"latency_ms_{name}"] = ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else None
+        return snapshot
+
+def cap_output(text: str, max_rows: int, max_bytes: int) -> tuple:
+    """Truncates text output to max_rows lines and max_bytes UTF-8 bytes; returns (text, truncated)."""
+    truncated = False
+    lines = text.split("\n")
+    if len(lines) > max_rows:
+        text = "\n".join(lines[:max_rows]) + f"\n... output truncated ({len(lines) - max_rows} more lines)"
+        truncated = True
+    encoded = text.encode("utf-8")
+    if len(encoded) > max_bytes:
+        text = encoded[:max_bytes].decode("utf-8", errors="ignore") + "\n... output truncated (byte limit)"
+        truncated = True
+    return text, truncated
+
+class ToolRunner:
+    """
+    Runs one tool under its policy: at most `max_concurrency` calls at once (others wait up to
+    `queue_timeout`), a wall-clock timeout enforced by interrupting the caller's SQLite read,
+    capped text output and optional memoization keyed on the input and the versions of the
+    tables it reads. A call past its timeout still returns its result if it finished anyway;
+    it is reported as timed out when its read was interrupted or, via check_deadline, never
+    started.
+    """
+
+    def __init__(self, name: str, run: Callable, policy: ToolPolicy, tables_read: Callable = None):
+        self.name = name
+        self._run = run
+        self.policy = policy
+        self.tables_read = tables_read or referenced_tables
+        self.stats = ToolStats()
+        self._slots = threading.BoundedSemaphore(policy.max_concurrency)
+        self._memo = make_cache(f"memo:{name}", policy.memo_size, policy.memo_ttl) if policy.memoize else None
+
+    def _memo_versions(self, args, kwargs) -> Optional[dict]:
+        if self._memo is None or kwargs or len(args) != 1 or not isinstance(args[0], str):
+            return None
+        tables = self.tables_read(args[0])
+        return db.table_versions(tables) if tables else None
+
+    def __call__(self, *args, **kwargs):
+        versions = self._memo_versions(args, kwargs)
+        if versions is not None:
+            start = time.perf_counter()
+            cached = self._memo.get(args[0], is_valid=lambda meta: db.table_versions(meta) == meta)
+            if cached is not None and keep_links_alive(cached):
+                latency_ms = (time.perf_counter() - start) * 1000
+                self.stats.count("memo_hits")
+                self.stats.started(0.0)
+                self.stats.finished(latency_ms)
+                tracer.record(self.name, "tool", latency_ms, memo_hit=True)
+                return cached
+
+        queued_at = time.perf_counter()
+        if not self._slots.acquire(timeout=self.policy.queue_timeout):
+            self.stats.count("rejected")
+            return f"Tool '{self.name}' is busy; try again shortly."
+        start = time.perf_counter()
+        self.stats.started((start - queued_at) * 1000)
+        try:
+            with tracer.span(self.name, "tool") as span:
+                call = watchdog.watch(self.policy.timeout) if self.policy.timeout else None
+                outer, _active.call = getattr(_active, "call", None), call
+                try:
+                    result = self._run(*args, **kwargs)
+                except Exception:
+                    self.stats.count("errors")
+                    raise
+                finally:
+                    _active.call = outer
+                    if call is not None:
+                        call.finish()
+                failed = isinstance(result, ToolError)
+                if failed:
+                    if call is not None and call.expired and result.interrupted:
+                        self.stats.count("timed_out")
+                        if span is not None:
+                            span.set(timed_out=True)
+                        return f"Tool '{self.name}' exceeded its {self.policy.timeout:g}s time limit and was stopped."
+                    self.stats.count("errors")
+        finally:
+            self._slots.release()
+            self.stats.finished((time.perf_counter() - start) * 1000)
+
+        if isinstance(result, str):
+            result, truncated = cap_output(result, self.policy.max_output_rows, self.policy.max_output_bytes)
+            if truncated:
+                self.stats.count("truncated")
+        if versions is not None and not failed:
+            self._memo.put(args[0], result, (time.perf_counter() - start) * 1000, versions)
+        return result
+
+    def report(self) -> dict:
+        report = self.stats.snapshot()
+        report["policy"] = asdict(self.policy)
+        if self._memo is not None:
+            report["memo"] = self._memo.stats()
+        return report
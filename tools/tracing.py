@@ -0,0 +1,328 @@
+# tools/tracing.py
+import bisect
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from tools.db import db
+
+# Share of requests whose full span tree is kept for /traces; latency histograms are always recorded.
+TRACE_SAMPLE_RATE = float(os.getenv("ERP_TRACE_SAMPLE_RATE", "1.0"))
+TRACE_BUFFER_SIZE = int(os.getenv("ERP_TRACE_BUFFER_SIZE", "200"))
+MAX_ATTRIBUTE_CHARS = 500
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span: ContextVar = ContextVar("erp_current_span", default=None)
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, kind: str, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Self time per span kind (a span's duration minus its children's), in ms."""
+        with self._lock:
+            spans = [s for s in self.spans if s.duration_ms is not None]
+        children_ms = {}
+        for span in spans:
+            if span.parent_id:
+                children_ms[span.parent_id] = children_ms.get(span.parent_id, 0.0) + span.duration_ms
+        totals = {}
+        for span in spans:
+            self_ms = max(span.duration_ms - children_ms.get(span.span_id, 0.0), 0.0)
+            totals[span.kind] = totals.get(span.kind, 0.0) + self_ms
+        return totals
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = [s.to_dict() for s in self.spans]
+        root = spans[0] if spans else {}
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": root.get("start"),
+            "duration_ms": root.get("duration_ms"),
+            "breakdown_ms": self.breakdown(),
+            "spans": spans,
+        }
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+class Tracer:
+    """
+    Per-request spans for routing, agents, LLM calls, tools and SQL, plus Prometheus-style
+    latency histograms. The current span lives in a context variable, so spans opened on a
+    worker thread nest under the request that thread is serving. Requests that are not
+    sampled only pay for the histogram update.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, buffer_size: int = TRACE_BUFFER_SIZE):
+        self.sample_rate = sample_rate
+        self._traces = deque(maxlen=buffer_size)
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._errors: Dict[tuple, int] = {}
+        self._tokens = {"prompt": 0, "completion": 0}
+        self._counters = {"traces_started": 0, "traces_sampled": 0}
+        self._lock = threading.Lock()
+
+    def _observe(self, kind: str, name: str, duration_ms: float, failed: bool = False):
+        with self._lock:
+            histogram = self._histograms.get((kind, name))
+            if histogram is None:
+                histogram = self._histograms[(kind, name)] = Histogram()
+            histogram.observe(duration_ms / 1000)
+            if failed:
+                self._errors[(kind, name)] = self._errors.get((kind, name), 0) + 1
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Starts a request trace; yields the Trace when it is sampled, otherwise None."""
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        with self._lock:
+            self._counters["traces_started"] += 1
+            if sampled:
+                self._counters["traces_sampled"] += 1
+        if not sampled:
+            token = _current_span.set(None)
+            try:
+                with self.span(name, "request"):
+                    yield None
+            finally:
+                _current_span.reset(token)
+            return
+
+        trace = Trace(name)
+        root = Span(trace, name, "request", None, attributes)
+        trace.add(root)
+        token = _current_span.set(root)
+        start = time.perf_counter()
+        try:
+            yield trace
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.duration_ms = (time.perf_counter() - start) * 1000
+            self._observe("request", name, root.duration_ms, root.error is not None)
+            with self._lock:
+                self._traces.append(trace)
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes):
+        """Times a block as a child of the current span; yields the Span, or None when not sampled."""
+        span = self.start_span(name, kind, **attributes)
+        token = _current_span.set(span) if span is not None else None
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield span
+        except BaseException as e:
+            failed = True
+            if span is not None:
+                span.error = repr(e)
+            raise
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+            duration_ms = (time.perf_counter() - start) * 1000
+            if span is not None:
+                span.duration_ms = duration_ms
+            self._observe(kind, name, duration_ms, failed)
+
+    def start_span(self, name: str, kind: str, **attributes) -> Optional[Span]:
+        """Opens a span without making it current (for callback-style start/end pairs)."""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        span = Span(parent.trace, name, kind, parent.span_id, attributes)
+        parent.trace.add(span)
+        return span
+
+    def end_span(self, span: Optional[Span], name: str, kind: str, duration_ms: float, error: str = None):
+        if span is not None:
+            span.duration_ms = duration_ms
+            span.error = error
+        self._observe(kind, name, duration_ms, error is not None)
+
+    def record(self, name: str, kind: str, duration_ms: float, **attributes):
+        """Records an operation that has already finished, e.g. a SQL statement reported by the pool."""
+        span = self.start_span(name, kind, **attributes)
+        if span is not None:
+            span.start = time.time() - duration_ms / 1000
+        self.end_span(span, name, kind, duration_ms)
+
+    def record_sql(self, sql_query: str, duration_ms: float, rows: int, kind: str, source: str = None):
+        self.record(source or kind, "sql", duration_ms, statement=sql_query[:MAX_ATTRIBUTE_CHARS],
+                    rows=rows, mode=kind)
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self._tokens["prompt"] += prompt_tokens
+            self._tokens["completion"] += completion_tokens
+
+    def callbacks(self) -> list:
+        """LangChain callbacks that trace LLM calls, for chains invoked outside the agent executor."""
+        return [llm_callback_handler]
+
+    def traces(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            recent = list(self._traces)[-limit:]
+        return [t.to_dict() for t in reversed(recent)]
+
+    def get_trace(self, trace_id: str) -> Optional[dict]:
+        with self._lock:
+            found = next((t for t in self._traces if t.trace_id == trace_id), None)
+        return found.to_dict() if found else None
+
+    def prometheus(self) -> str:
+        """Renders the histograms and counters in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()}
+            errors = dict(self._errors)
+            tokens = dict(self._tokens)
+            counters = dict(self._counters)
+
+        def labels(kind, name, **extra) -> str:
+            pairs = {"kind": kind, "name": name, **extra}
+            return ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs.items())
+
+        lines = [
+            "# HELP erp_span_duration_seconds Latency of traced operations by kind and name.",
+            "# TYPE erp_span_duration_seconds histogram",
+        ]
+        for (kind, name), (counts, total, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(list(LATENCY_BUCKETS) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"erp_span_duration_seconds_bucket{{{labels(kind, name, le=bound)}}} {cumulative}")
+            lines.append(f"erp_span_duration_seconds_sum{{{labels(kind, name)}}} {total}")
+            lines.append(f"erp_span_duration_seconds_count{{{labels(kind, name)}}} {count}")
+        lines += [
+            "# HELP erp_span_errors_total Traced operations that raised.",
+            "# TYPE erp_span_errors_total counter",
+        ]
+        lines += [f"erp_span_errors_total{{{labels(kind, name)}}} {n}" for (kind, name), n in sorted(errors.items())]
+        lines += [
+            "# HELP erp_llm_tokens_total LLM tokens by type.",
+            "# TYPE erp_llm_tokens_total counter",
+        ]
+        lines += [f'erp_llm_tokens_total{{type="{t}"}} {n}' for t, n in tokens.items()]
+        for name, value in counters.items():
+            lines += [f"# TYPE erp_{name}_total counter", f"erp_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+def _token_counts(response) -> tuple:
+    """Prompt/completion token counts from an LLMResult (Ollama generation info or OpenAI-style usage)."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), "reported"
+    prompt_tokens = completion_tokens = 0
+    reported = False
+    for generations in response.generations:
+        for generation in generations:
+            info = generation.generation_info or {}
+            if "eval_count" in info:
+                reported = True
+                prompt_tokens += info.get("prompt_eval_count") or 0
+                completion_tokens += info.get("eval_count") or 0
+            else:
+                # Rough estimate when the backend does not report usage.
+                completion_tokens += len(generation.text) // 4
+    return prompt_tokens, completion_tokens, "reported" if reported else "estimated"
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Opens an "llm" span per LLM call and records its token counts."""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._open = {}
+
+    def _start(self, serialized, run_id, prompt_chars: int):
+        name = ((serialized or {}).get("id") or ["llm"])[-1]
+        span = self.tracer.start_span(name, "llm", prompt_chars=prompt_chars)
+        self._open[run_id] = (span, name, time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(serialized, run_id, sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(serialized, run_id, sum(len(str(m.content)) for batch in messages for m in batch))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        entry = self._open.pop(run_id, None)
+        if entry is None:
+            return
+        span, name, start = entry
+        prompt_tokens, completion_tokens, source = _token_counts(response)
+        self.tracer.add_tokens(prompt_tokens, completion_tokens)
+        if span is not None:
+            span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, token_counts=source)
+        self.tracer.end_span(span, name, "llm", (time.perf_counter() - start) * 1000)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        entry = self._open.pop(run_id, None)
+        if entry is not None:
+            span, name, start = entry
+            self.tracer.end_span(span, name, "llm", (time.perf_counter() - start) * 1000, repr(error))
+
+tracer = Tracer()
+llm_callback_handler = TracingCallbackHandler(tracer)
+
+db.observe_queries(tracer.record_sql)
@@ -0,0 +1,235 @@
+# tools/write_queue.py
+"""
+Single-writer process for multi-worker deployments.
+
+    python -m tools.write_queue
+
+Every worker forwards its writes (db.execute_write and bulk_write.write_rows, i.e. all the
+*_sql_write tools) to this process over a local multiprocessing.connection socket, so erp.db
+has exactly one writer no matter how many workers serve requests. Statements that arrive
+together are committed in one transaction, each under its own savepoint so a failing
+statement only rolls back itself. Started and stopped by gunicorn.conf.py.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Dict, List, Optional, Sequence
+from tools.db import db
+
+logger = logging.getLogger(__name__)
+
+# Unix socket the writer listens on; set in workers to turn forwarding on.
+WRITER_ADDRESS = os.getenv("ERP_WRITER_ADDRESS", "")
+WRITER_AUTHKEY = os.getenv("ERP_WRITER_AUTHKEY", "")
+# Most single statements committed together in one transaction.
+WRITER_MAX_BATCH = int(os.getenv("ERP_WRITER_MAX_BATCH", "64"))
+WRITER_CONNECT_TIMEOUT = float(os.getenv("ERP_WRITER_CONNECT_TIMEOUT", "30"))
+
+def _error_reply(e: BaseException) -> tuple:
+    return ("error", type(e).__name__, str(e))
+
+class WriterServer:
+    """Accepts worker connections and applies their writes on this process's writer connection."""
+
+    def __init__(self, address: str, authkey: bytes, max_batch: int = WRITER_MAX_BATCH):
+        self.address = address
+        self.authkey = authkey
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"connections": 0, "statements": 0, "batches": 0, "bulk_writes": 0, "errors": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def serve_forever(self, before_writes: Callable = None):
+        """`before_writes` runs on the writer thread first; writes that arrive meanwhile queue up."""
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # stale socket from a previous run
+        threading.Thread(target=self._write_loop, args=(before_writes,), name="writer", daemon=True).start()
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            logger.info("Writer listening on %s", self.address)
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    # A client that failed authentication or hung up mid-handshake.
+                    logger.warning("Rejected writer connection: %s", e)
+                    continue
+                self._count("connections")
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def _serve_client(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if request[0] == "stats":
+                    with self._stats_lock:
+                        reply = ("ok", dict(self._stats, queued=self._queue.qsize()))
+                else:
+                    future = Future()
+                    self._queue.put((request, future))
+                    reply = future.result()
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _write_loop(self, before_writes: Callable = None):
+        if before_writes is not None:
+            before_writes()
+        while True:
+            batch = [self._queue.get()]
+            # Group commit: take whatever else is already waiting, up to max_batch statements.
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            statements = [(request, future) for request, future in batch if request[0] == "execute"]
+            if statements:
+                self._commit_statements(statements)
+            for request, future in batch:
+                if request[0] == "write_rows":
+                    self._bulk_write(request, future)
+
+    def _commit_statements(self, statements: List[tuple]):
+        replies = []
+        try:
+            with db.write_connection() as conn:
+                for (_, query, params), _ in statements:
+                    conn.execute("SAVEPOINT request")
+                    try:
+                        replies.append(("ok", conn.execute(query, params).rowcount))
+                        conn.execute("RELEASE request")
+                    except (sqlite3.Error, sqlite3.Warning) as e:
+                        conn.execute("ROLLBACK TO request")
+                        conn.execute("RELEASE request")
+                        replies.append(_error_reply(e))
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was applied.
+            replies = [_error_reply(e)] * len(statements)
+        self._count("batches")
+        self._count("statements", len(statements))
+        self._count("errors", sum(1 for reply in replies if reply[0] == "error"))
+        for (_, future), reply in zip(statements, replies):
+            future.set_result(reply)
+
+    def _bulk_write(self, request: tuple, future: Future):
+        from tools.bulk_write import write_rows
+
+        _, table, operation, rows, key, allowed_tables, chunk_size, source = request
+        try:
+            future.set_result(("ok", write_rows(table, operation, rows, key, allowed_tables, chunk_size, source)))
+        except Exception as e:
+            self._count("errors")
+            future.set_result(_error_reply(e))
+        self._count("bulk_writes")
+
+class WriterClient:
+    """Worker-side forwarder installed as db.write_forwarder; one connection per thread."""
+
+    def __init__(self, address: str, authkey: bytes, connect_timeout: float = WRITER_CONNECT_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # The writer may still be starting up alongside the workers.
+            deadline = time.monotonic() + self.connect_timeout
+            while True:
+                try:
+                    conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if time.monotonic() > deadline:
+                        raise sqlite3.OperationalError(f"writer process not reachable at {self.address}")
+                    time.sleep(0.1)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, request: tuple):
+        conn = self._connection()
+        try:
+            conn.send(request)
+            reply = conn.recv()
+        except (EOFError, OSError) as e:
+            # Not retried: the write may already have been applied.
+            self._local.conn = None
+            conn.close()
+            raise sqlite3.OperationalError(f"lost connection to the writer process: {e}")
+        if reply[0] == "ok":
+            return reply[1]
+        _, error_type, message = reply
+        if error_type == "BatchError":
+            from tools.bulk_write import BatchError
+            raise BatchError(message)
+        error_class = getattr(sqlite3, error_type, None)
+        if not (isinstance(error_class, type) and issubclass(error_class, Exception)):
+            error_class = sqlite3.Error
+        raise error_class(message)
+
+    def execute(self, query: str, params=()) -> int:
+        return self._call(("execute", query, tuple(params)))
+
+    def write_rows(self, table: str, operation: str, rows: List[Dict], key: Optional[Sequence[str]],
+                   allowed_tables, chunk_size: int, source: str = None) -> dict:
+        allowed = frozenset(allowed_tables) if allowed_tables is not None else None
+        return self._call(("write_rows", table, operation, rows, key, allowed, chunk_size, source))
+
+    def stats(self) -> dict:
+        return self._call(("stats",))
+
+def install(address: str = WRITER_ADDRESS, authkey: str = WRITER_AUTHKEY) -> Optional[WriterClient]:
+    """Routes this process's writes to the writer process when ERP_WRITER_ADDRESS is set."""
+    if not address:
+        return None
+    db.write_forwarder = WriterClient(address, authkey.encode())
+    return db.write_forwarder
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s writer %(levelname)s %(message)s")
+    if not WRITER_ADDRESS:
+        print("ERP_WRITER_ADDRESS is not set", file=sys.stderr)
+        return 2
+    from tools import query_log  # noqa: F401 - bulk writes record their statements in this process
+    from tools import reorder, rollups
+    from tools.shared_store import shared_store
+
+    def prepare():
+        if shared_store is not None:
+            # Cached results from a previous run may predate changes made while it was down.
+            shared_store.reset()
+        if rollups.ROLLUPS_ENABLED:
+            # Installed once here instead of racing in every worker's startup.
+            try:
+                rollups.install()
+            except sqlite3.Error as e:
+                logger.warning("Could not install analytics rollups: %s", e)
+        if reorder.REORDER_MONITOR_ENABLED:
+            try:
+                reorder.install()
+            except sqlite3.Error as e:
+                logger.warning("Could not install the reorder change log: %s", e)
+
+    try:
+        WriterServer(WRITER_ADDRESS, WRITER_AUTHKEY.encode()).serve_forever(prepare)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())